@@ -7,6 +7,7 @@ import __init__  # noqa: F401
 import build_migrator.modules
 import build_migrator.settings
 from build_migrator import BuildMigrator
+from build_migrator.common.trace import tracer
 from build_migrator.helpers import ArgumentParserNoError
 
 
@@ -46,6 +47,13 @@ def _add_arguments(parser, add_help=True):
         "--load", metavar="PATH", help="Load Build Object Model from file.",
     )
     parser.add_argument("--verbose", "-v", action="store_true")
+    parser.add_argument(
+        "--trace_file",
+        metavar="PATH",
+        help="Write structured trace of parsed, optimized and generated "
+        "targets to file (one JSON object per line). "
+        "Slows down processing of large builds considerably.",
+    )
 
 
 def _parse_args_first_pass(argv):
@@ -105,6 +113,15 @@ def main(argv=None):
     else:
         logging.basicConfig(level=logging.INFO)
 
+    if args.trace_file:
+        tracer.open(args.trace_file)
+    try:
+        _run(args, modules)
+    finally:
+        tracer.close()
+
+
+def _run(args, modules):
     migrator = BuildMigrator(modules)
 
     settings = vars(args)
@@ -0,0 +1,102 @@
+import io
+import logging
+import os
+import re
+
+from build_migrator.common.os_ext import get_program_names
+
+
+logger = logging.getLogger(__name__)
+
+
+# Printed commands that run make (not messages like "make[1]: ...")
+_make_command_re = re.compile(r"(?:^|[\s;&|(])(?:\S*/)?g?make(?:\s|$)")
+_sub_make_re = re.compile(r"^\S*make\[\d+\]: Entering directory")
+# Options of ninja that take a value
+_ninja_value_options = frozenset(["-C", "-f", "-j", "-k", "-l", "-d", "-t", "-w"])
+
+
+class DryRunLogProvider(object):
+    NAME = "DRY_RUN"
+    HELP = (
+        "Print commands without running them: make -n -B -w, ninja -t commands. "
+        "Logs are collected almost instantly, but commands of makefiles "
+        "generated during build, and of recursive make invoked without $(MAKE), "
+        "are missing"
+    )
+
+    def __init__(self, context):
+        self.context = context
+
+    def call_and_return_log(self, args, cwd=None, **kwargs):
+        program = get_program_names(args[0])[-1]
+        if program in ("make", "gmake"):
+            return self._make_dry_run(args, cwd=cwd, **kwargs)
+        if program == "ninja":
+            return self._ninja_dry_run(args, cwd=cwd, **kwargs)
+        raise ValueError(
+            "{} log provider supports only make and ninja: {}".format(
+                self.NAME, " ".join(args)
+            )
+        )
+
+    def _make_dry_run(self, args, **kwargs):
+        # -B: print commands of targets that are up to date,
+        # -w: print directory changes, -j1: don't interleave sub-makes
+        args = args[:1] + ["-n", "-B", "-w"] + args[1:] + ["-j1"]
+        log_path = self.context.call_and_return_log(args, **kwargs)
+        self._check_recursive_make(log_path)
+        return "make:" + log_path
+
+    # make -n runs recipes that use $(MAKE), other recursive invocations
+    # of make are only printed
+    @staticmethod
+    def _check_recursive_make(log_path):
+        commands = []
+        sub_makes = 0
+        with io.open(log_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if _sub_make_re.match(line):
+                    sub_makes += 1
+                elif _make_command_re.search(line):
+                    commands.append(line.strip())
+        if len(commands) > sub_makes:
+            logger.warning(
+                "%d of %d recursive make invocations in %s may not have been run "
+                "(recipes should use $(MAKE)), their commands are missing:\n%s",
+                len(commands) - sub_makes,
+                len(commands),
+                log_path,
+                "\n".join(commands),
+            )
+
+    def _ninja_dry_run(self, args, cwd=None, **kwargs):
+        # Keep options that locate build.ninja, other options
+        # (e.g. -j, -k, -v) don't apply to tools
+        options = []
+        targets = []
+        working_dir = os.path.abspath(cwd or os.curdir)
+        idx = 1
+        while idx < len(args):
+            arg = args[idx]
+            idx += 1
+            if arg[:2] in _ninja_value_options:
+                value = arg[2:]
+                if not value and idx < len(args):
+                    value = args[idx]
+                    idx += 1
+                if arg[:2] == "-C":
+                    working_dir = os.path.join(working_dir, value)
+                    options += ["-C", value]
+                elif arg[:2] == "-f":
+                    options += ["-f", value]
+            elif not arg.startswith("-"):
+                targets.append(arg)
+        args = args[:1] + options + ["-t", "commands"] + targets
+        # Tools don't print directory changes, even with -C
+        working_dir = os.path.normpath(working_dir)
+        header = ["ninja: Entering directory `{}'".format(working_dir)]
+        log_path = self.context.call_and_return_log(
+            args, cwd=cwd, header=header, **kwargs
+        )
+        return "ninja:" + log_path
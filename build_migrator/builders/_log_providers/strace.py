@@ -13,13 +13,11 @@ class StraceLogProvider(object):
 
     def __init__(self, context):
         self.context = context
-        self.strace_out_idx = 1
 
-    def call_and_return_log(self, args, **kwargs):
+    def call_and_return_log(self, args, log_idx, **kwargs):
         strace_out_path = os.path.join(
-            self.context.out_dir, "strace" + str(self.strace_out_idx) + ".log"
+            self.context.out_dir, "strace" + str(log_idx) + ".log"
         )
-        self.strace_out_idx += 1
         strace_prefix = [
             "strace",
             "-f",
@@ -30,5 +28,5 @@ class StraceLogProvider(object):
             "-o",
             strace_out_path,
         ]
-        self.context.call_and_return_log(strace_prefix + args, **kwargs)
+        self.context.call_and_return_log(strace_prefix + args, log_idx, **kwargs)
         return strace_out_path
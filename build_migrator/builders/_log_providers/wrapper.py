@@ -0,0 +1,123 @@
+import logging
+import os
+import stat
+import sys
+
+
+logger = logging.getLogger(__name__)
+
+
+class WrapperLogProvider(object):
+    NAME = "WRAPPER"
+    HELP = (
+        "Put shims of compilers and other build tools first in PATH, log commands "
+        "they run (log path chosen automatically). Faster than STRACE, POSIX only."
+    )
+    # Programs wrapped by default (if found in PATH)
+    TOOLS = (
+        "cc",
+        "c++",
+        "gcc",
+        "g++",
+        "clang",
+        "clang++",
+        "ar",
+        "ranlib",
+        "ld",
+        "as",
+        "nasm",
+        "yasm",
+        "objcopy",
+        "strip",
+        "cp",
+        "ln",
+        "install",
+        "mv",
+    )
+
+    def __init__(self, context):
+        if os.name != "posix":
+            raise ValueError(
+                "{} log provider is not supported on this platform, "
+                "see wrappers/verbose-wrapper.bat for Windows".format(self.NAME)
+            )
+        self.context = context
+
+    @staticmethod
+    def _find_program(name, dirs):
+        for dir in dirs:
+            path = os.path.join(dir, name)
+            if os.path.isfile(path) and os.access(path, os.X_OK):
+                return path
+        return None
+
+    # Returns additional arguments of main() of wrapper_shim.py
+    def _get_shim_options(self, name):
+        return {}
+
+    # Generates shim for every tool found in PATH
+    def _create_shims(self, shim_dir, log_path, path_dirs):
+        shim_source_path = os.path.join(os.path.dirname(__file__), "wrapper_shim.py")
+        with open(shim_source_path) as f:
+            shim_source = f.read()
+        if not os.path.exists(shim_dir):
+            os.makedirs(shim_dir)
+
+        for name in self.context.wrapped_tools or self.TOOLS:
+            real_tool = self._find_program(name, path_dirs)
+            if real_tool is None:
+                logger.debug("%s not found in PATH, not wrapped", name)
+                continue
+            shim_args = [repr(name), repr(real_tool), repr(log_path)]
+            for option, value in sorted(self._get_shim_options(name).items()):
+                shim_args.append("{}={!r}".format(option, value))
+            shim_path = os.path.join(shim_dir, name)
+            with open(shim_path, "w") as f:
+                # -S: standard library is enough, skip site for faster startup
+                f.write("#!{} -S\n".format(sys.executable))
+                f.write(shim_source)
+                f.write(
+                    '\n\nif __name__ == "__main__":\n'
+                    "    main({})\n".format(", ".join(shim_args))
+                )
+            mode = os.stat(shim_path).st_mode
+            os.chmod(shim_path, mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+    def call_and_return_log(self, args, log_idx, env=None, **kwargs):
+        name = self.NAME.lower() + str(log_idx)
+        log_path = os.path.join(self.context.out_dir, name + ".log")
+        shim_dir = os.path.join(self.context.out_dir, name + "_shims")
+
+        env = dict(os.environ if env is None else env)
+        path_dirs = [d for d in env.get("PATH", os.defpath).split(os.pathsep) if d]
+        self._create_shims(shim_dir, log_path, path_dirs)
+        env["PATH"] = os.pathsep.join([shim_dir] + path_dirs)
+        # Records are appended, start with empty log
+        open(log_path, "w").close()
+
+        self.context.call_and_return_log(args, log_idx, env=env, **kwargs)
+        return "wrapper:" + log_path
+
+
+class StubLogProvider(WrapperLogProvider):
+    NAME = "STUB"
+    HELP = (
+        "Like WRAPPER, but wrapped compilers, linkers and archivers are not run, "
+        "their outputs (and depfiles) are created empty. Much faster than a real "
+        "build, but build steps that read these outputs (e.g. run built programs) "
+        "fail. POSIX only."
+    )
+    # Wrapped programs that are run for real
+    PASSTHROUGH_TOOLS = ("cp", "ln", "install", "mv")
+
+    def _get_shim_options(self, name):
+        if name in self.PASSTHROUGH_TOOLS:
+            return {}
+        package_dir = os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        )
+        return {
+            "stub": True,
+            "preprocess": bool(self.context.stub_preprocessor),
+            "package_dir": package_dir,
+        }
@@ -0,0 +1,111 @@
+# Source of shims generated by WrapperLogProvider and StubLogProvider.
+# Shims run without build_migrator in sys.path, use standard library only
+# (stubs add package_dir to sys.path to find outputs of commands).
+import json
+import os
+import subprocess
+import sys
+
+
+# Set for tools started by wrapped tools (e.g. ld started by cc),
+# such commands are not logged
+NESTED_ENV = "BUILD_MIGRATOR_WRAPPER_NESTED"
+
+
+def _call(real_tool, args, env):
+    # argv[0] is full path, because some tools (e.g. gcc) use it to find
+    # their files, and shim directory is the first one in PATH
+    exit_code = subprocess.call([real_tool] + args, env=env)
+    if exit_code < 0:
+        # Killed by signal
+        exit_code = 128 - exit_code
+    return exit_code
+
+
+# Returns (path, targets) of depfile requested by -MD, -MMD
+# or -Wp,-MD,path options of compiler, None if there's no depfile
+def _get_depfile(args, outputs):
+    path = None
+    targets = []
+    requested = False
+    idx = 0
+    while idx < len(args):
+        arg = args[idx]
+        idx += 1
+        if arg in ("-MD", "-MMD"):
+            requested = True
+        elif arg.startswith(("-Wp,-MD,", "-Wp,-MMD,")):
+            requested = True
+            path = arg.split(",", 2)[2]
+        elif arg[:3] in ("-MF", "-MT", "-MQ"):
+            value = arg[3:]
+            if not value and idx < len(args):
+                value = args[idx]
+                idx += 1
+            if arg[:3] == "-MF":
+                path = value
+            else:
+                targets.append(value)
+    if not requested:
+        return None
+    if path is None:
+        path = os.path.splitext(outputs[0])[0] + ".d"
+    return path, targets or outputs[:1]
+
+
+# Creates empty outputs of command (and depfile), instead of running it.
+# preprocess: run real preprocessor (-E instead of -c), so that depfile
+# lists actual headers.
+def _stub(real_tool, args, env, outputs, preprocess):
+    if preprocess and "-c" in args:
+        exit_code = _call(real_tool, ["-E" if a == "-c" else a for a in args], env)
+        if exit_code == 0:
+            # Discard preprocessed source
+            for path in outputs:
+                open(path, "w").close()
+        return exit_code
+
+    for path in outputs:
+        # Files modified in place (ranlib, strip) are only touched
+        open(path, "a").close()
+        os.utime(path, None)
+    depfile = _get_depfile(args, outputs)
+    if depfile is not None:
+        path, targets = depfile
+        with open(path, "w") as f:
+            f.write(" ".join(targets) + ":\n")
+    return 0
+
+
+# Runs real tool, then appends record of the command to log:
+#   {"argv": ["cc", "-c", "a.c"], "cwd": "/build", "exit_code": 0}
+# stub: create empty outputs instead of running the tool. Tool is still
+# run if its outputs are unknown (e.g. cc --version).
+def main(name, real_tool, log_path, stub=False, preprocess=False, package_dir=None):
+    args = sys.argv[1:]
+    if os.environ.get(NESTED_ENV):
+        os.execv(real_tool, [real_tool] + args)
+
+    env = dict(os.environ)
+    env[NESTED_ENV] = "1"
+    cwd = os.getcwd()
+    outputs = None
+    if stub:
+        sys.path.insert(0, package_dir)
+        from build_migrator.common.command_graph import get_command_outputs
+
+        outputs = get_command_outputs([name] + args, lambda path: path)
+    if outputs is None:
+        exit_code = _call(real_tool, args, env)
+    else:
+        exit_code = _stub(real_tool, args, env, outputs, preprocess)
+
+    record = json.dumps({"argv": [name] + args, "cwd": cwd, "exit_code": exit_code})
+    fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        # Record is written by a single write() to file opened with
+        # O_APPEND, so records of parallel commands are not interleaved
+        os.write(fd, (record + "\n").encode("utf-8"))
+    finally:
+        os.close(fd)
+    sys.exit(exit_code)
@@ -1,11 +1,18 @@
 import argparse
 import logging
+from multiprocessing.pool import ThreadPool
 import os
+import queue
 import shlex
 import subprocess
 
 from build_migrator.builders._log_providers.console import ConsoleLogProvider
+from build_migrator.builders._log_providers.dry_run import DryRunLogProvider
 from build_migrator.builders._log_providers.strace import StraceLogProvider
+from build_migrator.builders._log_providers.wrapper import (
+    StubLogProvider,
+    WrapperLogProvider,
+)
 from build_migrator.modules import Builder, EntryPoint
 
 
@@ -16,6 +23,9 @@ class GenericBuilder(Builder, EntryPoint):
     _log_providers = {
         ConsoleLogProvider.NAME: ConsoleLogProvider,
         StraceLogProvider.NAME: StraceLogProvider,
+        WrapperLogProvider.NAME: WrapperLogProvider,
+        StubLogProvider.NAME: StubLogProvider,
+        DryRunLogProvider.NAME: DryRunLogProvider,
     }
     _default_log_provider = ConsoleLogProvider.NAME
 
@@ -52,6 +62,42 @@ class GenericBuilder(Builder, EntryPoint):
             choices=list(cls._log_providers.keys()),
             help="Default LOG value for --build_command",
         )
+        arg_parser.add_argument(
+            "--build_jobs",
+            metavar="N",
+            type=int,
+            default=1,
+            help="Run up to N build commands at the same time. Commands with "
+            "the same WORKING_DIR run in the given order, see also --build_depends. "
+            "Default: 1.",
+        )
+        arg_parser.add_argument(
+            "--build_depends",
+            metavar="N",
+            nargs="+",
+            type=int,
+            action="append",
+            help="N M [M ...]: build command N starts after build commands M "
+            "finish (numbered from 1 in order of --build_command, M < N).",
+        )
+        arg_parser.add_argument(
+            "--wrapped_tools",
+            metavar="NAME",
+            nargs="+",
+            help="Programs wrapped by {} and {} log providers. Default: {}.".format(
+                WrapperLogProvider.NAME,
+                StubLogProvider.NAME,
+                ", ".join(WrapperLogProvider.TOOLS),
+            ),
+        )
+        arg_parser.add_argument(
+            "--stub_preprocessor",
+            action="store_true",
+            help="Run real preprocessor for compilations stubbed by {} log provider, "
+            "so that depfiles (-MD, -MMD) list actual headers.".format(
+                StubLogProvider.NAME
+            ),
+        )
         try:
             arg_parser.add_argument(
                 "--source_dir",
@@ -78,6 +124,10 @@ class GenericBuilder(Builder, EntryPoint):
         source_dir,
         build_commands=None,
         log_provider=None,
+        wrapped_tools=None,
+        stub_preprocessor=False,
+        build_jobs=1,
+        build_depends=None,
     ):
         if not build_commands:
             raise ValueError("build_commands must be specified")
@@ -89,7 +139,9 @@ class GenericBuilder(Builder, EntryPoint):
         self.build_migrator = build_migrator
         self.out_dir = os.path.abspath(out_dir)
         self.source_dir = os.path.abspath(source_dir)
-        self._log_idx = 1
+        self.wrapped_tools = wrapped_tools
+        self.stub_preprocessor = stub_preprocessor
+        self.build_jobs = build_jobs or 1
         self._log_provider_instances = {}
 
         self._build_commands = []
@@ -130,37 +182,120 @@ class GenericBuilder(Builder, EntryPoint):
                 self._default_log_provider
             )
 
-    def call_and_return_log(self, args, cwd=None, **kwargs):
-        log_path = os.path.join(
-            self.out_dir, "build_command_" + str(self._log_idx) + ".log"
-        )
+        # Build command waits for the previous command with the same
+        # working directory, and for commands given by --build_depends
+        self._build_dependencies = []
+        last_command_in_dir = {}
+        for idx, (_, working_dir, _) in enumerate(self._build_commands):
+            dependencies = set()
+            if working_dir in last_command_in_dir:
+                dependencies.add(last_command_in_dir[working_dir])
+            last_command_in_dir[working_dir] = idx
+            self._build_dependencies.append(dependencies)
+        for value in build_depends or []:
+            command, dependencies = value[0], value[1:]
+            if not dependencies or not (
+                1 <= min(dependencies) < command <= len(self._build_commands)
+            ):
+                raise ValueError(
+                    "Invalid --build_depends: {}. Build commands are numbered "
+                    "from 1, dependencies must precede the dependent command.".format(
+                        " ".join(map(str, value))
+                    )
+                )
+            self._build_dependencies[command - 1].update(i - 1 for i in dependencies)
+
+    # log_idx: number of build command, used in log names
+    # header: lines written to log before output of the command
+    def call_and_return_log(self, args, log_idx, cwd=None, header=None, **kwargs):
+        log_path = os.path.join(self.out_dir, "build_command_" + str(log_idx) + ".log")
         with open(log_path, "w") as f:
             logger.info(
                 'Command: "%s", cwd: %r, log: %s', " ".join(args), cwd, log_path
             )
+            if header:
+                f.write("\n".join(header) + "\n")
+                f.flush()
             subprocess.check_call(
                 args, stdout=f, stderr=subprocess.STDOUT, cwd=cwd, **kwargs
             )
-        self._log_idx += 1
         return log_path
 
+    # Returns log of build command, None if it has no log
+    def _run_build_command(self, idx):
+        args, cwd, log_provider = self._build_commands[idx]
+        if cwd and not os.path.exists(cwd):
+            try:
+                os.makedirs(cwd)
+            except OSError:
+                # Created by concurrent build command
+                if not os.path.isdir(cwd):
+                    raise
+        if isinstance(log_provider, str) or log_provider is None:
+            self.call_and_return_log(args, log_idx=idx + 1, cwd=cwd)
+            return log_provider
+        return log_provider.call_and_return_log(args, log_idx=idx + 1, cwd=cwd)
+
+    # Runs build commands in up to --build_jobs threads, each command
+    # starts when its dependencies finish. If a command fails, no more
+    # commands are started and the first error is raised when running
+    # commands finish.
+    # Returns logs of build commands (in order of build commands).
+    def _run_build_commands(self):
+        count = len(self._build_commands)
+        if self.build_jobs <= 1:
+            return [self._run_build_command(idx) for idx in range(count)]
+
+        def _run(idx):
+            try:
+                return idx, self._run_build_command(idx), None
+            except Exception as e:
+                logger.error("Build command %d failed: %s", idx + 1, e)
+                return idx, None, e
+
+        logs = [None] * count
+        not_started = list(range(count))
+        finished = set()
+        running = 0
+        error = None
+        completed = queue.Queue()
+        pool = ThreadPool(self.build_jobs)
+        try:
+            while running or (not_started and error is None):
+                for idx in list(not_started):
+                    if running >= self.build_jobs or error is not None:
+                        break
+                    if self._build_dependencies[idx] <= finished:
+                        not_started.remove(idx)
+                        pool.apply_async(_run, (idx,), callback=completed.put)
+                        running += 1
+                if not running:
+                    break
+                idx, log, exception = completed.get()
+                running -= 1
+                if exception is not None:
+                    error = error or exception
+                else:
+                    logs[idx] = log
+                    finished.add(idx)
+        finally:
+            pool.close()
+            pool.join()
+        if error is not None:
+            raise error
+        return logs
+
     def build(self, builders=None):
         if builders:
             raise ValueError("GenericBuilder doesn't support extensions")
         logs = []
         build_dirs = []
-        for args, cwd, log_provider in self._build_commands:
-            if cwd and not os.path.exists(cwd):
-                os.makedirs(cwd)
-            if isinstance(log_provider, str) or log_provider is None:
-                self.call_and_return_log(args, cwd=cwd)
-            else:
-                log_provider = log_provider.call_and_return_log(args, cwd=cwd)
-            if log_provider is not None:
-                logs.append(log_provider)
+        for (_, cwd, _), log in zip(self._build_commands, self._run_build_commands()):
+            if log is not None:
+                logs.append(log)
                 if cwd:
                     build_dirs.append(cwd)
-                logger.info("Added to parser queue: %s", log_provider)
+                logger.info("Added to parser queue: %s", log)
         self.build_migrator.set_global_settings("logs", logs)
         if self.build_migrator.get_global_settings("build_dirs") is None:
             self.build_migrator.set_global_settings("build_dirs", build_dirs)
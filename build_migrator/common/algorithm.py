@@ -1,3 +1,4 @@
+from collections import OrderedDict
 from copy import deepcopy
 
 try:
@@ -141,3 +142,38 @@ def intersect_unique_stable(*lists):
 
 def get_subdict(dictionary, *keys):
     return {key: dictionary[key] for key in set(dictionary.keys()) & set(keys)}
+
+
+# List-like container that keeps insertion order and removes items in O(1).
+# Items are compared by identity, so unhashable items (e.g. targets)
+# are supported and equal, but distinct, items may be stored together.
+class IdentityOrderedSet(object):
+    def __init__(self, items=None):
+        self._items = OrderedDict()  # id(item) => item
+        for item in items or []:
+            self.append(item)
+
+    def append(self, item):
+        self._items[id(item)] = item
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def remove(self, item):
+        key = id(item)
+        if key not in self._items:
+            raise ValueError("Item not found")
+        del self._items[key]
+
+    def __contains__(self, item):
+        return id(item) in self._items
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, list(self._items.values()))
@@ -4,6 +4,7 @@ from functools import partial
 import logging
 import traceback
 import uuid
+from build_migrator.common.bounded_cache import BoundedCache
 
 logger = logging.getLogger(__name__)
 
@@ -12,11 +13,14 @@ class SavepointContextManager(object):
     def __init__(self, savepoint_id, all_savepoints, state):
         if savepoint_id in all_savepoints:
             raise ValueError("Savepoint already exists: %r" % savepoint_id)
+        all_savepoints[savepoint_id] = self
         self._dismissed = False
-        self._savepoint = all_savepoints.setdefault(savepoint_id, {})
-        self._state_dict = state.__dict__
+        self._state = state
         self._id = savepoint_id
         self._savepoints = all_savepoints
+        self._undo_log_position = len(state._undo_log)
+        self._token_position = state._position
+        self._token_changes = state._token_changes
 
     def dismiss(self):
         self._dismissed = True
@@ -27,23 +31,38 @@ class SavepointContextManager(object):
         Get tokens that were removed or modified between currently saved state
         and state provided in the argument.
         """
-        cur_tokens = state._tokens
-        old_tokens = self._savepoint.get("_tokens")
-        if old_tokens:
-            diff = len(old_tokens) - len(cur_tokens)
-            if diff == 0 and old_tokens[0] != cur_tokens[1]:
-                # leading token was modified
-                diff = 1
-            return old_tokens[0:diff]
-        else:
+        if state._token_changes == self._token_changes:
+            # tokens weren't touched since the savepoint was created
+            return []
+        old_length = len(state._tokens) - self._token_position
+        if not old_length:
             return []
 
+        # Values of tokens at the moment the savepoint was created
+        old_values = {}
+        for entry in state._undo_log[self._undo_log_position:]:
+            if entry[0] == TokenParserState._SET_TOKEN and entry[1] not in old_values:
+                old_values[entry[1]] = entry[2]
+
+        def get_old_token(idx):
+            idx += self._token_position
+            return old_values[idx] if idx in old_values else state._tokens[idx]
+
+        diff = state._position - self._token_position
+        if diff == 0 and get_old_token(0) != state._tokens[state._position + 1]:
+            # leading token was modified
+            diff = 1
+        return [get_old_token(idx) for idx in range(diff)]
+
     def load(self):
-        self._state_dict.update(self._savepoint)
+        self._state._rollback(self._undo_log_position)
 
     def cleanup(self):
         self._savepoints.pop(self._id)
-        self._savepoint = None
+        if not self._savepoints:
+            # nothing to roll back to
+            del self._state._undo_log[:]
+        self._state = None
         self._id = None
 
     def __enter__(self):
@@ -55,62 +74,84 @@ class SavepointContextManager(object):
         self.cleanup()
 
 
+# Tokens are consumed by advancing the position, they are never copied.
+# While savepoints exist, every change is recorded in the undo log as an
+# inverse operation. Savepoint remembers the undo log length, rolling back
+# replays the log backwards down to that length.
 class TokenParserState(object):
+    _MOVE = 0
+    _SET_TOKEN = 1
+    _SET_ATTRIBUTE = 2
+    _STORE = 3
+
+    _missing = object()
+
     def __init__(self, tokens, namespace=None):
         if namespace is None:
             namespace = Namespace()
         self._namespace = namespace
-        self._tokens = tokens
+        self._tokens = list(tokens)
+        self._position = 0
+        self._token_changes = 0  # isn't rolled back, see get_token_diff()
         self._savepoints = {}
         self._storage = {}
+        self._undo_log = []
 
     def next_tokens(self, n):
-        if len(self._tokens) >= n:
-            self._save_attribute("_tokens")
-            tokens = self._tokens[0:n]
-            self._tokens = self._tokens[n:]
-            return tokens
+        position = self._position
+        if len(self._tokens) - position >= n:
+            if self._savepoints:
+                self._undo_log.append((self._MOVE, position))
+            self._token_changes += 1
+            self._position = position + n
+            return self._tokens[position:position + n]
         return None
 
     def get_tokens_length(self):
-        return len(self._tokens)
+        return len(self._tokens) - self._position
 
     def get_token(self, idx):
-        return deepcopy(self._tokens[idx])
+        return self._tokens[self._position + idx]
 
     def set_token(self, idx, value, savepoint=True):
+        idx += self._position
         if savepoint:
-            self._save_attribute("_tokens")
+            if self._savepoints:
+                self._undo_log.append((self._SET_TOKEN, idx, self._tokens[idx]))
+            self._token_changes += 1
         self._tokens[idx] = value
 
     def get_attribute(self, name, default):
-        return deepcopy(getattr(self._namespace, name, default))
+        return _copy_value(getattr(self._namespace, name, default))
+
+    def _set_attribute(self, name, value, savepoint):
+        if savepoint and self._savepoints:
+            self._undo_log.append(
+                (
+                    self._SET_ATTRIBUTE,
+                    name,
+                    getattr(self._namespace, name, self._missing),
+                )
+            )
+        setattr(self._namespace, name, value)
 
     def set_attribute(self, name, value, savepoint=True):
-        if savepoint:
-            self._save_attribute("_namespace")
-        setattr(self._namespace, name, value)
+        self._set_attribute(name, value, savepoint)
 
     def set_attribute_first(self, name, value, savepoint=True):
-        if savepoint:
-            self._save_attribute("_namespace")
         if isinstance(value, list):
             value = value[0]
-        setattr(self._namespace, name, value)
+        self._set_attribute(name, value, savepoint)
 
     def append_attribute(self, name, value, savepoint=True):
         cur_value = self.get_attribute(name, [])
         cur_value.append(value)
-        if savepoint:
-            self._save_attribute("_namespace")
-        setattr(self._namespace, name, cur_value)
+        self._set_attribute(name, cur_value, savepoint)
 
     def extend_attribute(self, name, value, savepoint=True):
         cur_value = self.get_attribute(name, [])
         cur_value.extend(value)
-        if savepoint:
-            self._save_attribute("_namespace")
-        setattr(self._namespace, name, cur_value)
+        self._set_attribute(name, cur_value, savepoint)
 
     def append_or_extend_attribute(self, name, value, savepoint=True):
         if len(value) <= 1:
@@ -119,20 +160,26 @@ class TokenParserState(object):
             self.append_attribute(name, value, savepoint=savepoint)
 
     def fetch(self, context, key, default=None):
-        return deepcopy(self._storage.get(self._get_full_key(context, key), default))
+        return _copy_value(self._storage.get(self._get_full_key(context, key), default))
 
     def store(self, context, key, value):
-        self._save_attribute("_storage")
-        self._storage[self._get_full_key(context, key)] = value
+        key = self._get_full_key(context, key)
+        if self._savepoints:
+            self._undo_log.append(
+                (self._STORE, key, self._storage.get(key, self._missing))
+            )
+        self._storage[key] = value
 
     def save(self, context):
-        return SavepointContextManager(str(id(context)), self._savepoints, self)
+        return SavepointContextManager(id(context), self._savepoints, self)
 
     def finalize(self):
         if len(self._savepoints):
             raise ValueError("Orphaned savepoints found")
-        if len(self._tokens):
-            raise ValueError("Cannot finalize, tokens left: %r" % self._tokens)
+        if self.get_tokens_length():
+            raise ValueError(
+                "Cannot finalize, tokens left: %r" % self._tokens[self._position:]
+            )
         return self._namespace
 
     def _get_full_key(self, context, key):
@@ -140,27 +187,144 @@ class TokenParserState(object):
             key = str(id(context)) + "." + key
         return key
 
-    def _save_attribute(self, name):
-        for _id, dict in self._savepoints.items():
-            if name not in dict:
-                dict[name] = deepcopy(self.__dict__[name])
+    def _rollback(self, undo_log_position):
+        undo_log = self._undo_log
+        while len(undo_log) > undo_log_position:
+            entry = undo_log.pop()
+            kind = entry[0]
+            if kind == self._MOVE:
+                self._position = entry[1]
+            elif kind == self._SET_TOKEN:
+                self._tokens[entry[1]] = entry[2]
+            elif kind == self._SET_ATTRIBUTE:
+                if entry[2] is self._missing:
+                    delattr(self._namespace, entry[1])
+                else:
+                    setattr(self._namespace, entry[1], entry[2])
+            else:
+                if entry[2] is self._missing:
+                    del self._storage[entry[1]]
+                else:
+                    self._storage[entry[1]] = entry[2]
+
+
+# Values set by parser are replaced, not modified in place, so that
+# undo log keeps the original objects. Shallow copy is enough.
+def _copy_value(value):
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+# Copies containers, but not their (immutable) items.
+# Much cheaper than deepcopy for parse results.
+def _copy_parse_result(value):
+    if isinstance(value, list):
+        return [_copy_parse_result(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy_parse_result(v) for v in value)
+    if isinstance(value, dict):
+        return dict((k, _copy_parse_result(v)) for k, v in value.items())
+    if isinstance(value, Namespace):
+        return Namespace(**_copy_parse_result(vars(value)))
+    return value
+
+
+# Leading tokens that may be accepted by a rule:
+# exact flags and prefixes of flags with suffix values.
+# Rules without DispatchKey are tried for any token.
+class DispatchKey(object):
+    def __init__(self, flags=None, prefixes=None, ignore_case=None):
+        self.flags = flags or []
+        self.prefixes = prefixes or []
+        self.ignore_case = bool(ignore_case)
+
+
+# Selects rules that may accept the leading token, preserving rule order.
+# Exact flags are looked up in hash maps, prefixes are looked up
+# in hash maps grouped by prefix length (only lengths that actually
+# occur are probed), so the cost doesn't depend on the number of rules.
+class RuleDispatcher(object):
+    def __init__(self, rules):
+        self._rules = rules
+        self._wildcard = []
+        self._flags = [{}, {}]  # [case sensitive, ignore case]: flag => indices
+        self._prefixes = [{}, {}]  # [case sensitive, ignore case]: length => prefix => indices
+        for idx, rule in enumerate(rules):
+            keys = getattr(rule, "dispatch_keys", None)
+            if keys is None:
+                self._wildcard.append(idx)
+                continue
+            for key in keys:
+                flags = self._flags[key.ignore_case]
+                prefixes = self._prefixes[key.ignore_case]
+                for flag in key.flags:
+                    if key.ignore_case:
+                        flag = flag.lower()
+                    flags.setdefault(flag, []).append(idx)
+                for prefix in key.prefixes:
+                    if key.ignore_case:
+                        prefix = prefix.lower()
+                    prefixes.setdefault(len(prefix), {}).setdefault(prefix, []).append(
+                        idx
+                    )
+        self._prefix_lengths = [sorted(p.keys()) for p in self._prefixes]
+
+    def _find(self, token, ignore_case, result):
+        indices = self._flags[ignore_case].get(token)
+        if indices:
+            result.extend(indices)
+        prefixes = self._prefixes[ignore_case]
+        token_length = len(token)
+        for length in self._prefix_lengths[ignore_case]:
+            if length > token_length:
+                break
+            indices = prefixes[length].get(token[:length])
+            if indices:
+                result.extend(indices)
+
+    def get_rules(self, token):
+        indices = list(self._wildcard)
+        self._find(token, False, indices)
+        self._find(token.lower(), True, indices)
+        if len(indices) > 1:
+            indices = sorted(set(indices))
+        rules = self._rules
+        return [rules[idx] for idx in indices]
 
 
 class TokenParser(object):
-    def __init__(self, rules=None, validators=None):
+    def __init__(self, rules=None, validators=None, dispatch=True):
         if rules is None:
             rules = []
         if validators is None:
             validators = []
         self._rule = Any(*rules)
+        self._dispatcher = RuleDispatcher(rules) if dispatch else None
         self._validators = validators
 
+    def _apply_rules(self, state):
+        if self._dispatcher is None:
+            return self._rule(state)
+        token = state.get_token(0)
+        if not isinstance(token, str):
+            return self._rule(state)
+        # Same as Any(*rules), rules that can't accept the token are skipped
+        with state.save(self._rule) as savepoint:
+            for rule in self._dispatcher.get_rules(token):
+                if rule(state):
+                    savepoint.dismiss()
+                    return True
+            return False
+
     def parse(self, tokens, namespace=None, strict=True, unknown_dest=None):
         state = TokenParserState(tokens, namespace)
 
         unparsed_tokens = []
         while state.get_tokens_length() > 0:
-            if self._rule(state):
+            if self._apply_rules(state):
                 continue
             skip_n = 1
             if strict:
@@ -212,19 +376,29 @@ class Check(object):
         return self._condition(state.get_token(0))
 
 
+# Conditions are methods rather than lambdas, so that parsers
+# can be pickled (see --parallel_shards)
 class IsEmpty(Check):
     def __init__(self):
-        super(IsEmpty, self).__init__(lambda t: len(t) == 0)
+        super(IsEmpty, self).__init__(self._is_empty)
+
+    @staticmethod
+    def _is_empty(token):
+        return len(token) == 0
 
 
 class IsIn(Check):
     def __init__(self, *values, **kwargs):
-        ignore_case = kwargs.get("ignore_case")
-        if ignore_case:
+        self._ignore_case = kwargs.get("ignore_case")
+        if self._ignore_case:
             values = [v.lower() for v in values]
-            super(IsIn, self).__init__(lambda t: t.lower() in values)
-        else:
-            super(IsIn, self).__init__(lambda t: t in values)
+        self._values = values
+        super(IsIn, self).__init__(self._is_in)
+
+    def _is_in(self, token):
+        if self._ignore_case:
+            token = token.lower()
+        return token in self._values
 
 
 class Not(object):
@@ -537,8 +711,13 @@ class ArgumentParserEx(object):
         argument_default=None,
         conflict_handler=None,
         add_help=None,
+        cache_size=1024,
     ):
         self._kwargs = {"prefix_chars": prefix_chars}
+        # Results of parse_known_args are memoized by tokens, unless
+        # some argument has side effects (handlers, custom types)
+        self._cache = BoundedCache(cache_size)
+        self._cacheable = True
 
         self._action_to_rule = {
             None: self._get_store_rule,
@@ -567,6 +746,13 @@ class ArgumentParserEx(object):
             if c != "_" and not str.isalnum(c):
                 raise ValueError("Invalid dest: %r" % kwargs.get("dest"))
 
+        if (
+            kwargs.get("handler")
+            or kwargs.get("raw_handler")
+            or kwargs.get("type") not in [None, int, float, str]
+        ):
+            self._cacheable = False
+
         if args and args[0][0] in kwargs["prefix_chars"]:
             kwargs = self._get_optional_kwargs(*args, **kwargs)
         elif "prefixes" in kwargs or "flags" in kwargs:
@@ -589,9 +775,26 @@ class ArgumentParserEx(object):
 
     def parse_known_args(self, args, namespace=None, unknown_dest=None):
         self._ensure_parser_is_ready()
-        return self._parser.parse(
-            args, strict=False, namespace=namespace, unknown_dest=unknown_dest
-        )
+        if namespace is not None or not self._cacheable:
+            return self._parser.parse(
+                args, strict=False, namespace=namespace, unknown_dest=unknown_dest
+            )
+
+        if isinstance(unknown_dest, list):
+            key = (tuple(args), tuple(unknown_dest))
+        else:
+            key = (tuple(args), unknown_dest)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._parser.parse(
+                args, strict=False, unknown_dest=unknown_dest
+            )
+            self._cache.put(key, _copy_parse_result(result))
+            return result
+        return _copy_parse_result(result)
+
+    def cache_info(self):
+        return self._cache.info()
 
     def set(self, **kwargs):
         self._kwargs.update(kwargs)
@@ -599,6 +802,7 @@ class ArgumentParserEx(object):
     def set_defaults(self, **kwargs):
         for dest, default in kwargs.items():
             self._validators.append(SetDefaultAttributeValue(dest, default))
+        self._cache.clear()
 
     def _get_append_rule(self, **kwargs):
         kwargs["append"] = True
@@ -628,7 +832,9 @@ class ArgumentParserEx(object):
         kwargs["const"] = False
         kwargs["flags"] = [f + msvc_false_suffix for f in flags]
         rule2, validators2 = self._get_rule(**kwargs)
-        return Any(rule1, rule2), validators1 + validators2
+        rule = Any(rule1, rule2)
+        rule.dispatch_keys = rule1.dispatch_keys + rule2.dispatch_keys
+        return rule, validators1 + validators2
 
     def _get_msvc_flag_with_value(self, **kwargs):
         kwargs["prefixes"] = [f + ":" for f in kwargs["flags"]]
@@ -685,6 +891,7 @@ class ArgumentParserEx(object):
             dest = "@anonymous_" + uuid.uuid4().hex[:8]
         validation_error_context = None
         rule = None
+        dispatch_keys = None
         validators = []
 
         if flags or prefixes:
@@ -708,6 +915,9 @@ class ArgumentParserEx(object):
                 value_isolation_rules.append(
                     All(remove_prefix(*prefixes), Not(IsEmpty()))
                 )
+                dispatch_keys = [DispatchKey(flags, prefixes, ignore_case)]
+            else:
+                dispatch_keys = [DispatchKey(flags, None, ignore_case)]
             setter = SetAttribute
             if append:
                 setter = AppendToAttribute
@@ -764,10 +974,13 @@ class ArgumentParserEx(object):
             rule = AppendTokensConsumedByRule(
                 raw_dest, rule, format=raw_format, handler=raw_handler
             )
+        if dispatch_keys is not None:
+            rule.dispatch_keys = dispatch_keys
         return rule, validators
 
     def _invalidate_parser(self):
         self._parser = None
+        self._cache.clear()
 
     def _ensure_parser_is_ready(self):
         if not self._parser:
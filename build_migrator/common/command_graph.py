@@ -0,0 +1,267 @@
+import os
+import re
+from build_migrator.common.os_ext import get_program_names
+
+
+_header_extensions = frozenset(
+    [".h", ".hh", ".hpp", ".hxx", ".h++", ".inc", ".inl", ".ipp", ".tcc"]
+)
+_source_extensions = frozenset(
+    [".c", ".cc", ".cp", ".cpp", ".cxx", ".c++", ".m", ".mm", ".s", ".asm"]
+)
+_copy_programs = frozenset(["cp", "ln", "install", "mv"])
+# Programs whose parsers may modify targets of inputs
+# (rename copied module, add post build commands)
+_modifying_programs = _copy_programs | frozenset(["objcopy", "strip"])
+# Options of install that take a value
+_install_value_options = frozenset(
+    ["-m", "-o", "-g", "-S", "--mode", "--owner", "--group"]
+)
+# Programs with /Fo, /OUT: etc. options
+_msvc_programs = frozenset(["cl", "link", "lib", "ml", "ml64", "armasm", "rc"])
+# Files that -lname may refer to
+_library_names = ("lib%s.a", "lib%s.so", "lib%s.dylib", "%s.lib")
+_option_value_split_re = re.compile(r"[=,]")
+_include_dir_options = ("-I", "-isystem", "-iquote", "-idirafter", "/I")
+
+
+def _basename(path):
+    return path[max(path.rfind("/"), path.rfind("\\")) + 1:]
+
+
+def _dirname(path):
+    return path[: max(path.rfind("/"), path.rfind("\\"), 0)]
+
+
+def _join(directory, name):
+    return directory.rstrip("/\\") + "/" + name
+
+
+def _get_copy_outputs(program, args, normalize):
+    paths = []
+    target_dir = None
+    no_target_dir = False
+    idx = 0
+    while idx < len(args):
+        arg = args[idx]
+        idx += 1
+        if arg == "--":
+            paths.extend(args[idx:])
+            break
+        if not arg.startswith("-") or arg == "-":
+            paths.append(arg)
+        elif arg in ("-t", "--target-directory") and idx < len(args):
+            target_dir = args[idx]
+            idx += 1
+        elif arg.startswith("--target-directory="):
+            target_dir = arg.split("=", 1)[1]
+        elif arg in ("-T", "--no-target-directory"):
+            no_target_dir = True
+        elif program == "install" and arg in _install_value_options:
+            idx += 1
+
+    if target_dir is not None:
+        return [_join(target_dir, _basename(p)) for p in paths]
+    if len(paths) == 1 and program == "ln":
+        # ln -s ../a.so => ./a.so
+        return [_basename(paths[0])]
+    if len(paths) < 2:
+        return []
+    sources, dest = paths[:-1], paths[-1]
+    if not no_target_dir and (
+        len(sources) > 1 or dest.endswith(("/", "\\")) or os.path.isdir(normalize(dest))
+    ):
+        return [_join(dest, _basename(p)) for p in sources]
+    return [dest]
+
+
+def _get_ar_outputs(args):
+    positional = [a for a in args if not a.startswith("-")]
+    if args and not args[0].startswith("-"):
+        mode = positional.pop(0)
+    else:
+        mode = args[0] if args else ""
+    if any(c in mode for c in "tpx"):
+        # Query or extract
+        return []
+    # Position (a, b, i) and count (N) modifiers take arguments
+    skip = sum(1 for c in mode if c in "abiN")
+    positional = positional[skip:]
+    return positional[:1]
+
+
+def _get_compiler_outputs(program, args):
+    outputs = []
+    compile_only = False
+    obj_dir = None
+    sources = []
+    msvc = program in _msvc_programs
+    idx = 0
+    while idx < len(args):
+        arg = args[idx]
+        idx += 1
+        if arg == "-o":
+            if idx < len(args):
+                outputs.append(args[idx])
+                idx += 1
+        elif arg.startswith("-o") and ("." in arg or "/" in arg):
+            outputs.append(arg[2:])
+        elif arg == "-c" or (msvc and arg == "/c"):
+            compile_only = True
+        elif msvc and arg[:1] in ("-", "/"):
+            option = arg[1:].lower()
+            if option.startswith(("fo", "fe")):
+                path = arg[3:]
+                if path.startswith(":"):
+                    path = path[1:]
+                if path.endswith(("/", "\\")):
+                    obj_dir = path
+                elif path:
+                    outputs.append(path)
+            elif option.startswith(("out:", "implib:")):
+                outputs.append(arg[arg.find(":") + 1:])
+        elif not arg.startswith("-"):
+            ext = os.path.splitext(arg)[1].lower()
+            if ext in _source_extensions:
+                sources.append(arg)
+
+    if not outputs and compile_only:
+        ext = ".obj" if msvc else ".o"
+        for source in sources:
+            name = os.path.splitext(_basename(source))[0] + ext
+            outputs.append(_join(obj_dir, name) if obj_dir else name)
+    return outputs
+
+
+# Finds files written by a command without parsing it, by looking at
+# options like -o, /Fo, /OUT:, destinations of cp/ln/install/mv,
+# archives of ar and redirections of output.
+# normalize: converts path as written in the command to full path
+# Returns list of full paths, None if outputs are unknown.
+def get_command_outputs(tokens, normalize, redirections=None):
+    program = get_program_names(tokens[0])[-1]
+    args = tokens[1:]
+    if program in _copy_programs:
+        outputs = _get_copy_outputs(program, args, normalize)
+    elif program == "ar":
+        outputs = _get_ar_outputs(args)
+    elif program in ("ranlib", "strip", "objcopy") and "-o" not in args:
+        # Files are modified in place, or the last argument is output
+        positional = [a for a in args if not a.startswith("-")]
+        outputs = positional if program == "ranlib" else positional[-1:]
+    else:
+        outputs = _get_compiler_outputs(program, args)
+    for redirection in redirections or []:
+        if redirection.get("dst") and redirection.get("op") in (">", ">>"):
+            if not redirection["dst"].isdigit():
+                outputs.append(redirection["dst"])
+    if not outputs:
+        return None
+    return [normalize(p) for p in outputs]
+
+
+# Yields strings of command that may be paths to input files: arguments
+# and values of options (-Wl,--version-script=a.map, /DEF:a.def, @a.rsp)
+def _get_path_candidates(args):
+    for arg in args:
+        yield arg
+        if arg[:1] in ("-", "/"):
+            for value in _option_value_split_re.split(arg)[1:]:
+                yield value
+            if ":" in arg:
+                yield arg.split(":", 1)[1]
+        elif arg[:1] == "@":
+            yield arg[1:]
+
+
+def _get_include_dirs(args):
+    for idx, arg in enumerate(args):
+        for option in _include_dir_options:
+            if arg.startswith(option):
+                if arg == option:
+                    if idx + 1 < len(args):
+                        yield args[idx + 1]
+                else:
+                    yield arg[len(option):]
+                break
+
+
+# Graph of outputs of commands in a build log and outputs of earlier
+# commands they read, approximated from command lines: arguments that
+# are paths to known outputs (-lfoo matches any libfoo.so or foo.lib),
+# and known headers in include directories and working directory.
+# Commands are expected to be added in log order, so outputs are
+# produced before they are read.
+class CommandGraph(object):
+    def __init__(self):
+        self._dependencies = {}  # output => outputs it depends on
+        self._outputs_by_name = {}  # file name => outputs
+        self._headers_by_dir = {}  # directory => headers in it
+        self._modified_by = {}  # output => outputs of commands that modify it
+        # Outputs read by commands with unknown outputs
+        self.unknown_command_inputs = set()
+
+    @property
+    def outputs(self):
+        return self._dependencies.keys()
+
+    # normalize: converts path as written in the command to full path
+    # is_required: command may be required if its outputs are unknown
+    # Returns list of outputs, None if they are unknown
+    def add_command(self, tokens, normalize, redirections=None, is_required=False):
+        outputs = get_command_outputs(tokens, normalize, redirections)
+        if outputs is None and not is_required:
+            return None
+        inputs = self._find_inputs(tokens[1:], normalize)
+        if outputs is None:
+            self.unknown_command_inputs.update(inputs)
+            return None
+        for output in outputs:
+            dependencies = self._dependencies.get(output)
+            if dependencies is None:
+                dependencies = self._dependencies[output] = set()
+                self._add_output(output)
+            dependencies.update(i for i in inputs if i != output)
+        if get_program_names(tokens[0])[-1] in _modifying_programs:
+            for path in inputs:
+                self._modified_by.setdefault(path, set()).update(outputs)
+        return outputs
+
+    def _add_output(self, output):
+        self._outputs_by_name.setdefault(_basename(output), set()).add(output)
+        if os.path.splitext(output)[1].lower() in _header_extensions:
+            self._headers_by_dir.setdefault(_dirname(output), set()).add(output)
+
+    def _find_inputs(self, args, normalize):
+        inputs = set()
+        outputs_by_name = self._outputs_by_name
+        for path in _get_path_candidates(args):
+            outputs = outputs_by_name.get(_basename(path))
+            if outputs:
+                path = normalize(path)
+                if path in outputs:
+                    inputs.add(path)
+            elif path.startswith("-l") and len(path) > 2:
+                name = path[2:]
+                for pattern in _library_names:
+                    inputs.update(outputs_by_name.get(pattern % name, ()))
+        headers_by_dir = self._headers_by_dir
+        if headers_by_dir:
+            inputs.update(headers_by_dir.get(normalize("."), ()))
+            for directory in _get_include_dirs(args):
+                inputs.update(headers_by_dir.get(normalize(directory), ()))
+        return inputs
+
+    # Returns given outputs, all outputs they depend on and outputs
+    # of commands that may modify their targets (e.g. ln, objcopy)
+    def get_dependencies(self, outputs):
+        result = set()
+        pending = list(outputs)
+        while pending:
+            output = pending.pop()
+            if output in result:
+                continue
+            result.add(output)
+            pending.extend(self._dependencies.get(output, ()))
+            pending.extend(self._modified_by.get(output, ()))
+        return result
@@ -0,0 +1,147 @@
+import collections
+import logging
+from multiprocessing.pool import ThreadPool
+import traceback
+
+from build_migrator.common import subprocess_ex
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeResult(object):
+    def __init__(self, cmd, retcode, stdout, stderr):
+        self.cmd = cmd
+        self.retcode = retcode
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+def _run_probe(commands, cwd, timeout, encoding, cache, inputs, list_dependencies):
+    key = None
+    if cache is not None and list_dependencies is not None:
+        key = cache.get_key(commands, cwd, encoding)
+        cached_results = cache.get(key)
+        if cached_results is not None:
+            return [ProbeResult(*r) for r in cached_results]
+
+    results = []
+    for cmd in commands:
+        try:
+            retcode, stdout, stderr = subprocess_ex.call_with_output(
+                cmd, timeout=timeout, encoding=encoding, cwd=cwd
+            )
+        except subprocess_ex.TimeoutExpired as e:
+            logger.error(str(e))
+            return None
+        except (OSError, ValueError) as e:
+            # Missing compiler, missing working directory, etc
+            logger.error("Failed to run %r: %s", " ".join(cmd), e)
+            return None
+        results.append(ProbeResult(cmd, retcode, stdout, stderr))
+
+    # Failed probes aren't cached: missing headers may be generated later
+    if key is not None and not any(r.retcode for r in results):
+        cache.put(
+            key,
+            [[r.cmd, r.retcode, r.stdout, r.stderr] for r in results],
+            list(inputs or []) + list_dependencies(results),
+            cwd,
+        )
+    return results
+
+
+# Runs header dependency probes (`cc -M`, `cl /Zs /showIncludes`, etc).
+#
+# With jobs=1, probes are executed immediately and synchronously.
+# Otherwise, probes are executed by a thread pool (compilers do the heavy
+# lifting in their own processes), while the caller keeps parsing the log.
+# Callbacks are invoked in submission order, either when the number of
+# pending probes exceeds the window size, or when wait() is called.
+# This keeps the resulting Build Object Model independent of probe timings.
+# If cache (ProbeCache) is provided, probes that declare their dependencies
+# (see submit()) are looked up in the cache before running.
+class DependencyScanner(object):
+    def __init__(self, jobs=1, timeout=None, window=None, cache=None):
+        self.jobs = max(jobs or 1, 1)
+        self.timeout = timeout
+        self.cache = cache
+        self._window = window or self.jobs * 4
+        self._pool = None
+        self._pending = collections.deque()
+
+    @property
+    def is_parallel(self):
+        return self.jobs > 1
+
+    # commands: list of command lines, executed in order in cwd.
+    # callback: called with a list of ProbeResult. Isn't called if
+    #           probe timed out or couldn't be run.
+    # inputs: source files of probed command.
+    # list_dependencies: function that extracts header paths from
+    #                    a list of ProbeResult. Required for caching.
+    def submit(
+        self,
+        commands,
+        cwd,
+        callback,
+        encoding="ascii",
+        inputs=None,
+        list_dependencies=None,
+    ):
+        args = (
+            commands,
+            cwd,
+            self.timeout,
+            encoding,
+            self.cache,
+            inputs,
+            list_dependencies,
+        )
+        if not self.is_parallel:
+            # Errors are handled as in _complete_next()
+            try:
+                results = _run_probe(*args)
+            except Exception:
+                logger.error(traceback.format_exc())
+                return
+            if results is not None:
+                callback(results)
+            return
+
+        if self._pool is None:
+            self._pool = ThreadPool(self.jobs)
+        async_result = self._pool.apply_async(_run_probe, args)
+        self._pending.append((async_result, callback))
+        while len(self._pending) > self._window:
+            self._complete_next()
+
+    def wait(self):
+        while self._pending:
+            self._complete_next()
+
+    # save_cache: False in forked child processes, their cache changes
+    # are merged into cache of the parent process (see ProbeCache.merge())
+    def close(self, save_cache=True):
+        # Pending probes are cancelled, running compilers are abandoned
+        self._pending.clear()
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self.cache is not None and save_cache:
+            self.cache.save()
+            logger.info(
+                "Probe cache: %d hits, %d misses", self.cache.hits, self.cache.misses
+            )
+
+    def _complete_next(self):
+        async_result, callback = self._pending.popleft()
+        try:
+            results = async_result.get()
+        except Exception:
+            logger.error(traceback.format_exc())
+            return
+        if results is not None:
+            callback(results)
+
@@ -0,0 +1,77 @@
+import os
+
+
+# Parses Makefile-style dependency file written by `cc -MD`/`-MMD`/`-MF`.
+# Returns list of (targets, prerequisites) tuples.
+# Supported syntax:
+# * line continuation: trailing backslash
+# * escaped spaces (`\ `), hashes (`\#`) and dollar signs (`$$`)
+# * phony targets without prerequisites (`-MP`)
+def parse_depfile(content):
+    rules = []
+    content = content.replace("\\\r\n", " ").replace("\\\n", " ")
+    for line in content.splitlines():
+        targets = None
+        words = []
+        word = []
+        idx = 0
+        length = len(line)
+        while idx < length:
+            c = line[idx]
+            if c == "\\" and idx + 1 < length and line[idx + 1] in " #":
+                word.append(line[idx + 1])
+                idx += 2
+                continue
+            if c == "$" and idx + 1 < length and line[idx + 1] == "$":
+                word.append("$")
+                idx += 2
+                continue
+            if c in " \t":
+                if word:
+                    words.append("".join(word))
+                    word = []
+            elif (
+                c == ":"
+                and targets is None
+                and (idx + 1 == length or line[idx + 1] in " \t")
+            ):
+                # Drive letters (c:\path) are followed by a slash, not by a space
+                if word:
+                    words.append("".join(word))
+                    word = []
+                targets = words
+                words = []
+            else:
+                word.append(c)
+            idx += 1
+        if word:
+            words.append("".join(word))
+        if targets is not None:
+            rules.append((targets, words))
+    return rules
+
+
+# Reads dependency file and returns list of prerequisites of its first rule.
+# Returns None if file doesn't exist, can't be parsed or is older
+# than any of the prerequisites (i.e. it is stale).
+# Relative paths are resolved against working_dir.
+def read_depfile(path, working_dir):
+    path = os.path.join(working_dir, path)
+    try:
+        depfile_mtime = os.path.getmtime(path)
+        with open(path, "r") as f:
+            rules = parse_depfile(f.read())
+    except (IOError, OSError, UnicodeDecodeError):
+        return None
+
+    if not rules:
+        return None
+
+    prerequisites = rules[0][1]
+    for prerequisite in prerequisites:
+        try:
+            if os.path.getmtime(os.path.join(working_dir, prerequisite)) > depfile_mtime:
+                return None
+        except OSError:
+            return None
+    return prerequisites
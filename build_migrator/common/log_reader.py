@@ -0,0 +1,246 @@
+import bz2
+import codecs
+import gzip
+import io
+import mmap
+import re
+
+try:
+    import lzma
+except ImportError:
+    # Python 2 or Python built without liblzma
+    lzma = None
+
+
+BLOCK_SIZE = 4 * 1024 * 1024
+BATCH_SIZE = 1024
+
+# Compression format => magic bytes at the beginning of the file
+_MAGIC = [
+    ("gzip", b"\x1f\x8b"),
+    ("xz", b"\xfd7zXZ\x00"),
+    ("bz2", b"BZh"),
+]
+
+
+def detect_compression(path):
+    with open(path, "rb") as f:
+        header = f.read(6)
+    for compression, magic in _MAGIC:
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+def _open_compressed(path, compression):
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "bz2":
+        return bz2.BZ2File(path, "rb")
+    if lzma is None:
+        raise ValueError("Can't read {}: lzma module is not available".format(path))
+    return lzma.open(path, "rb")
+
+
+def _read_blocks(f, block_size, size=None):
+    while size is None or size > 0:
+        block = f.read(block_size if size is None else min(block_size, size))
+        if not block:
+            break
+        if size is not None:
+            size -= len(block)
+        yield block
+
+
+def _map_file(f):
+    try:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError, io.UnsupportedOperation):
+        # Empty file, pipe, etc.
+        return None
+
+
+def _map_blocks(f, block_size, start=0, end=None):
+    mapped = _map_file(f)
+    if mapped is None:
+        f.seek(start)
+        size = None if end is None else end - start
+        for block in _read_blocks(f, block_size, size):
+            yield block
+        return
+    try:
+        end = len(mapped) if end is None else min(end, len(mapped))
+        for offset in range(start, end, block_size):
+            yield mapped[offset:min(offset + block_size, end)]
+    finally:
+        mapped.close()
+
+
+# Splits stream of binary blocks into lists of stripped lines.
+# Lines are split on \n, \r\n and \r, same as in universal newlines mode.
+# Blocks are cut after the last line break, which is never a part of
+# multibyte UTF-8 sequence, so decoding block at once is safe.
+def _split_lines(blocks, batch_size):
+    # Pieces of incomplete last line, joined once its end is found,
+    # so that long lines are not copied again for every block
+    remainder = []
+    batch = []
+    for block in blocks:
+        end = block.rfind(b"\n") + 1
+        if end == 0:
+            # Classic Mac OS line endings. Trailing \r may be
+            # followed by \n in the next block, don't cut after it.
+            end = block.rfind(b"\r", 0, len(block) - 1) + 1
+        if end == 0:
+            remainder.append(block)
+            continue
+        remainder.append(block[:end])
+        text = b"".join(remainder).decode("utf-8", "replace")
+        remainder = [block[end:]]
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        lines = text.split("\n")
+        # text ends with newline, last element is always empty
+        lines.pop()
+        batch.extend([line.strip() for line in lines])
+        start = 0
+        while len(batch) - start >= batch_size:
+            yield batch[start:start + batch_size]
+            start += batch_size
+        del batch[:start]
+    remainder = b"".join(remainder)
+    if remainder:
+        text = remainder.decode("utf-8", "replace")
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        lines = text.split("\n")
+        if not lines[-1]:
+            lines.pop()
+        batch.extend([line.strip() for line in lines])
+    if batch:
+        yield batch
+
+
+def _read_log_blocks(path, block_size, start=0, end=None):
+    compression = detect_compression(path)
+    if compression is None:
+        with open(path, "rb") as f:
+            for block in _map_blocks(f, block_size, start, end):
+                yield block
+    elif start or end is not None:
+        raise ValueError("Compressed log can't be read partially: " + path)
+    else:
+        with _open_compressed(path, compression) as f:
+            for block in _read_blocks(f, block_size):
+                yield block
+
+
+# Reads build log in batches of stripped lines.
+# gzip, xz and bz2 logs are decompressed on the fly, uncompressed logs
+# are memory-mapped. Lines are decoded as UTF-8, undecodable bytes
+# are replaced.
+# Uncompressed log can be read partially, from start to end offset
+# (see split_log()).
+def read_log_lines(
+    path, batch_size=BATCH_SIZE, block_size=BLOCK_SIZE, start=0, end=None
+):
+    blocks = _read_log_blocks(path, block_size, start, end)
+    for batch in _split_lines(blocks, batch_size):
+        yield batch
+
+
+# Reads build log in chunks of text, cut regardless of line breaks,
+# for logs that may consist of a single huge line. Decoded the same
+# way as read_log_lines(), line breaks are kept as is.
+def read_log_text(path, block_size=BLOCK_SIZE):
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    for block in _read_log_blocks(path, block_size):
+        text = decoder.decode(block)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+# Lines are split on \n, \r\n and \r (see _split_lines())
+def _find_line_start(mapped, pos):
+    line_start = mapped.rfind(b"\n", 0, pos) + 1
+    return mapped.rfind(b"\r", line_start, pos) + 1 or line_start
+
+
+def _find_line_end(mapped, pos):
+    line_end = mapped.find(b"\n", pos)
+    if line_end == -1:
+        line_end = len(mapped)
+    cr = mapped.find(b"\r", pos, line_end)
+    return line_end if cr == -1 else cr
+
+
+def _is_continued(mapped, line_end, carryover_regex=None):
+    # Line break may be \r\n
+    if line_end > 0 and mapped[line_end - 1:line_end] == b"\r":
+        line_end -= 1
+    line_start = _find_line_start(mapped, line_end)
+    line = mapped[line_start:line_end]
+    if line.strip().endswith(b"\\"):
+        return True
+    return carryover_regex is not None and bool(carryover_regex.search(line))
+
+
+# Splits uncompressed log into at most `count` (start, end) ranges of
+# whole lines, each at least min_size bytes long. Ranges start after \n
+# and never separate lines of multi-line command (ending with '\'), or
+# a line matching carryover_pattern from the next line.
+# Returns None if log is compressed or empty.
+def split_log(path, count, min_size=0, carryover_pattern=None):
+    if detect_compression(path) is not None:
+        return None
+    carryover_regex = None
+    if carryover_pattern is not None:
+        carryover_regex = re.compile(carryover_pattern.encode("utf-8"), re.IGNORECASE)
+    with open(path, "rb") as f:
+        mapped = _map_file(f)
+        if mapped is None:
+            return None
+        try:
+            size = len(mapped)
+            count = max(1, min(count, size // max(min_size, 1)))
+            ranges = []
+            start = 0
+            for idx in range(1, count):
+                end = max(start, size * idx // count)
+                end = mapped.find(b"\n", end)
+                while end != -1 and _is_continued(mapped, end, carryover_regex):
+                    end = mapped.find(b"\n", end + 1)
+                if end == -1:
+                    break
+                ranges.append((start, end + 1))
+                start = end + 1
+            if start < size:
+                ranges.append((start, size))
+            return ranges
+        finally:
+            mapped.close()
+
+
+# Finds stripped lines of uncompressed log that contain one of the
+# keywords. Yields (offset of line, line) in log order.
+# Much faster than reading every line if keywords are rare.
+def find_log_lines(path, keywords):
+    with open(path, "rb") as f:
+        mapped = _map_file(f)
+        if mapped is None:
+            return
+        try:
+            line_starts = set()
+            for keyword in keywords:
+                keyword = keyword.encode("utf-8")
+                pos = mapped.find(keyword)
+                while pos != -1:
+                    line_starts.add(_find_line_start(mapped, pos))
+                    pos = mapped.find(keyword, pos + len(keyword))
+            for line_start in sorted(line_starts):
+                line_end = _find_line_end(mapped, line_start)
+                line = mapped[line_start:line_end].decode("utf-8", "replace")
+                yield line_start, line.strip()
+        finally:
+            mapped.close()
@@ -8,6 +8,7 @@ import logging
 import os
 import re
 import platform
+from build_migrator.common.bounded_cache import BoundedCache
 
 
 _logger = logging.getLogger(__name__)
@@ -72,6 +73,62 @@ def normalize_path(path):
     return Platform.normalize_path(path)
 
 
+_program_ext_re = re.compile(r"\.(?:exe|bat|sh)$", re.IGNORECASE)
+
+
+def get_program_names(path):
+    r"""
+        Get lower case names under which get_program_path_re() of any platform
+        may match the program:
+            * get_program_names('/usr/bin/x86_64-linux-gnu-gcc') =>
+              ['x86_64-linux-gnu-gcc', 'linux-gnu-gcc', 'gnu-gcc', 'gcc']
+            * get_program_names('C:\VC\bin\CL.EXE') => ['cl']
+        Used to look up program handlers by name instead of matching
+        every get_program_path_re() regex.
+    """
+    filename = path.strip("{}$")
+    filename = filename[max(filename.rfind("/"), filename.rfind("\\")) + 1:]
+    stem = _program_ext_re.sub("", filename.lower())
+    names = [stem]
+    idx = stem.find("-", 1)
+    while idx != -1:
+        names.append(stem[idx + 1:])
+        idx = stem.find("-", idx + 1)
+    return names
+
+
+# Regex returned by get_program_path_re.
+# Whether it matches depends only on the program's filename, so match()
+# results are memoized by filename (build logs invoke the same few
+# programs over and over again).
+# names are program names passed to get_program_path_re.
+class ProgramPathRe(object):
+    def __init__(self, regex, separators, names=(), cache_size=1024):
+        self.regex = regex
+        self.pattern = regex.pattern
+        self.names = tuple(names)
+        self._separators = separators
+        self._cache = BoundedCache(cache_size)
+
+    def _get_filename(self, path):
+        idx = max(path.rfind(sep) for sep in self._separators)
+        return path[idx + 1:]
+
+    def match(self, path):
+        filename = self._get_filename(path)
+        result = self._cache.get(filename)
+        if result is None:
+            result = self.regex.match(filename) or False
+            self._cache.put(filename, result)
+        return result or None
+
+    def search(self, string):
+        return self.regex.search(string)
+
+    def cache_info(self):
+        return self._cache.info()
+
+
 class Windows:
     # Allowed values:
     # * False = win32 is not supported
@@ -196,7 +253,9 @@ class Windows:
         else:
             full_re = parts[0]
 
-        return re.compile(full_re, re.IGNORECASE)
+        return ProgramPathRe(
+            re.compile(full_re, re.IGNORECASE), ["\\", "/"], names=(name,) + alts
+        )
 
     # TODO: move to common?
     @classmethod
@@ -416,7 +475,7 @@ class Unix:
         else:
             full_re = parts[0]
 
-        return re.compile(full_re)
+        return ProgramPathRe(re.compile(full_re), ["/"], names=(name,) + alts)
 
     @classmethod
     def normalize_path(cls, path):
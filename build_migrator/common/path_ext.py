@@ -39,3 +39,126 @@ def is_subpath(a, b):
         if len(b) == len(a) or b[len(a)] == "/":
             return True
     return False
+
+
+# Component-wise prefix tree of directories.
+# closest() returns the same result as closest_dir(path, dirs, ...),
+# but visits only the path's components instead of computing relative
+# path to each directory.
+class DirTrie(object):
+    class _Node(object):
+        __slots__ = ("children", "best")
+
+        def __init__(self):
+            self.children = {}
+            # Directory in this subtree that is the closest to this node:
+            # (depth relative to this node, index, dir)
+            self.best = None
+
+    def __init__(self, dirs=None, cwd=os.curdir):
+        self._root = self._Node()
+        self._count = 0
+        for dir in dirs or []:
+            self.add(dir, cwd=cwd)
+
+    # Returns path components and their lookup keys
+    @staticmethod
+    def _split(path, cwd):
+        path = os.path.abspath(os.path.join(cwd, path))
+        if path.endswith(os.sep):
+            # root directory
+            path = path[:-1]
+        return path.split(os.sep), os.path.normcase(path).split(os.sep)
+
+    def add(self, dir, cwd=os.curdir):
+        _, keys = self._split(dir, cwd)
+        index = self._count
+        self._count += 1
+
+        depth = len(keys)
+        node = self._root
+        for idx in range(depth + 1):
+            if node.best is None or (depth - idx, index) < node.best[:2]:
+                node.best = (depth - idx, index, dir)
+            if idx < depth:
+                node = node.children.setdefault(keys[idx], self._Node())
+
+    def closest(self, path, max_relpath_level=-1, cwd=os.curdir):
+        names, keys = self._split(path, cwd)
+        nodes = []
+        node = self._root
+        for key in keys:
+            node = node.children.get(key)
+            if node is None:
+                break
+            nodes.append(node)
+
+        # Every directory is considered relative to the deepest common
+        # node it shares with the path. Relative path is
+        # '../' * level + path components below that node.
+        count = len(names)
+        # remainder_lengths[idx] = len(os.sep.join(names[idx:]))
+        remainder_lengths = [0] * (count + 1)
+        for idx in range(count - 1, -1, -1):
+            remainder_lengths[idx] = len(names[idx])
+            if idx + 1 < count:
+                remainder_lengths[idx] += 1 + remainder_lengths[idx + 1]
+
+        result = None
+        for depth in range(len(nodes), 0, -1):
+            level, index, dir = nodes[depth - 1].best
+            if depth < count:
+                length = 3 * level + remainder_lengths[depth]
+            else:
+                length = 3 * level - 1 if level else 1
+            if result is not None and (length, index) >= result[:2]:
+                continue
+            if max_relpath_level >= 0:
+                total_level = level
+                if depth < count and names[depth].startswith(".."):
+                    # relpath_level() counts '..' at the beginning
+                    # of a file name too
+                    total_level += relpath_level(os.sep.join(names[depth:]))
+                if total_level > max_relpath_level:
+                    continue
+            result = (length, index, dir, depth, level)
+
+        if result is None:
+            return None
+        _, _, dir, depth, level = result
+        relpath = os.sep.join([os.pardir] * level + names[depth:]) or os.curdir
+        return dir, relpath
+
+
+# Component-wise prefix tree of paths with associated values.
+# find() returns (prefix, value) of the first added path that is equal to
+# or is a parent of given path. Same as checking each added path in order:
+# path.startswith(prefix) and path[len(prefix)] == sep
+class PathPrefixTrie(object):
+    def __init__(self, sep="/"):
+        self.sep = sep
+        self._root = {}
+        self._count = 0
+
+    def add(self, path, value):
+        node = self._root
+        for key in path.split(self.sep):
+            node = node.setdefault(key, {})
+        # (index, prefix, value) is stored under None key
+        if None not in node:
+            node[None] = (self._count, path, value)
+        self._count += 1
+
+    def find(self, path):
+        result = None
+        node = self._root
+        for key in path.split(self.sep):
+            node = node.get(key)
+            if node is None:
+                break
+            entry = node.get(None)
+            if entry is not None and (result is None or entry[0] < result[0]):
+                result = entry
+        if result is None:
+            return None
+        return result[1], result[2]
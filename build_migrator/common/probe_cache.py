@@ -0,0 +1,194 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import traceback
+
+
+logger = logging.getLogger(__name__)
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime, st.st_size]
+
+
+def _find_program(program, cwd):
+    if os.path.dirname(program):
+        return os.path.join(cwd, program)
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        path = os.path.join(directory, program)
+        if os.path.isfile(path):
+            return path
+    return program
+
+
+# On-disk cache for header dependency probes (`cc -M`, `cl /showIncludes`, etc)
+#
+# Entry key is computed from probe command lines, working directory and
+# identity (path, mtime, size) of the invoked compilers.
+# Entry is valid as long as mtime and size of the source files and every
+# recorded header stay the same.
+# Entries are stored in separate files, index.json keeps track of entry sizes
+# and access order. Least recently used entries are evicted by save(),
+# when total size exceeds max_size.
+class ProbeCache(object):
+    INDEX_FILENAME = "index.json"
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._program_identities = {}
+        self._index = {}  # key => [size, last access tick]
+        self._tick = 0
+
+        index_path = os.path.join(self.directory, self.INDEX_FILENAME)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "r") as f:
+                    self._index = json.load(f)
+            except Exception:
+                logger.warning(traceback.format_exc())
+                self._index = {}
+        for _, tick in self._index.values():
+            self._tick = max(self._tick, tick)
+
+    def _get_program_identity(self, program, cwd):
+        key = (program, cwd)
+        identity = self._program_identities.get(key)
+        if identity is None:
+            path = _find_program(program, cwd)
+            identity = [path, _stat(path)]
+            self._program_identities[key] = identity
+        return identity
+
+    def get_key(self, commands, cwd, encoding):
+        programs = [self._get_program_identity(cmd[0], cwd) for cmd in commands]
+        data = json.dumps([programs, commands, cwd, encoding])
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def _get_entry_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    # Returns list of [cmd, retcode, stdout, stderr] or None
+    def get(self, key):
+        entry = None
+        with self._lock:
+            if key in self._index:
+                self._tick += 1
+                self._index[key][1] = self._tick
+        try:
+            with open(self._get_entry_path(key), "r") as f:
+                data = f.read()
+            entry = json.loads(data)
+        except (IOError, OSError, ValueError):
+            pass
+
+        if entry is not None:
+            for path, stat in entry["files"]:
+                if _stat(path) != stat:
+                    entry = None
+                    break
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if key not in self._index:
+                    # Entry written by a process that didn't save the index
+                    self._tick += 1
+                    self._index[key] = [len(data), self._tick]
+        return entry["results"] if entry else None
+
+    def put(self, key, results, files, cwd):
+        stats = []
+        for path in files:
+            path = os.path.join(cwd, path)
+            stat = _stat(path)
+            if stat is None:
+                # Can't validate this entry later
+                return
+            stats.append([path, stat])
+
+        data = json.dumps({"results": results, "files": stats})
+        path = self._get_entry_path(key)
+        try:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "w") as f:
+                f.write(data)
+        except (IOError, OSError):
+            logger.warning(traceback.format_exc())
+            return
+
+        with self._lock:
+            self._tick += 1
+            self._index[key] = [len(data), self._tick]
+
+    # Returns state of this cache, which is used by get_changes()
+    def get_checkpoint(self):
+        with self._lock:
+            return (self._tick, self.hits, self.misses)
+
+    # Returns changes made since checkpoint: ([[key, size], ...] of entries
+    # in access order, hits, misses). Forked child processes don't save()
+    # the cache, they pass these changes to the parent process instead.
+    def get_changes(self, checkpoint):
+        tick, hits, misses = checkpoint
+        with self._lock:
+            entries = sorted(
+                (k for k, (_, t) in self._index.items() if t > tick),
+                key=lambda k: self._index[k][1],
+            )
+            return (
+                [[key, self._index[key][0]] for key in entries],
+                self.hits - hits,
+                self.misses - misses,
+            )
+
+    # Applies changes returned by get_changes() of another instance
+    def merge(self, changes):
+        entries, hits, misses = changes
+        with self._lock:
+            for key, size in entries:
+                self._tick += 1
+                self._index[key] = [size, self._tick]
+            self.hits += hits
+            self.misses += misses
+
+    def save(self):
+        with self._lock:
+            total_size = sum(size for size, _ in self._index.values())
+            if total_size > self.max_size:
+                lru_keys = sorted(self._index.keys(), key=lambda k: self._index[k][1])
+                for key in lru_keys:
+                    if total_size <= self.max_size:
+                        break
+                    total_size -= self._index.pop(key)[0]
+                    try:
+                        os.remove(self._get_entry_path(key))
+                    except OSError:
+                        pass
+
+            if not os.path.exists(self.directory):
+                os.makedirs(self.directory)
+            # Index is replaced atomically, so that it's never truncated
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=self.INDEX_FILENAME, dir=self.directory
+            )
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(self._index, f)
+                os.replace(tmp_path, os.path.join(self.directory, self.INDEX_FILENAME))
+            except Exception:
+                os.remove(tmp_path)
+                raise
@@ -1,5 +1,6 @@
 import os
 import subprocess
+import threading
 
 
 # Python 2 CalledProcessError doesn't provide stderr
@@ -45,3 +46,53 @@ def check_output(args, **kwargs):
     if retcode:
         raise CalledProcessError(retcode, args, stdout=stdout, stderr=stderr)
     return stdout, stderr
+
+
+class TimeoutExpired(Exception):
+    def __init__(self, cmd, timeout):
+        self.cmd = cmd
+        self.timeout = timeout
+
+    def __str__(self):
+        return "Command %r timed out after %r seconds" % (self.cmd, self.timeout)
+
+
+# Same as check_output(), but doesn't raise on non-zero exit code.
+# Process is killed if it doesn't finish in `timeout` seconds.
+# threading.Timer is used instead of communicate(timeout=...),
+# which is not available in Python 2.
+def call_with_output(args, timeout=None, encoding="ascii", **kwargs):
+    assert kwargs.get("stdout") is None
+    assert kwargs.get("stderr") is None
+    kwargs["stdout"] = subprocess.PIPE
+    kwargs["stderr"] = subprocess.PIPE
+    cwd = kwargs.get("cwd")
+    if cwd and not os.path.exists(cwd):
+        raise ValueError("Directory does not exist: %r" % cwd)
+    process = subprocess.Popen(args, **kwargs)
+    timer = None
+    timed_out = []
+    if timeout:
+
+        def _kill():
+            timed_out.append(True)
+            process.kill()
+
+        timer = threading.Timer(timeout, _kill)
+        timer.start()
+    try:
+        stdout, stderr = process.communicate()
+    except Exception:  # Including KeyboardInterrupt
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+    if timed_out:
+        raise TimeoutExpired(args, timeout)
+    if type(stdout) is not str:
+        stdout = stdout.decode(encoding, "replace")
+    if type(stderr) is not str:
+        stderr = stderr.decode(encoding, "replace")
+    return process.poll(), stdout, stderr
@@ -0,0 +1,96 @@
+from collections import deque
+
+
+# Finds which of the patterns occur in a string, in a single pass
+# over the string (Aho-Corasick automaton).
+# Patterns may be added at any time, the automaton is rebuilt on the
+# next search after that.
+class SubstringMatcher(object):
+    def __init__(self, patterns=None):
+        self._patterns = []
+        self._pattern_indices = {}  # pattern => index
+        self._built = True
+        self._goto = [{}]  # state => {char => state}
+        self._fail = [0]
+        self._output = [()]  # state => indices of patterns ending here
+        self._first_char = None  # set if all patterns start with it
+        for pattern in patterns or []:
+            self.add(pattern)
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def add(self, pattern):
+        if not pattern:
+            raise ValueError("Pattern must not be empty")
+        if pattern in self._pattern_indices:
+            return
+        self._pattern_indices[pattern] = len(self._patterns)
+        self._patterns.append(pattern)
+        self._built = False
+
+    def _build(self):
+        goto = [{}]
+        output = [[]]
+        for index, pattern in enumerate(self._patterns):
+            state = 0
+            for c in pattern:
+                next_state = goto[state].get(c)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][c] = next_state
+                    goto.append({})
+                    output.append([])
+                state = next_state
+            output[state].append(index)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and c not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(c, 0)
+                # States are visited in BFS order, so output of
+                # the fail state is already complete
+                output[next_state].extend(output[fail[next_state]])
+
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(o) for o in output]
+        first_chars = set(goto[0])
+        self._first_char = first_chars.pop() if len(first_chars) == 1 else None
+        self._built = True
+
+    # Returns patterns that occur in string, in the order they were added
+    def find_all(self, string):
+        if not self._built:
+            self._build()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        first_char = self._first_char
+
+        found = set()
+        state = 0
+        idx = 0
+        length = len(string)
+        while idx < length:
+            if state == 0 and first_char is not None:
+                # Nothing can match before the next occurrence
+                # of the first character
+                idx = string.find(first_char, idx)
+                if idx == -1:
+                    break
+            c = string[idx]
+            idx += 1
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if output[state]:
+                found.update(output[state])
+
+        return [self._patterns[index] for index in sorted(found)]
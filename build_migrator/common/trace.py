@@ -0,0 +1,38 @@
+import io
+import json
+
+
+# Structured trace of parse/optimize/generate steps.
+# Each event is written as one JSON object per line (JSONL):
+#   {"event": "register", "target": {...}}
+# Tracing is disabled by default. Call sites must check `tracer.enabled`
+# before preparing event data, so disabled tracing costs nothing
+# but an attribute lookup.
+class TraceSink(object):
+    def __init__(self):
+        self._file = None
+        self.enabled = False
+
+    def open(self, path):
+        self.close()
+        self._file = io.open(path, "w", encoding="utf-8")
+        self.enabled = True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.enabled = False
+
+    def write(self, event, **fields):
+        if self._file is None:
+            return
+        fields["event"] = event
+        # BOM may contain values that are not JSON serializable
+        # (e.g. sets), trace their repr() instead of failing
+        self._file.write(
+            json.dumps(fields, sort_keys=True, default=repr) + "\n"
+        )
+
+
+tracer = TraceSink()
@@ -203,6 +203,7 @@ class BuildMigrator(object):
                 "show_settings",
                 "list_modules",
                 "verbose",
+                "trace_file",
                 "list_presets",
                 "parsers",
                 "builders",
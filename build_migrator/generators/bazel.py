@@ -1,7 +1,6 @@
 import argparse
 import logging
 import os
-from pprint import pformat
 import re
 import shutil
 import sys
@@ -13,9 +12,11 @@ from build_migrator.parsers.build_log_parser import (
     BuildLogParserContext as ParserContext,
 )
 from build_migrator.common.os_ext import get_host_system_name, get_platform
+from build_migrator.common.trace import tracer
 from build_migrator.helpers import (
     get_minified_target,
     get_target_outputs,
+    MinifiedTargetFormatter,
     ModuleTypes,
 )
 
@@ -168,9 +169,13 @@ class BazelContext(EntryPoint, Generator):
         with open(os.path.join(self.out_dir, self.build_filename), "w") as f:
             self.file = f
             self.write_header(targets)
+            debug = logger.isEnabledFor(logging.DEBUG)
             for target in targets:
-                logger.debug(" > Generate Bazel for target:")
-                logger.debug(pformat(get_minified_target(target)))
+                if debug:
+                    logger.debug(" > Generate Bazel for target:")
+                    logger.debug("%s", MinifiedTargetFormatter(target))
+                if tracer.enabled:
+                    tracer.write("generate", target=get_minified_target(target))
                 success = False
                 builtin_generator = self._builtin_generators.get(target["type"])
                 if builtin_generator:
@@ -7,7 +7,6 @@ import argparse
 import logging
 import glob
 import os
-from pprint import pformat
 import re
 import shutil
 import sys
@@ -15,6 +14,7 @@ import traceback
 
 from build_migrator.common.algorithm import flatten_list
 from build_migrator.common.os_ext import get_host_system_name, get_platform, Unix
+from build_migrator.common.trace import tracer
 
 from build_migrator.parsers.build_log_parser import (
     BuildLogParserContext as ParserContext,
@@ -22,6 +22,7 @@ from build_migrator.parsers.build_log_parser import (
 from ..helpers import (
     get_minified_target,
     get_minified_targets,
+    MinifiedTargetFormatter,
     resolve_properties,
     remove_value_from_property,
     ModuleTypes,
@@ -955,13 +956,23 @@ class CMakeContext(EntryPoint, Generator):
         optimizers = list(filter(lambda g: hasattr(g, "optimize"), generators))
         generators = list(filter(lambda g: hasattr(g, "generate"), generators))
 
+        debug = logger.isEnabledFor(logging.DEBUG)
         for optimizer in optimizers:
             logger.debug(type(optimizer).__name__)
             try:
                 result = optimizer.optimize(targets)
-                if result != targets:
-                    logger.debug(" > Modified:")
-                    logger.debug(pformat(get_minified_targets(result)))
+                # Comparing (and printing) the whole BOM is expensive,
+                # do it only if the difference is going to be reported
+                if (debug or tracer.enabled) and result != targets:
+                    if debug:
+                        logger.debug(" > Modified:")
+                        logger.debug("%s", MinifiedTargetFormatter(result))
+                    if tracer.enabled:
+                        tracer.write(
+                            "optimize",
+                            optimizer=type(optimizer).__name__,
+                            targets=get_minified_targets(result),
+                        )
                 targets = result
             except Exception:
                 logging.error(traceback.format_exc())
@@ -973,11 +984,15 @@ class CMakeContext(EntryPoint, Generator):
             if target.get("skip"):
                 # custom BOM attribute for cmake generator
                 # used by CMakeRemoveRedundantDirectoryTargets
-                logger.debug(" > Skipping target due to 'skip' attribute:")
-                logger.debug(pformat(get_minified_target(target)))
+                if debug:
+                    logger.debug(" > Skipping target due to 'skip' attribute:")
+                    logger.debug("%s", MinifiedTargetFormatter(target))
                 continue
-            logger.debug(" > Generate CMake for target:")
-            logger.debug(pformat(get_minified_target(target)))
+            if debug:
+                logger.debug(" > Generate CMake for target:")
+                logger.debug("%s", MinifiedTargetFormatter(target))
+            if tracer.enabled:
+                tracer.write("generate", target=get_minified_target(target))
             success = False
             builtin_generator = self._builtin_generators.get(target["type"])
             if builtin_generator:
@@ -1,6 +1,7 @@
 import argparse
 import copy
 import os
+from pprint import pformat
 
 
 class ModuleTypes:
@@ -205,25 +206,50 @@ def get_source_file_reference(
     }
 
 
-def minify_target(target):
+# Replaces content of target and its dependencies with "...".
+# copy: return minified copy instead of modifying target in place. Only
+# containers that are modified are copied, other values are shared.
+def _minify_target(target, copy):
+    if copy:
+        target = dict(target)
     if "content" in target:
         target["content"] = "..."
-    for t in target.get("dependencies") or []:
-        if isinstance(t, dict):
-            minify_target(t)
+    dependencies = target.get("dependencies")
+    if dependencies:
+        dependencies = [
+            _minify_target(t, copy) if isinstance(t, dict) else t
+            for t in dependencies
+        ]
+        if copy:
+            target["dependencies"] = dependencies
     return target
 
 
+def minify_target(target):
+    return _minify_target(target, copy=False)
+
+
 def get_minified_target(target):
-    target = copy.deepcopy(target)
-    minify_target(target)
-    return target
+    return _minify_target(target, copy=True)
 
 
 def get_minified_targets(targets):
     return list(map(get_minified_target, targets))
 
 
+# Pretty-prints minified target (or list of targets) on demand.
+# Pass it as logging argument to defer formatting until record is emitted:
+#   logger.debug("%s", MinifiedTargetFormatter(target))
+class MinifiedTargetFormatter(object):
+    def __init__(self, target):
+        self.target = target
+
+    def __str__(self):
+        if isinstance(self.target, list):
+            return pformat(get_minified_targets(self.target))
+        return pformat(get_minified_target(self.target))
+
+
 class ArgumentParserNoExit(argparse.ArgumentParser):
     """ArgumentParser subclass that does not call exit() on error()
     """
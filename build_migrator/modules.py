@@ -151,6 +151,40 @@ class Parser(object):
     - priority : int
         optional, default value: maxint
         Parsers are ordered by this attribute
+    - programs : tuple of str
+        optional
+        Names of programs (see get_program_path_re()) handled by this
+        parser. If set, targets with "tokens" are passed to the parser
+        only if first token may be one of these programs.
+    - line_keywords : tuple of str
+        optional
+        Substrings of build log lines this parser may need, for parsers
+        without 'programs'. Empty tuple if parser doesn't need any
+        lines that don't invoke known programs. Lines of make and ninja
+        logs are skipped before parsing if they contain neither program
+        names nor keywords of applicable parsers. If some applicable
+        parser has neither 'programs' nor 'line_keywords', lines are
+        not skipped.
+    - parallel_safe : bool
+        optional, default value: False
+        Parser uses no context but working_dir, normalize_path() and
+        platform_name, and doesn't register targets. Its state between
+        lines depends only on lines containing its 'line_keywords'.
+        Parallel safe parsers at the beginning of the chain may run
+        in worker processes (see --parallel_shards).
+    - carryover_regex : str
+        optional
+        Regular expression for lines that affect parsing of the following
+        lines, e.g. shell variable assignments attached to the next
+        command. Such lines and lines that follow them are not skipped
+        by line filter, and --parallel_shards doesn't split logs after
+        them.
+    - text_chunks : bool
+        optional, default value: False
+        If set for any applicable parser, log is passed to parsers in
+        chunks of text ({"text": ...}) cut regardless of line breaks,
+        instead of lines. For logs that may consist of a single huge
+        line, e.g. minified compile_commands.json.
 
     Methods
     -------
@@ -169,6 +203,13 @@ class Parser(object):
         Returns:
             If Parser is not applicable: same target
             Otherwise: new target, or list of targets
+    - parse_arguments(self, tokens : list of str)
+        optional, for parsers with 'programs'
+        Parses command line of a command, None if the command isn't
+        handled by this parser. Result must depend only on tokens.
+        With --parallel_shards it is called in worker processes, on
+        pickled copy of the parser, and passed to parse() in target
+        (see ParserBase.get_parsed_arguments()).
     """
 
     pass
@@ -1,10 +1,10 @@
 import argparse
 import logging
-from pprint import pformat
 import traceback
-from build_migrator.helpers import get_minified_targets
+from build_migrator.helpers import get_minified_targets, MinifiedTargetFormatter
 from build_migrator.modules import EntryPoint, Optimizer
 from build_migrator.common.os_ext import get_host_system_name
+from build_migrator.common.trace import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -43,15 +43,26 @@ class OptimizerContext(Optimizer, EntryPoint):
             logger.debug("Skipping optimizations due to --dont_optimize flag")
             return targets
 
-        logger.debug(" > Begin optimizing:")
-        logger.debug(pformat(get_minified_targets(targets)))
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(" > Begin optimizing:")
+            logger.debug("%s", MinifiedTargetFormatter(targets))
         for optimizer in optimizers:
             logger.debug(type(optimizer).__name__)
             try:
                 result = optimizer.optimize(targets)
-                if result != targets:
-                    logger.debug(" > Optimized:")
-                    logger.debug(pformat(get_minified_targets(result)))
+                # Comparing (and printing) the whole BOM is expensive,
+                # do it only if the difference is going to be reported
+                if (debug or tracer.enabled) and result != targets:
+                    if debug:
+                        logger.debug(" > Optimized:")
+                        logger.debug("%s", MinifiedTargetFormatter(result))
+                    if tracer.enabled:
+                        tracer.write(
+                            "optimize",
+                            optimizer=type(optimizer).__name__,
+                            targets=get_minified_targets(result),
+                        )
                 targets = result
             except Exception:
                 logging.error(traceback.format_exc())
@@ -51,6 +51,16 @@ class CommandTokenizer(Parser):
     subcommand_split_re = re.compile(r"`(.+)`|\$\((.+)\)")
 
     priority = 4
+    line_keywords = ()
+    parallel_safe = True
+    # Lines ending with shell variable assignments, parameters are
+    # attached to the next command (see self.parameters)
+    carryover_regex = (
+        r"""(?:^|[;&|(])\s*(?:set\s+)?"""
+        r"""[^\s=;&|()"']+=(?:"[^"]*"|'[^']*'|[^\s;&|()"'])*"""
+        r"""(?:\s+[^\s=;&|()"']+=(?:"[^"]*"|'[^']*'|[^\s;&|()"'])*)*"""
+        r"""\s*\)?\s*$"""
+    )
 
     @staticmethod
     def add_arguments(arg_parser):
@@ -9,6 +9,8 @@ logger = logging.getLogger(__name__)
 # Also used by StraceTokenizer
 class ContextWorkingDirWorkaround(Parser):
     priority = 2
+    line_keywords = ()
+    parallel_safe = True
 
     @staticmethod
     def add_arguments(arg_parser):
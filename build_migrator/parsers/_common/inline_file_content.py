@@ -11,16 +11,27 @@ logger = logging.getLogger(__name__)
 # echo line1 > C:\Temp\nm16A5.tmp
 # echo line2 >> C:\Temp\nm16A5.tmp
 # echo line3 >> C:\Temp\nm16A5.tmp
+# Lines of consecutive echo commands are collected into lists and
+# joined into file target's content when any other target arrives.
 class InlineFileContent(Parser):
     priority = 4
+    line_keywords = ("echo",)
 
     def __init__(self, context):
         self.context = context
         self.platform = context.platform_name
+        self._pending = {}  # id(file_target) => (file_target, [line])
+
+    def _flush(self):
+        for file_target, lines in self._pending.values():
+            file_target["content"] = "".join(lines)
+        self._pending = {}
 
     def parse(self, target):
         tokens = target.get("tokens")
-        if not tokens:
+        if not tokens or tokens[0] != "echo":
+            if self._pending:
+                self._flush()
             return target
 
         redirections = target.get("redirection") or []
@@ -43,10 +54,14 @@ class InlineFileContent(Parser):
                     logger.info("Found inline file: %s", dst_path)
                     file_target = get_file_target("", output)
                     file_target = self.context.register_target(file_target)[0]
+                pending = self._pending.get(id(file_target))
                 if op == ">":
-                    file_target["content"] = line
+                    self._pending[id(file_target)] = (file_target, [line])
+                elif pending is None:
+                    lines = [file_target["content"], line]
+                    self._pending[id(file_target)] = (file_target, lines)
                 else:
-                    file_target["content"] += line
+                    pending[1].append(line)
 
         return target
 
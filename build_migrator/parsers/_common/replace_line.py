@@ -1,10 +1,10 @@
 import re
-import copy
 from build_migrator.modules import Parser
 
 
 class ReplaceLine(Parser):
     priority = -1
+    parallel_safe = True
 
     @staticmethod
     def add_arguments(arg_parser):
@@ -23,6 +23,8 @@ class ReplaceLine(Parser):
         for pattern, repl in replace_line or []:
             self.replacements.append((re.compile(pattern), repl))
         self.context = context
+        # Replacements may turn any line into a command
+        self.line_keywords = None if self.replacements else ()
 
     @staticmethod
     def is_applicable(log_type=None):
@@ -38,7 +40,8 @@ class ReplaceLine(Parser):
         if "line" in target:
             new_line = self.__replace_line__(target["line"])
             if new_line != target["line"]:
-                target_with_replaced_line = copy.deepcopy(target)
+                # Targets are not tokenized yet, shallow copy is enough
+                target_with_replaced_line = dict(target)
                 target_with_replaced_line["line"] = new_line
                 return target_with_replaced_line
 
@@ -9,6 +9,7 @@ logger = logging.getLogger(__name__)
 
 class ResponseFile(Parser):
     priority = 5
+    line_keywords = ("@",)
 
     @staticmethod
     def add_arguments(arg_parser):
@@ -16,6 +16,8 @@ logger = logging.getLogger(__name__)
 class LineAccumulator(Parser):
 
     priority = 2
+    line_keywords = ()
+    parallel_safe = True
 
     @staticmethod
     def add_arguments(arg_parser):
@@ -27,17 +29,21 @@ class LineAccumulator(Parser):
 
     def __init__(self, context):
         self.context = context
-        self.accumulator = ""
+        # Parts of multi-line command, joined once at the last line
+        self.accumulator = []
 
     def parse(self, target):
         line = target.get("line") or ""
 
         if line.endswith("\\"):
             target["line"] = ""
-            self.accumulator += line[:-1]
+            self.accumulator.append(line[:-1])
+        elif self.accumulator:
+            self.accumulator.append(line)
+            target["line"] = "".join(self.accumulator)
+            self.accumulator = []
         else:
-            target["line"] = self.accumulator + line
-            self.accumulator = ""
+            target["line"] = line
 
         return target
 
@@ -50,6 +56,8 @@ class MakeLog(Parser):
     )
 
     priority = 0
+    line_keywords = ("Entering directory", "Leaving directory")
+    parallel_safe = True
 
     @staticmethod
     def add_arguments(arg_parser):
@@ -85,7 +93,8 @@ class MakeLog(Parser):
     def parse(self, target):
         line = target.get("line") or ""
 
-        match = self.directory_re.search(line)
+        # Substring check is much cheaper than regex search
+        match = self.directory_re.search(line) if "directory" in line else None
         if match:
             path = match.group("path")
             dir = self.context.normalize_path(path)
@@ -9,6 +9,18 @@ class ParserBase(Parser):
     def is_applicable(log_type=None):
         return True
 
+    # Returns parse_arguments(target["tokens"]). Arguments parsed in advance
+    # by --parallel_shards workers are taken from the target, unless
+    # tokens were modified since then.
+    def get_parsed_arguments(self, target):
+        tokens = target["tokens"]
+        parsed_arguments = target.get("parsed_arguments")
+        if parsed_arguments is not None:
+            entry = parsed_arguments.get(type(self).__name__)
+            if entry is not None and entry[0] == tokens:
+                return entry[1]
+        return self.parse_arguments(tokens)
+
     def input_dir(self, state, dest, value):
         path = value[-1]
         dependencies = state.get_attribute("dependencies", [])
@@ -1,11 +1,17 @@
 import argparse
+import bisect
+from collections import deque
 import copy
 import fnmatch
 import glob
-import io
+import itertools
 import logging
+import multiprocessing
+import multiprocessing.connection
 import os
+import pickle
 from pprint import pformat
+import re
 import sys
 import traceback
 from build_migrator.helpers import (
@@ -13,23 +19,47 @@ from build_migrator.helpers import (
     get_file_target,
     get_variable_target,
     get_minified_target,
+    MinifiedTargetFormatter,
     get_target_and_dependencies,
     get_copy_target,
     get_module_copy,
 )
 from build_migrator.modules import EntryPoint, Parser
-from build_migrator.common.algorithm import add_unique_stable
+from build_migrator.common.algorithm import add_unique_stable, IdentityOrderedSet
 from build_migrator.common.argparse_actions import Extend
+from build_migrator.common.bounded_cache import BoundedCache
+from build_migrator.common.command_graph import CommandGraph, get_command_outputs
+from build_migrator.common.dependency_scanner import DependencyScanner
+from build_migrator.common.log_reader import (
+    find_log_lines,
+    read_log_lines,
+    read_log_text,
+    split_log,
+)
+from build_migrator.common.probe_cache import ProbeCache
+from build_migrator.common.substring_matcher import SubstringMatcher
+from build_migrator.common.trace import tracer
 import build_migrator.common.os_ext as os_ext
 import build_migrator.common.path_ext as path_ext
 
 logger = logging.getLogger(__name__)
 
+# Minimum size of log shard for --parallel_shards
+SHARD_MIN_SIZE = 16 * 1024 * 1024
+
 
 class BuildLogParserContext(Parser, EntryPoint):
     build_dir_placeholder = "@build_dir@"
     source_dir_placeholder = "@source_dir@"
-    known_log_types = ("ninja", "make", "msbuild", "strace", "qmake")
+    known_log_types = (
+        "ninja",
+        "make",
+        "msbuild",
+        "strace",
+        "qmake",
+        "compdb",
+        "wrapper",
+    )
 
     @classmethod
     def add_arguments(cls, arg_parser):
@@ -62,7 +92,8 @@ class BuildLogParserContext(Parser, EntryPoint):
             nargs="+",
             action=Extend,
             help="Path to build log. For allowed log types, see --log_type argument. "
-            "Logs are processed in order.",
+            "Logs are processed in order. gzip, xz and bz2 compressed logs "
+            "are decompressed on the fly.",
         )
         arg_parser.add_argument(
             "--log_type",
@@ -137,6 +168,79 @@ class BuildLogParserContext(Parser, EntryPoint):
             help="Don't store source files in Build Object Model.",
             default=None,
         )
+        arg_parser.add_argument(
+            "--jobs",
+            metavar="N",
+            type=int,
+            help="Number of header dependency probes (compiler -M, "
+            "cl /Zs /showIncludes, etc) to run in parallel. "
+            "Log parsing continues while probes are running. Default: 1.",
+        )
+        arg_parser.add_argument(
+            "--probe_timeout",
+            metavar="SECONDS",
+            type=float,
+            help="Kill header dependency probe if it doesn't finish in time. "
+            "Dependencies of such commands are not captured.",
+        )
+        arg_parser.add_argument(
+            "--probe_cache",
+            action="store_true",
+            default=None,
+            help="Cache results of header dependency probes in "
+            "<out_dir>/probe_cache. Cached result is reused while "
+            "compiler, command line, working directory, source files and "
+            "recorded headers (mtime and size) stay the same.",
+        )
+        arg_parser.add_argument(
+            "--probe_cache_size",
+            metavar="MB",
+            type=int,
+            help="Maximum size of --probe_cache. Least recently used "
+            "entries are evicted. Default: 512.",
+        )
+        arg_parser.add_argument(
+            "--no_line_filter",
+            action="store_true",
+            default=None,
+            help="Pass every line of make and ninja logs to parsers. "
+            "By default, lines that can't be commands of known programs "
+            "(compiler warnings, test output, etc) are skipped before "
+            "tokenization.",
+        )
+        arg_parser.add_argument(
+            "--parallel_shards",
+            metavar="N",
+            type=int,
+            help="Split uncompressed make logs into shards at line boundaries "
+            "and preprocess them (track directories, join multi-line "
+            "commands, tokenize, parse compiler arguments) in N worker "
+            "processes. Targets are created in log order in the main "
+            "process, so the result is the same as with serial parsing. "
+            "Default: 1 (serial).",
+        )
+        arg_parser.add_argument(
+            "--parallel_logs",
+            metavar="N",
+            type=int,
+            help="Parse up to N logs at the same time in child processes "
+            "(requires fork()). Targets are merged in the order of logs. "
+            "If a log depends on an earlier one (e.g. references its "
+            "outputs), all logs are parsed again serially. Default: 1.",
+        )
+        arg_parser.add_argument(
+            "--lazy_parsing",
+            action="store_true",
+            default=None,
+            help="With --targets, find commands that produce required "
+            "targets and their dependencies in a quick first pass over "
+            "make logs (by looking at -o, /Fo, /OUT: and similar options), "
+            "and parse only these commands. Dependencies that aren't "
+            "visible in command lines (e.g. generated headers outside "
+            "of include directories) may be missed. Target names may "
+            "differ if they clash with names of targets that aren't "
+            "required.",
+        )
 
     def _list_files(self, directory, pattern=None):
         if pattern is not None:
@@ -195,6 +299,15 @@ class BuildLogParserContext(Parser, EntryPoint):
         capture_sources=None,
         log_type=None,
         dont_capture_sources=None,
+        jobs=None,
+        probe_timeout=None,
+        probe_cache=None,
+        probe_cache_size=None,
+        no_line_filter=None,
+        parallel_shards=None,
+        parallel_logs=None,
+        lazy_parsing=None,
+        out_dir=None,
     ):
         if platform is None:
             platform = os_ext.get_host_system_name()
@@ -226,18 +339,39 @@ class BuildLogParserContext(Parser, EntryPoint):
             self._working_dir = self.build_dirs[0]
         self.max_relpath_level = max_relpath_level
         self.path_aliases = None
+        self._path_alias_trie = path_ext.PathPrefixTrie()
         self.target_index = None  # target_output => target
         self.targets = None
+        self._targets_by_name = {}  # name => [target]
+        # output => {id(target) => target} for targets that list output
+        # in dependencies or objects. May contain stale entries.
+        self._referencing_targets = {}
         self._variable_targets = {}
+        self._variable_matcher = SubstringMatcher()  # finds variable outputs
+        self._recorded_dependencies = {}  # output => (directory, dependencies)
         self._arg_path_aliases = path_aliases
+        # With --jobs > 1: id(target) => key that orders targets as if
+        # header dependency probes were run synchronously, see
+        # scan_implicit_dependencies()
+        self._target_keys = {}
+        self._target_key_prefix = ()
+        self._target_key_seq = 0
+        self._last_target_key = None
+        self._pending_probes = {}  # id(dependencies) => _PendingProbe
         self._arg_dont_capture_sources = dont_capture_sources
         self._arg_capture_sources = capture_sources
+        self.line_filter = not no_line_filter
+        self.parallel_shards = parallel_shards or 1
+        self.parallel_logs = parallel_logs or 1
+        self.lazy_parsing = bool(lazy_parsing)
+        self.shard_min_size = SHARD_MIN_SIZE
 
         self.dir_mapping = {self.source_dir: self.source_dir_placeholder}
         for build_dir in self.build_dirs:
             self.dir_mapping[build_dir] = self.build_dir_placeholder
             if source_dir == build_dir:
                 raise ValueError("Source dir cannot be the same as build directory")
+        self._dir_trie = path_ext.DirTrie(self.dir_mapping.keys())
 
         # Without some form of caching, path normalization / resolution
         # can take up to 90% of parsing time
@@ -245,6 +379,10 @@ class BuildLogParserContext(Parser, EntryPoint):
             0: {},
             1: {},
         }
+        # (working_dir, path) => see _resolve_path()
+        self._resolved_paths = {}
+        # (working_dir, full path) => see _get_relative_path()
+        self._relative_paths = {}
 
         self.required_targets = None
         if targets:
@@ -269,6 +407,19 @@ class BuildLogParserContext(Parser, EntryPoint):
         for output, name in force_target_name or []:
             self.force_target_name[output] = name
 
+        cache = None
+        if probe_cache:
+            if out_dir is None:
+                out_dir = os.getcwd()
+            if probe_cache_size is None:
+                probe_cache_size = 512
+            cache = ProbeCache(
+                os.path.join(out_dir, "probe_cache"), probe_cache_size * 1024 * 1024
+            )
+        self.dependency_scanner = DependencyScanner(
+            jobs, probe_timeout, cache=cache
+        )
+
     def _capture_explicitly_specified_sources(self, capture_sources):
         for src in capture_sources:
             paths = self._list_files(self.source_dir, src)
@@ -280,6 +431,8 @@ class BuildLogParserContext(Parser, EntryPoint):
 
     def _initialize_path_aliases(self, path_aliases):
         self.path_aliases = []
+        self._path_alias_trie = path_ext.PathPrefixTrie()
+        self._invalidate_resolved_paths()
         for path, alias in path_aliases or []:
             if alias.startswith("@") and alias.endswith("@"):
                 # it's a variable
@@ -292,15 +445,18 @@ class BuildLogParserContext(Parser, EntryPoint):
                 alias = self.normalize_path(alias, ignore_working_dir=True)
             path = self.normalize_path(path)
             self.path_aliases.append((path, alias))
+            self._path_alias_trie.add(path, alias)
+            self._invalidate_resolved_paths()
 
     def parse(self, targets, parsers):
         self.target_index = {}
-        if targets:
-            for target in targets:
-                self._add_target_to_index(target)
-            self.targets = targets
-        else:
-            self.targets = []
+        self._targets_by_name = {}
+        self._referencing_targets = {}
+        # Targets are replaced while parsing, use O(1) removal
+        self.targets = IdentityOrderedSet()
+        for target in targets or []:
+            self._append_target(target)
+            self._add_target_to_index(target)
 
         self._initialize_path_aliases(self._arg_path_aliases)
 
@@ -310,34 +466,443 @@ class BuildLogParserContext(Parser, EntryPoint):
             # don't capture any more source files
             self.capture_sources = False
 
-        for log in self.logs:
-            # newline=None argument allows processing logs from any platform,
-            # irregardless of line ending type.
-            with io.open(
-                log.path, newline=None, encoding="utf-8", errors="replace"
-            ) as f:
-                for line in f:
-                    line = line.strip()
-                    logger.info(" > " + line)
-                    # Don't use Unicode strings in Python 2,
-                    # or each regular expression will have to
-                    # have a second Unicode version.
-                    if sys.version_info <= (3, 0):
-                        line = line.encode("utf-8")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        # Don't use Unicode strings in Python 2,
+        # or each regular expression will have to
+        # have a second Unicode version.
+        encode_lines = sys.version_info <= (3, 0)
+        parser_chain = ParserChain(self, parsers)
+        try:
+            if self.lazy_parsing and self.required_targets:
+                required_outputs = self._find_required_outputs(parser_chain)
+                if required_outputs is not None:
+                    parser_chain.command_filter = self._get_command_filter(
+                        *required_outputs
+                    )
+            logs = self.logs
+            if (
+                self.parallel_logs > 1
+                and len(logs) > 1
+                and not (debug or encode_lines or tracer.enabled)
+                and self._parse_logs_in_parallel(parser_chain)
+            ):
+                logs = []
+            for log in logs:
+                self._parse_log(log, parser_chain, debug, encode_lines)
+        finally:
+            self.dependency_scanner.close()
+
+        self.targets = self._get_ordered_targets()
+        finalize(self)
+        return self.targets
+
+    def _parse_log(self, log, parser_chain, debug=False, encode_lines=False):
+        if any(
+            getattr(parser, "text_chunks", False)
+            for parser in parser_chain.get_applicable_parsers(log.type)
+        ):
+            self._parse_log_text(log, parser_chain)
+            return
+        line_filter = None
+        if self.line_filter:
+            line_filter = parser_chain.get_line_filter(log.type)
+        if (
+            self.parallel_shards > 1
+            and not (debug or encode_lines or tracer.enabled)
+            and self._parse_log_in_shards(log, parser_chain, line_filter)
+        ):
+            self.dependency_scanner.wait()
+            return
+        # Lines are split the same way for logs from any platform,
+        # irregardless of line ending type.
+        for lines in read_log_lines(log.path):
+            if encode_lines:
+                lines = [line.encode("utf-8") for line in lines]
+            if line_filter is not None:
+                lines = line_filter.filter(lines)
+            if debug:
+                # Keep each line next to the messages it produces
+                for line in lines:
+                    logger.debug(" > %s", line)
                     targets = [{"line": line}]
-                    parse_targets(
-                        targets, self, parsers, log_type=log.type
+                    parser_chain.parse(targets, log_type=log.type)
+                continue
+            targets = [{"line": line} for line in lines]
+            parser_chain.parse(targets, log_type=log.type)
+
+        logger.debug(" > (EOF)")
+        # 'end of file' instructs parsers like line_accumulator and response_file to pass on any accumulated data
+        targets = [{"eof": True}]
+        parser_chain.parse(targets, log_type=log.type)
+        self.dependency_scanner.wait()
+
+    # Passes log to parsers in chunks of text (see 'text_chunks' attribute)
+    def _parse_log_text(self, log, parser_chain):
+        for text in read_log_text(log.path):
+            parser_chain.parse([{"text": text}], log_type=log.type)
+        logger.debug(" > (EOF)")
+        parser_chain.parse([{"eof": True}], log_type=log.type)
+        self.dependency_scanner.wait()
+
+    # First pass of --lazy_parsing. Commands are extracted from logs
+    # by copies of parallel safe parsers (as for --parallel_shards),
+    # tool parsers are skipped. Returns (outputs that required targets
+    # depend on, all outputs found), or None if required targets can't
+    # be found this way.
+    def _find_required_outputs(self, parser_chain):
+        if any(log.type != "make" for log in self.logs):
+            logger.info("--lazy_parsing supports only make logs, parsing all commands")
+            return None
+        if any(t.get("top_level") for t in self.targets):
+            logger.info("Initial targets have top level targets, parsing all commands")
+            return None
+        parallel_parsers = self._get_parallel_parsers(parser_chain, "make")
+        if not parallel_parsers:
+            return None
+
+        chain = parser_chain.get_chain("make")
+        context = _ShardContext(self.platform_name, self._working_dir)
+        parsers = ParserChain(
+            context, copy.deepcopy(parallel_parsers, {id(self): context})
+        )
+        graph = CommandGraph()
+
+        def _on_command(target):
+            tokens = target.get("tokens") if target else None
+            if not tokens:
+                return
+            working_dir = target.get("working_dir") or context._working_dir
+            graph.add_command(
+                tokens,
+                lambda path: context.normalize_path(path, working_dir),
+                target.get("redirection"),
+                is_required=bool(chain.get_handlers(tokens[0])),
+            )
+
+        for log in self.logs:
+            line_filter = None
+            if self.line_filter:
+                line_filter = parser_chain.get_line_filter(log.type)
+            for lines in read_log_lines(log.path):
+                if line_filter is not None:
+                    lines = line_filter.filter(lines)
+                targets = [{"line": line} for line in lines]
+                parsers.parse(targets, log_type=log.type, on_result=_on_command)
+            parsers.parse([{"eof": True}], log_type=log.type, on_result=_on_command)
+
+        outputs = {}  # relocatable path => full path
+        for output in graph.outputs:
+            outputs[self._construct_path_arg(output).relocatable] = output
+        required_outputs = set(graph.unknown_command_inputs)
+        for key in self.required_targets:
+            found = _match_required_target(self, key, outputs)
+            if found is None:
+                logger.info(
+                    "Required target %s isn't found in the first pass, "
+                    "parsing all commands",
+                    key,
+                )
+                return None
+            required_outputs.update(found)
+        required_outputs = graph.get_dependencies(required_outputs)
+        logger.info(
+            "Parsing commands for %d of %d outputs",
+            len(required_outputs),
+            len(outputs),
+        )
+        return required_outputs, set(graph.outputs)
+
+    # Returns command filter for ParserChain: commands with unknown outputs
+    # and commands that produce required outputs or outputs that weren't
+    # found in the first pass (e.g. because they are in response files)
+    # are parsed.
+    def _get_command_filter(self, required_outputs, known_outputs):
+        def _filter(target):
+            working_dir = target.get("working_dir") or self._working_dir
+
+            def _normalize(path):
+                return self.normalize_path(path, working_dir)
+
+            outputs = get_command_outputs(
+                target["tokens"], _normalize, target.get("redirection")
+            )
+            if outputs is None:
+                return True
+            for output in outputs:
+                if output in required_outputs or output not in known_outputs:
+                    return True
+            return False
+
+        return _filter
+
+    # Each log is parsed in a forked child process, starting from
+    # the state of this context before any log is parsed. Results are
+    # merged in the order of logs if they are the same as serial parsing
+    # would produce, see _merge_log_results().
+    # Returns False if logs must be parsed serially.
+    def _parse_logs_in_parallel(self, parser_chain):
+        if "fork" not in multiprocessing.get_all_start_methods():
+            logger.warning("--parallel_logs requires fork(), parsing logs serially")
+            return False
+        logger.info(
+            "Parsing %d logs, %d processes", len(self.logs), self.parallel_logs
+        )
+        # Nothing is parsed yet, so dependency scanner threads
+        # that might hold locks don't exist
+        mp_context = multiprocessing.get_context("fork")
+        results = [None] * len(self.logs)
+        logs = deque(enumerate(self.logs))
+        running = {}  # connection => (log index, process)
+        try:
+            while logs or running:
+                while logs and len(running) < self.parallel_logs:
+                    idx, log = logs.popleft()
+                    reader, writer = mp_context.Pipe(duplex=False)
+                    process = mp_context.Process(
+                        target=self._parse_log_in_child,
+                        args=(log, parser_chain, writer),
+                    )
+                    process.start()
+                    writer.close()
+                    running[reader] = (idx, process)
+                for reader in multiprocessing.connection.wait(list(running)):
+                    idx, process = running.pop(reader)
+                    try:
+                        results[idx] = reader.recv()
+                    except EOFError:
+                        pass
+                    reader.close()
+                    process.join()
+                    if results[idx] is None:
+                        # Let serial parsing report the error
+                        logger.warning(
+                            "Failed to parse %s in child process, "
+                            "parsing logs serially",
+                            self.logs[idx].path,
+                        )
+                        return False
+                    # Probe results are valid even if logs are
+                    # parsed serially after all
+                    cache_changes = results[idx][2]
+                    if cache_changes is not None:
+                        self.dependency_scanner.cache.merge(cache_changes)
+        finally:
+            for _, process in running.values():
+                process.terminate()
+                process.join()
+
+        return self._merge_log_results(results)
+
+    # Sends (targets, final working dir, probe cache changes) to parent
+    def _parse_log_in_child(self, log, parser_chain, connection):
+        result = None
+        try:
+            # Logs are already parsed in parallel
+            self.parallel_shards = 1
+            cache = self.dependency_scanner.cache
+            if cache is not None:
+                checkpoint = cache.get_checkpoint()
+            self._parse_log(log, parser_chain)
+            # Probe cache is saved by parent process
+            self.dependency_scanner.close(save_cache=False)
+            cache_changes = None
+            if cache is not None:
+                cache_changes = cache.get_changes(checkpoint)
+            result = (self._get_ordered_targets(), self._working_dir, cache_changes)
+        except Exception:
+            logger.error(traceback.format_exc())
+        connection.send(result)
+        connection.close()
+
+    # Each result is (targets, final working dir, _) of a log parsed
+    # independently. Serial parsing gives the same targets if logs
+    # don't interact: no log references outputs of earlier logs,
+    # no outputs are shared except for identical file targets (e.g.
+    # captured sources), targets that existed before parsing are
+    # unchanged, logs other than last one don't add variables and
+    # end in initial working directory.
+    # Merges targets and returns True if that's the case.
+    def _merge_log_results(self, results):
+        initial_targets = list(self.targets)
+        working_dir = self._working_dir
+        outputs = {}  # output => target of earlier log
+        output_matcher = SubstringMatcher()
+        new_targets = []
+        for idx, (targets, log_working_dir, _) in enumerate(results):
+            log = self.logs[idx]
+            last = idx == len(results) - 1
+            if targets[: len(initial_targets)] != initial_targets:
+                logger.info("%s modifies existing targets", log.path)
+                return False
+            if not last and log_working_dir != working_dir:
+                logger.info("%s changes working directory", log.path)
+                return False
+            log_targets = []
+            log_outputs = set()
+            for target in targets[len(initial_targets):]:
+                log_outputs.add(target["output"])
+                existing_target = outputs.get(target["output"])
+                if existing_target is not None:
+                    if target.get("type") == "file" and existing_target == target:
+                        continue
+                    logger.info(
+                        "%s and earlier log have different targets for %s",
+                        log.path,
+                        target["output"],
                     )
+                    return False
+                if not last and target.get("type") == "variable":
+                    logger.info("%s adds variable %s", log.path, target["output"])
+                    return False
+                log_targets.append(target)
+            for target in log_targets:
+                output = _find_referenced_output(target, output_matcher, log_outputs)
+                if output is not None:
+                    logger.info(
+                        "%s references %s, which is produced by earlier log",
+                        log.path,
+                        output,
+                    )
+                    return False
+            for target in log_targets:
+                for output in [target["output"]] + (
+                    target.get("msvc_import_lib") or []
+                ):
+                    outputs[output] = target
+                    output_matcher.add(output)
+            new_targets.extend(log_targets)
+
+        for target in new_targets:
+            self._append_target(target)
+            self._add_target_to_index(target)
+        self._working_dir = results[-1][1]
+        return True
 
-                logger.info(" > (EOF)")
-                # 'end of file' instructs parsers like line_accumulator and response_file to pass on any accumulated data
-                targets = [{"eof": True}]
-                parse_targets(
-                    targets, self, parsers, log_type=log.type
+    # Returns parsers at the beginning of the chain that can run
+    # in worker processes (see 'parallel_safe' attribute)
+    @staticmethod
+    def _get_parallel_parsers(parser_chain, log_type):
+        parsers = []
+        for parser in parser_chain.get_applicable_parsers(log_type):
+            if not getattr(parser, "parallel_safe", False):
+                break
+            if getattr(parser, "line_keywords", None) is None:
+                break
+            parsers.append(parser)
+        return parsers
+
+    # Returns copies of tool parsers that can parse arguments of commands
+    # in worker processes (see 'parse_arguments' method)
+    def _get_argument_parsers(self, parser_chain, log_type):
+        parsers = []
+        context = _ShardContext(self.platform_name, self._working_dir)
+        for parser in parser_chain.get_applicable_parsers(log_type):
+            if getattr(parser, "programs", None) is None:
+                continue
+            if getattr(parser, "parse_arguments", None) is None:
+                continue
+            parser = copy.deepcopy(parser, {id(self): context})
+            try:
+                pickle.dumps(parser)
+            except Exception:
+                logger.debug(
+                    "%s can't parse arguments in worker processes:\n%s",
+                    type(parser).__name__,
+                    traceback.format_exc(),
                 )
+                continue
+            parsers.append(parser)
+        return parsers
+
+    # Parallel safe parsers run in worker processes, each on its own shard
+    # of the log, with their state copied at the beginning of the shard.
+    # State is computed in this process: it depends only on lines with
+    # parsers' keywords, which are found without reading every line.
+    # Workers also parse arguments of commands for tool parsers, the rest
+    # of the chain (paths, targets) runs in this process in log order.
+    # Returns False if log can't be parsed this way.
+    def _parse_log_in_shards(self, log, parser_chain, line_filter):
+        if log.type != "make":
+            return False
+        parallel_parsers = self._get_parallel_parsers(parser_chain, log.type)
+        if not parallel_parsers:
+            return False
+        ranges = split_log(
+            log.path,
+            self.parallel_shards * 4,
+            self.shard_min_size,
+            LineFilter.get_carryover_pattern(
+                parser_chain.get_applicable_parsers(log.type)
+            ),
+        )
+        if not ranges or len(ranges) < 2:
+            return False
+        logger.info(
+            "Parsing %s in %d shards, %d processes",
+            log.path,
+            len(ranges),
+            self.parallel_shards,
+        )
 
-        finalize(self)
-        return self.targets
+        keywords = set()
+        for parser in parallel_parsers:
+            keywords.update(parser.line_keywords)
+        state_lines = deque(find_log_lines(log.path, sorted(keywords)))
+        line_regexes = None
+        if line_filter is not None:
+            line_regexes = (line_filter.regex, line_filter.carryover_regex)
+        shards = []
+        for idx, (start, end) in enumerate(ranges):
+            shard_context = _ShardContext(self.platform_name, self._working_dir)
+            shard_parsers = copy.deepcopy(parallel_parsers, {id(self): shard_context})
+            eof = idx == len(ranges) - 1
+            shards.append(
+                (
+                    log.path,
+                    start,
+                    end,
+                    log.type,
+                    shard_context,
+                    shard_parsers,
+                    line_regexes,
+                    eof,
+                )
+            )
+            while state_lines and state_lines[0][0] < end:
+                line = state_lines.popleft()[1]
+                for parser in parallel_parsers:
+                    if any(k in line for k in parser.line_keywords):
+                        self.current_target = {"line": line}
+                        parser.parse(self.current_target)
+        self.current_target = None
+        working_dir = self._working_dir
+
+        start = len(parallel_parsers)
+        window = self.parallel_shards * 2
+        argument_parsers = self._get_argument_parsers(parser_chain, log.type)
+        # Don't fork: dependency scanner threads may hold locks
+        pool = multiprocessing.get_context("spawn").Pool(
+            self.parallel_shards, _init_shard_worker, (argument_parsers,)
+        )
+        try:
+            shards = iter(shards)
+            pending = deque()
+            for shard in itertools.islice(shards, window):
+                pending.append(pool.apply_async(_parse_shard, (shard,)))
+            while pending:
+                results = pending.popleft().get()
+                shard = next(shards, None)
+                if shard is not None:
+                    pending.append(pool.apply_async(_parse_shard, (shard,)))
+                for shard_working_dir, target in results:
+                    self.working_dir = shard_working_dir
+                    parser_chain.parse([target], log_type=log.type, start=start)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+        self.working_dir = working_dir
+        return True
 
     @property
     def working_dir(self):
@@ -380,13 +945,9 @@ class BuildLogParserContext(Parser, EntryPoint):
     def _select_parent_dir(self, path, cwd=None):
         if cwd is None:
             cwd = self.working_dir
-        result = path_ext.closest_dir(
-            path,
-            self.dir_mapping.keys(),
-            max_relpath_level=self.max_relpath_level,
-            cwd=cwd,
+        return self._dir_trie.closest(
+            path, max_relpath_level=self.max_relpath_level, cwd=cwd
         )
-        return result if result else None
 
     class _PathArg:
         def __init__(self, full, relocatable, argument, dependencies):
@@ -407,26 +968,7 @@ class BuildLogParserContext(Parser, EntryPoint):
             raise ValueError(
                 "Incompatible arguments: capture_file=True, capture_dir=True"
             )
-        path = self.normalize_path(path)
-        relocatable_path = None
-        if self.path_aliases:
-            # apply path aliases
-            for src, dest in self.path_aliases:
-                if path.startswith(src):
-                    if len(path) == len(src) or path[len(src)] == "/":
-                        relocatable_path = dest + path[len(src):]
-                        break
-
-        if relocatable_path is None:
-            result = self._select_parent_dir(path)
-            if result is not None:
-                parent_dir, relpath = result[0], result[1]
-                if relpath != ".":
-                    relocatable_path = self.platform.path_join(
-                        self.dir_mapping[parent_dir], relpath
-                    ).replace("\\", "/")
-                else:
-                    relocatable_path = self.dir_mapping[parent_dir]
+        path, relocatable_path, variables = self._resolve_path(path)
 
         dependencies = []
         if relocatable_path is None:
@@ -437,9 +979,7 @@ class BuildLogParserContext(Parser, EntryPoint):
                 dependencies.append(target)
             # Don't capture files not under build or source directory yet
         else:
-            for _output, _ in self._variable_targets.items():
-                if _output in relocatable_path:
-                    dependencies.append(_output)
+            dependencies.extend(variables)
             if capture_parent_dir:
                 parent = self._construct_path_arg(os.path.split(path)[0])
                 target = self._get_directory_target(parent.full, parent.relocatable)
@@ -456,12 +996,64 @@ class BuildLogParserContext(Parser, EntryPoint):
 
         argument_path = relocatable_path
         if relative_arg:
-            relpath = os.path.relpath(path, self.working_dir)
-            if path_ext.relpath_level(relpath) == 0:
-                argument_path = self.platform.normalize_path(relpath)
+            argument_path = self._get_relative_path(path) or argument_path
 
         return self._PathArg(path, relocatable_path, argument_path, dependencies)
 
+    # Returns (full path, relocatable path, outputs of variable targets
+    # used in relocatable path). Relocatable path is None if path is not
+    # under source or build directory.
+    # Results are cached until path aliases or variable targets change,
+    # see _invalidate_resolved_paths().
+    def _resolve_path(self, path):
+        key = (self.working_dir, path)
+        resolved = self._resolved_paths.get(key)
+        if resolved is not None:
+            return resolved
+
+        full_path = self.normalize_path(path, working_dir=key[0])
+        relocatable_path = None
+        if self.path_aliases:
+            # apply path aliases
+            alias = self._path_alias_trie.find(full_path)
+            if alias is not None:
+                src, dest = alias
+                relocatable_path = dest + full_path[len(src):]
+
+        if relocatable_path is None:
+            result = self._select_parent_dir(full_path)
+            if result is not None:
+                parent_dir, relpath = result[0], result[1]
+                if relpath != ".":
+                    relocatable_path = self.platform.path_join(
+                        self.dir_mapping[parent_dir], relpath
+                    ).replace("\\", "/")
+                else:
+                    relocatable_path = self.dir_mapping[parent_dir]
+
+        variables = ()
+        if relocatable_path is not None and self._variable_targets:
+            variables = tuple(self._variable_matcher.find_all(relocatable_path))
+
+        resolved = (full_path, relocatable_path, variables)
+        self._resolved_paths[key] = resolved
+        return resolved
+
+    # Returns path relative to working directory if it doesn't go
+    # outside of it, None otherwise
+    def _get_relative_path(self, full_path):
+        key = (self.working_dir, full_path)
+        if key not in self._relative_paths:
+            relative_path = None
+            relpath = os.path.relpath(full_path, key[0])
+            if path_ext.relpath_level(relpath) == 0:
+                relative_path = self.platform.normalize_path(relpath)
+            self._relative_paths[key] = relative_path
+        return self._relative_paths[key]
+
+    def _invalidate_resolved_paths(self):
+        self._resolved_paths.clear()
+
     def _get_target_name(self, target):
         name = target.get("name")
         relocatable_path = target.get("output")
@@ -484,11 +1076,10 @@ class BuildLogParserContext(Parser, EntryPoint):
         return name.replace("/", "_").replace(".", "_")
 
     def apply_path_aliases(self, path):
-        for src, dest in self.path_aliases:
-            if path.startswith(src):
-                if len(path) == len(src) or path[len(src)] == "/":
-                    path = dest + path[len(src):]
-                    break
+        alias = self._path_alias_trie.find(path)
+        if alias is not None:
+            src, dest = alias
+            path = dest + path[len(src):]
         return path
 
     def get_file_arg(self, path, dependencies=None, relative=False):
@@ -695,7 +1286,10 @@ class BuildLogParserContext(Parser, EntryPoint):
                     )
                     assert ctgt_descr["version"] != target_descr["version"]
                     if ctgt_descr["version"]:
-                        conflicting_target["name"] += "." + ctgt_descr["version"]
+                        self._rename_target(
+                            conflicting_target,
+                            conflicting_target["name"] + "." + ctgt_descr["version"],
+                        )
                     if target_descr["version"]:
                         target_name += "." + target_descr["version"]
             return get_module_copy(
@@ -717,10 +1311,20 @@ class BuildLogParserContext(Parser, EntryPoint):
         return None
 
     def find_targets_by_name(self, name):
-        for target in self.targets:
+        for target in list(self._targets_by_name.get(name, [])):
             if target.get("name") == name:
                 yield target
 
+    def _rename_target(self, target, name):
+        self._remove_target_name(target)
+        target["name"] = name
+        self._targets_by_name.setdefault(name, []).append(target)
+
+    def _remove_target_name(self, target):
+        targets = self._targets_by_name.get(target.get("name"))
+        if targets:
+            targets[:] = [t for t in targets if t is not target]
+
     def find_target_by_path(self, path):
         path = self._construct_path_arg(path)
         return self.find_target(path.relocatable)
@@ -749,7 +1353,8 @@ class BuildLogParserContext(Parser, EntryPoint):
 
     def _change_target_output(self, target, output):
         old_output = target["output"]
-        for tgt in self.targets:
+        referencing_targets = self._referencing_targets.pop(old_output, {})
+        for tgt in referencing_targets.values():
             deps = tgt.get("dependencies")
             if deps:
                 tgt["dependencies"] = [
@@ -758,6 +1363,7 @@ class BuildLogParserContext(Parser, EntryPoint):
             deps = tgt.get("objects")
             if deps:
                 tgt["objects"] = [output if dep == old_output else dep for dep in deps]
+        self._referencing_targets.setdefault(output, {}).update(referencing_targets)
         del self.target_index[old_output]
         target["output"] = output
         self.target_index[output] = target
@@ -786,6 +1392,13 @@ class BuildLogParserContext(Parser, EntryPoint):
 
         if "dependencies" not in target:
             target["dependencies"] = []
+        probe = self._pending_probes.pop(id(target["dependencies"]), None)
+        if probe is not None:
+            # Targets found by the probe go after dependencies that
+            # preceded them (see scan_implicit_dependencies())
+            preceding_dependencies = sum(
+                type(dep) is dict for dep in target["dependencies"][: probe.position]
+            )
         target, dependencies = self.split_target_dependencies(target, log=False)
 
         existing_target = self.find_target(target["output"])
@@ -798,8 +1411,7 @@ class BuildLogParserContext(Parser, EntryPoint):
                 new_target_is_not_file = target.get("type") != "file"
                 if existing_target_is_file and new_target_is_not_file:
                     logger.warning("Replacing existing file target")
-                    del self.target_index[existing_target["output"]]
-                    self.targets.remove(existing_target)
+                    self._remove_target(existing_target)
                 elif self._is_object_lib(existing_target) and self._is_object_lib(
                     target
                 ):
@@ -809,9 +1421,9 @@ class BuildLogParserContext(Parser, EntryPoint):
                         "Only targets with type=module and module_type=object_lib are allowed to have the same output path"
                     )
                     logger.info("Old target:")
-                    logger.info(pformat(get_minified_target(existing_target)))
+                    logger.info("%s", MinifiedTargetFormatter(existing_target))
                     logger.info("New target:")
-                    logger.info(pformat(get_minified_target(target)))
+                    logger.info("%s", MinifiedTargetFormatter(target))
                     return registered_targets
             else:
                 return registered_targets
@@ -823,36 +1435,175 @@ class BuildLogParserContext(Parser, EntryPoint):
         if working_dir:
             target["working_dir"] = self.get_dir_arg(working_dir)
 
-        logger.info(" > Registering new target:")
-        logger.info(pformat(get_minified_target(target)))
-        self.targets.append(target)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(" > Registering new target:")
+            logger.debug("%s", MinifiedTargetFormatter(target))
+        if tracer.enabled:
+            tracer.write("register", target=get_minified_target(target))
+        self._append_target(target)
         self._add_target_to_index(target)
         registered_targets.append(target)
 
-        for dep_target in dependencies:
+        if probe is not None:
+            probe.target = target
+            probe.key = self._last_target_key
+        for idx, dep_target in enumerate(dependencies):
             registered_targets.extend(self.register_target(dep_target))
+            if probe is not None and idx < preceding_dependencies:
+                probe.key = self._last_target_key
 
         return registered_targets
 
+    def _append_target(self, target):
+        self.targets.append(target)
+        if self.dependency_scanner.is_parallel:
+            self._target_key_seq += 1
+            self._last_target_key = self._target_key_prefix + (self._target_key_seq,)
+            self._target_keys[id(target)] = self._last_target_key
+
+    def _get_ordered_targets(self):
+        targets = list(self.targets)
+        if self.dependency_scanner.is_parallel:
+            targets.sort(key=lambda t: self._target_keys[id(t)])
+        return targets
+
     def split_target_dependencies(self, target, log=True):
         dependencies = []
         for idx, dep in enumerate(target["dependencies"] or []):
             if type(dep) is dict:
                 dependencies.append(dep)
                 target["dependencies"][idx] = dep["output"]
+        if self._is_registered(target):
+            # Dependencies of registered target were modified in place
+            # (e.g. by objcopy parser)
+            self._add_target_references(target)
         return target, dependencies
 
+    def _is_registered(self, target):
+        output = target.get("output")
+        return self.target_index.get(output) is target
+
+    def _get_target_references(self, target):
+        for key in ["dependencies", "objects"]:
+            for dep in target.get(key) or []:
+                if not isinstance(dep, dict):
+                    yield dep
+
+    def _add_target_references(self, target):
+        for dep in self._get_target_references(target):
+            self._referencing_targets.setdefault(dep, {})[id(target)] = target
+
+    def _remove_target(self, target):
+        del self.target_index[target["output"]]
+        self.targets.remove(target)
+        self._remove_target_name(target)
+        for dep in self._get_target_references(target):
+            self._referencing_targets.get(dep, {}).pop(id(target), None)
+
     def _add_target_to_index(self, target):
         if "output" in target:
             self.target_index[target["output"]] = target
             for output in target.get("msvc_import_lib") or []:
                 self.target_index[output] = target
         else:
-            logger.warn("Target has no output:")
-            logger.warn(pformat(get_minified_target(target)))
+            logger.warning("Target has no output:")
+            logger.warning("%s", MinifiedTargetFormatter(target))
+        if target.get("name") is not None:
+            self._targets_by_name.setdefault(target["name"], []).append(target)
+        self._add_target_references(target)
         if target["type"] == "variable":
+            if target["output"] not in self._variable_targets:
+                self._variable_matcher.add(target["output"])
+                self._invalidate_resolved_paths()
             self._variable_targets[target["output"]] = target
 
+    def add_recorded_dependencies(self, directory, index):
+        """
+        Register header dependencies recorded by the build system
+        (e.g. .ninja_deps).
+
+        index maps output paths to lists of dependency paths.
+        Relative paths are relative to directory.
+        """
+        for output, dependencies in index.items():
+            output = self.normalize_path(output, directory)
+            self._recorded_dependencies[output] = (directory, dependencies)
+
+    def get_recorded_dependencies(self, output):
+        """
+        Returns normalized paths of header dependencies recorded for
+        normalized output path, or None.
+        """
+        entry = self._recorded_dependencies.get(output)
+        if entry is None:
+            return None
+        directory, dependencies = entry
+        return [self.normalize_path(p, directory) for p in dependencies]
+
+    def scan_implicit_dependencies(
+        self,
+        commands,
+        on_output,
+        dependencies,
+        encoding="ascii",
+        inputs=None,
+        list_dependencies=None,
+    ):
+        """
+        Run header dependency probes for current target.
+
+        on_output(results) receives a list of ProbeResult. If --jobs > 1,
+        it is called after current target is registered. Results are
+        applied as if they were available now: new items of `dependencies`
+        are moved to its current end, file targets added there are
+        registered and ordered as if they were registered with current
+        target (see _get_ordered_targets()).
+        inputs and list_dependencies(results) provide paths of source files
+        and headers for --probe_cache.
+        """
+        cwd = self.working_dir
+        kwargs = {
+            "encoding": encoding,
+            "inputs": inputs,
+            "list_dependencies": list_dependencies,
+        }
+        if not self.dependency_scanner.is_parallel:
+            self.dependency_scanner.submit(commands, cwd, on_output, **kwargs)
+            return
+
+        current_target = self.current_target
+        probe = _PendingProbe(len(dependencies))
+        self._pending_probes[id(dependencies)] = probe
+
+        def _on_output(results):
+            saved_target = self.current_target
+            saved_key_prefix = self._target_key_prefix
+            # restore working directory of the probed command
+            self.current_target = current_target
+            try:
+                size = len(dependencies)
+                on_output(results)
+                new_dependencies = dependencies[size:]
+                del dependencies[size:]
+                dependencies[probe.position:probe.position] = new_dependencies
+                if probe.target is None:
+                    # Target wasn't registered, neither are its dependencies
+                    self._pending_probes.pop(id(dependencies), None)
+                    return
+                self._target_key_prefix = probe.key
+                for idx, dep in enumerate(dependencies):
+                    if type(dep) is dict:
+                        dependencies[idx] = dep["output"]
+                        self.register_target(dep)
+                self._add_target_references(probe.target)
+            except Exception:
+                logging.error(traceback.format_exc())
+            finally:
+                self.current_target = saved_target
+                self._target_key_prefix = saved_key_prefix
+
+        self.dependency_scanner.submit(commands, cwd, _on_output, **kwargs)
+
     def get_implicit_include_dirs(
         self,
         sources,
@@ -901,44 +1652,430 @@ def _group_by_duplicate_names(targets):
     return duplicate_name_groups
 
 
-def parse_targets(targets, context, parsers, log_type=None):
-    result_targets = []
+# Skips lines that can't be commands handled by parsers, before they
+# are passed to the parser chain.
+# Line is kept if it contains a name of program handled by tool parser
+# (see 'programs'), one of 'line_keywords' of other parsers, or if it
+# is a part of multi-line command (ends with or follows '\').
+# Lines that match 'carryover_regex' of some parser are kept, and so are
+# lines that follow them, up to the next line that is kept anyway.
+# Program names are matched like get_program_names() splits paths:
+# /usr/bin/x86_64-linux-gnu-gcc or "C:\VC\bin\CL.EXE" contain gcc and cl.
+class LineFilter(object):
+    def __init__(self, regex, carryover_regex=None):
+        self.regex = regex
+        self.carryover_regex = carryover_regex
+        self._continued = False
+        self._carried_over = False
+
+    # Returns 'carryover_regex' of parsers combined into one pattern,
+    # None if there are none
+    @staticmethod
+    def get_carryover_pattern(parsers):
+        patterns = []
+        for parser in parsers:
+            pattern = getattr(parser, "carryover_regex", None)
+            if pattern is not None and pattern not in patterns:
+                patterns.append(pattern)
+        if not patterns:
+            return None
+        return "|".join(["(?:{})".format(p) for p in patterns])
+
+    # Returns regex for LineFilter, None if some parser needs every line
+    @staticmethod
+    def get_regex(parsers):
+        names = set()
+        keywords = set()
+        for parser in parsers:
+            programs = getattr(parser, "programs", None)
+            if programs is not None:
+                names.update([name.lower() for name in programs])
+                continue
+            line_keywords = getattr(parser, "line_keywords", None)
+            if line_keywords is None:
+                return None
+            keywords.update(line_keywords)
+
+        alternatives = []
+        if names:
+            names = sorted(names, key=len, reverse=True)
+            pattern = "|".join([re.escape(n) for n in names])
+            alternatives.append(
+                r"(?<![\w.+])(?:{})(?:\.exe|\.bat|\.sh)?(?![\w.+-])".format(pattern)
+            )
+        alternatives.extend([re.escape(k) for k in sorted(keywords)])
+        if not alternatives:
+            # Nothing but multi-line commands
+            alternatives.append(r"(?!)")
+        return re.compile("|".join(alternatives), re.IGNORECASE)
+
+    def filter(self, lines):
+        search = self.regex.search
+        carryover_search = None
+        if self.carryover_regex is not None:
+            carryover_search = self.carryover_regex.search
+        continued = self._continued
+        carried_over = self._carried_over
+        result = []
+        for line in lines:
+            if carryover_search is not None and carryover_search(line):
+                result.append(line)
+                carried_over = True
+            elif continued or line.endswith("\\"):
+                result.append(line)
+            elif search(line):
+                result.append(line)
+                carried_over = False
+            elif carried_over:
+                result.append(line)
+            continued = line.endswith("\\")
+        self._continued = continued
+        self._carried_over = carried_over
+        return result
 
-    for target in targets:
-        logger.debug(" > Parsing target:")
-        logger.debug(pformat(get_minified_target(target)))
 
-        for idx, parser in enumerate(parsers):
+# Header dependency probe of a target that isn't registered yet
+# (see BuildLogParserContext.scan_implicit_dependencies())
+class _PendingProbe(object):
+    def __init__(self, position):
+        # Position of new items in target's dependencies
+        self.position = position
+        # Registered target and key of the last target registered
+        # before targets found by the probe
+        self.target = None
+        self.key = None
+
+
+# Passes targets through parsers.
+# Parsers that are applicable to a log type are selected once, when
+# the log type is seen for the first time. Targets are processed
+# depth-first, using explicit stack instead of recursion: if a parser
+# returns a list of targets, each of them is passed to the parsers that
+# follow it in the chain, before the next input target is processed.
+# Tool parsers (parsers with 'programs' attribute) receive only commands
+# that may invoke one of their programs, see get_program_names().
+class ParserChain(object):
+    class _Chain(object):
+        def __init__(self, parsers, cache_size=1024):
+            self.parsers = [parser.parse for parser in parsers]
+            # idx => end of consecutive tool parsers starting at idx,
+            # None if parser at idx is not a tool parser
+            self.tools_end = [None] * (len(parsers) + 1)
+            self.program_index = {}  # program name => [idx]
+            for idx in reversed(range(len(parsers))):
+                programs = getattr(parsers[idx], "programs", None)
+                if programs is None:
+                    continue
+                self.tools_end[idx] = self.tools_end[idx + 1] or idx + 1
+                for name in programs:
+                    self.program_index.setdefault(name.lower(), []).append(idx)
+            self._handlers = BoundedCache(cache_size)
+
+        # Returns sorted indices of tool parsers that may handle the program
+        def get_handlers(self, program):
+            handlers = self._handlers.get(program)
+            if handlers is None:
+                handlers = set()
+                for name in os_ext.get_program_names(program):
+                    handlers.update(self.program_index.get(name, []))
+                handlers = sorted(handlers)
+                self._handlers.put(program, handlers)
+            return handlers
+
+    def __init__(self, context, parsers):
+        self.context = context
+        self.parsers = parsers
+        self._chains = {}  # log_type => _Chain
+        # log_type => (regex or None, carryover regex or None)
+        self._line_filter_regexes = {}
+        # Called with commands that tool parsers handle,
+        # commands are skipped if it returns False
+        self.command_filter = None
+
+    def get_applicable_parsers(self, log_type=None):
+        applicable_parsers = []
+        for parser in self.parsers:
             is_applicable = getattr(parser, "is_applicable", None)
             if is_applicable is None or is_applicable(log_type=log_type):
-                logger.debug(type(parser).__name__)
-                try:
-                    context.current_target = target
-                    result = parser.parse(target)
-                    if isinstance(
-                        result, list
-                    ):  # parser is allowed to return multiple targets
+                applicable_parsers.append(parser)
+        return applicable_parsers
+
+    def get_chain(self, log_type=None):
+        chain = self._chains.get(log_type)
+        if chain is None:
+            chain = self._Chain(self.get_applicable_parsers(log_type))
+            self._chains[log_type] = chain
+        return chain
+
+    # Returns new LineFilter for a log, None if lines can't be filtered
+    def get_line_filter(self, log_type=None):
+        if log_type not in self._line_filter_regexes:
+            parsers = self.get_applicable_parsers(log_type)
+            regex = LineFilter.get_regex(parsers)
+            carryover_regex = None
+            carryover_pattern = LineFilter.get_carryover_pattern(parsers)
+            if carryover_pattern is not None:
+                carryover_regex = re.compile(carryover_pattern, re.IGNORECASE)
+            self._line_filter_regexes[log_type] = (regex, carryover_regex)
+        regex, carryover_regex = self._line_filter_regexes[log_type]
+        if regex is None:
+            return None
+        return LineFilter(regex, carryover_regex)
+
+    # start: index of the first parser to apply (in chain of log_type).
+    # on_result: called for each target that passed through the chain,
+    # instead of registering targets with output.
+    def parse(self, targets, log_type=None, start=0, on_result=None):
+        chain = self.get_chain(log_type)
+        parsers = chain.parsers
+        tools_end = chain.tools_end
+        chain_length = len(parsers)
+        context = self.context
+        debug = logger.isEnabledFor(logging.DEBUG)
+        trace = tracer.enabled
+        command_filter = self.command_filter
+        result_targets = []
+
+        for target in targets:
+            # (target, index of the first parser to apply)
+            # Top of the stack is the next target to process.
+            stack = [(target, start)]
+            while stack:
+                target, idx = stack.pop()
+                if debug:
+                    logger.debug(" > Parsing target:")
+                    logger.debug("%s", MinifiedTargetFormatter(target))
+                if trace:
+                    tracer.write("parse", target=get_minified_target(target))
+
+                while idx < chain_length:
+                    end = tools_end[idx]
+                    if end is not None:
+                        # Skip tool parsers that don't handle the program
+                        tokens = target.get("tokens") if target else None
+                        if not tokens:
+                            idx = end
+                            continue
+                        handlers = chain.get_handlers(tokens[0])
+                        pos = bisect.bisect_left(handlers, idx)
+                        if pos == len(handlers) or handlers[pos] >= end:
+                            idx = end
+                            continue
+                        idx = handlers[pos]
+                        if command_filter is not None and not command_filter(target):
+                            target = None
+                            break
+
+                    parse = parsers[idx]
+                    idx += 1
+                    if debug:
+                        logger.debug(type(parse.__self__).__name__)
+                    try:
+                        context.current_target = target
+                        result = parse(target)
+                    except Exception:
+                        logging.error(traceback.format_exc())
+                        continue
+
+                    if isinstance(result, list):
+                        # parser is allowed to return multiple targets
                         target = None
-                        result_targets += parse_targets(
-                            result,
-                            context,
-                            parsers[idx + 1:],
-                            log_type=log_type,
-                        )
+                        if result:
+                            stack.extend([(t, idx) for t in reversed(result)])
                         break
-                    else:
-                        if target != result:
+
+                    # Comparing targets is expensive, do it only
+                    # if the difference is going to be reported
+                    if (debug or trace) and target != result:
+                        if debug:
                             logger.debug(" > Modified target:")
-                            logger.debug(pformat(get_minified_target(result)))
-                        target = result
-                except Exception:
-                    logging.error(traceback.format_exc())
+                            logger.debug("%s", MinifiedTargetFormatter(result))
+                        if trace:
+                            tracer.write(
+                                "modify",
+                                parser=type(parse.__self__).__name__,
+                                target=get_minified_target(result),
+                            )
+                    target = result
+                else:
+                    if on_result is not None:
+                        on_result(target)
+                        continue
+
+                if target and "output" in target:
+                    result_targets.append(target)
+                    context.register_target(target)
+
+        return result_targets
+
+
+# Returns full paths of outputs that match required target (see
+# provide_required_targets), None if there are none.
+# outputs: relocatable path => full path
+def _match_required_target(context, key, outputs):
+    if key in outputs:
+        return [outputs[key]]
+    if key.startswith("@"):
+        # Existing file that isn't produced by any command
+        return []
+    output = context._construct_path_arg(context.normalize_path(key)).relocatable
+    if output in outputs:
+        return [outputs[output]]
+
+    found = []
+    if "*" in key:
+        fname_glob = os.path.basename(key)
+        dir_glob = os.path.dirname(output)
+        is_recursive_glob = "\\" not in key and "/" not in key
+        for relocatable_path, path in outputs.items():
+            if not fnmatch.fnmatch(os.path.basename(relocatable_path), fname_glob):
+                continue
+            dir_ = os.path.dirname(relocatable_path)
+            if not is_recursive_glob and not fnmatch.fnmatch(dir_, dir_glob):
+                continue
+            found.append(path)
+    else:
+        # Target names are chosen by parsers, try common ones:
+        # lib/libfoo.a => foo.static, foo, libfoo, lib_libfoo_a
+        platform = context.platform
+        for relocatable_path, path in outputs.items():
+            filename = os.path.basename(relocatable_path)
+            stem = filename.split(".", 1)[0]
+            names = [
+                stem,
+                stem[3:] if stem.startswith("lib") else None,
+                relocatable_path[relocatable_path.rfind("@") + 2:]
+                .replace("/", "_")
+                .replace(".", "_"),
+            ]
+            if platform.is_static_lib(filename):
+                descr = platform.parse_static_lib(filename)
+            elif platform.is_shared_lib(filename):
+                descr = platform.parse_shared_lib(filename)
+            else:
+                descr = platform.parse_executable(filename)
+            if descr:
+                names.append(descr["target_name"])
+            if key in names:
+                found.append(path)
+    return found or None
+
+
+# Characters that can continue file name after output path
+_PATH_CHARS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.-+#"
+)
+
 
-        if target and "output" in target:
-            result_targets.append(target)
-            context.register_target(target)
+# Returns output found by matcher in any string of target (path
+# arguments may be embedded in flags), or None.
+def _find_referenced_output(target, matcher, ignored_outputs=()):
+    if not len(matcher):
+        return None
+    values = [target]
+    while values:
+        value = values.pop()
+        if isinstance(value, dict):
+            values.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            values.extend(value)
+        elif isinstance(value, str):
+            for output in matcher.find_all(value):
+                if output in ignored_outputs:
+                    continue
+                idx = value.find(output)
+                while idx != -1:
+                    end = idx + len(output)
+                    if end == len(value) or value[end] not in _PATH_CHARS:
+                        return output
+                    idx = value.find(output, idx + 1)
+    return None
+
+
+# Minimal context for parallel safe parsers in worker processes
+class _ShardContext(object):
+    def __init__(self, platform_name, working_dir):
+        self.platform_name = platform_name
+        self.platform = os_ext.get_platform(platform_name)
+        self.current_target = None
+        self._working_dir = working_dir
+
+    @property
+    def working_dir(self):
+        if self.current_target is not None and self.current_target.get("working_dir"):
+            return self.current_target["working_dir"]
+        else:
+            return self._working_dir
+
+    @working_dir.setter
+    def working_dir(self, value):
+        self._working_dir = value
+
+    def normalize_path(self, path, working_dir=None):
+        if working_dir is None:
+            working_dir = self.working_dir
+        return self.platform.normalize_path(self.platform.path_join(working_dir, path))
+
+
+# Tool parsers of worker process: (parsers, ParserChain._Chain)
+_shard_argument_parsers = None
+
+
+def _init_shard_worker(argument_parsers):
+    global _shard_argument_parsers
+    _shard_argument_parsers = (
+        argument_parsers,
+        ParserChain._Chain(argument_parsers),
+    )
 
-    return result_targets
+
+# Returns {parser class name: (tokens, parse_arguments(tokens))}
+# for tool parsers that may handle the command
+def _parse_arguments(tokens):
+    parsers, chain = _shard_argument_parsers
+    parsed_arguments = {}
+    for idx in chain.get_handlers(tokens[0]):
+        parser = parsers[idx]
+        try:
+            arguments = parser.parse_arguments(tokens)
+        except Exception:
+            # Error is reported when the command is parsed again
+            continue
+        parsed_arguments[type(parser).__name__] = (list(tokens), arguments)
+    return parsed_arguments
+
+
+# Runs parallel safe parsers on a shard of the log in worker process,
+# arguments of commands are parsed in advance for tool parsers
+# (target["parsed_arguments"]).
+# Returns [(context working dir, target)] for targets that passed
+# through the parsers.
+def _parse_shard(shard):
+    path, start, end, log_type, context, parsers, line_regexes, eof = shard
+    line_filter = LineFilter(*line_regexes) if line_regexes is not None else None
+    chain = ParserChain(context, parsers)
+    results = []
+
+    def _on_result(target):
+        tokens = target.get("tokens") if target else None
+        if tokens:
+            parsed_arguments = _parse_arguments(tokens)
+            if parsed_arguments:
+                target["parsed_arguments"] = parsed_arguments
+        results.append((context._working_dir, target))
+
+    for lines in read_log_lines(path, start=start, end=end):
+        if line_filter is not None:
+            lines = line_filter.filter(lines)
+        targets = [{"line": line} for line in lines]
+        chain.parse(targets, log_type=log_type, on_result=_on_result)
+    if eof:
+        chain.parse([{"eof": True}], log_type=log_type, on_result=_on_result)
+    return results
+
+
+def parse_targets(targets, context, parsers, log_type=None):
+    return ParserChain(context, parsers).parse(targets, log_type=log_type)
 
 
 def deduplicate_target_names(targets):
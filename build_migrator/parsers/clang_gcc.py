@@ -3,8 +3,8 @@ from itertools import chain
 import logging
 import os
 import re
-import subprocess
 from build_migrator.common.algorithm import flatten_list
+from build_migrator.common.depfile import read_depfile
 from build_migrator.helpers import (
     get_module_target,
     ModuleTypes,
@@ -64,6 +64,7 @@ class Clang_Gcc(CompilerParser, LinkerParser):
         self.program_re = self.platform.get_program_path_re(
             "cc", "c++", "clang", "clang++", "gcc", "g++"
         )
+        self.programs = self.program_re.names
 
         # Clang/GCC arguments
         # See https://linux.die.net/man/1/gcc
@@ -78,6 +79,8 @@ class Clang_Gcc(CompilerParser, LinkerParser):
             include_dirs=[],
             link_flags=[],
             compile_flags=[],
+            write_depfile=False,
+            depfile=None,
         )
 
         # control flags
@@ -85,9 +88,9 @@ class Clang_Gcc(CompilerParser, LinkerParser):
         self.parser.add_argument(
             "-E", action="store_const", const=self.Mode.preprocess, dest="mode"
         )
-        self.parser.add_argument("-MD", action="store_true")
-        self.parser.add_argument("-MF")
-        self.parser.add_argument("-MMD", action="store_true")
+        self.parser.add_argument("-MD", action="store_true", dest="write_depfile")
+        self.parser.add_argument("-MF", dest="depfile")
+        self.parser.add_argument("-MMD", action="store_true", dest="write_depfile")
         self.parser.add_argument("-MP", action="store_true")
         self.parser.add_argument("-MT")
         self.parser.add_argument(
@@ -218,9 +221,39 @@ class Clang_Gcc(CompilerParser, LinkerParser):
         include_dirs,
         sources,
         target_platform,
-        cwd,
+        on_dependencies,
+        depfile=None,
+        output=None,
     ):
         if not sources:
+            on_dependencies(None)
+            return
+
+        implicit_dependencies = None
+        if output is not None:
+            recorded_dependencies = self.context.get_recorded_dependencies(output)
+            if recorded_dependencies is not None:
+                implicit_dependencies = self._filter_dependencies(
+                    recorded_dependencies, sources
+                )
+        if implicit_dependencies is None and depfile is not None:
+            prerequisites = read_depfile(depfile, self.context.working_dir)
+            if prerequisites is not None:
+                implicit_dependencies = self._filter_dependencies(
+                    [self.context.normalize_path(p) for p in prerequisites], sources
+                )
+            if implicit_dependencies is None:
+                logger.debug(
+                    "Dependency file %s is missing or stale, running compiler",
+                    depfile,
+                )
+        if implicit_dependencies is not None:
+            on_dependencies(
+                [
+                    self.context.get_file_arg(dep, dependencies)
+                    for dep in implicit_dependencies
+                ]
+            )
             return
 
         include_dir_args = ["-I" + d for d in include_dirs]
@@ -236,33 +269,69 @@ class Clang_Gcc(CompilerParser, LinkerParser):
                 if target_platform == "darwin":
                     compile_flags = compile_flags + ["--target=i686-apple-darwin10"]
 
-        implicit_dependencies = []
-        implicit_dependencies_set = set()
-        for compile_flags in self._split_compile_flags_for_multiarch(compile_flags):
-            cmd = (
-                [compiler, "-M"]
-                + flatten_list(compile_flags)
-                + include_dir_args
-                + sources
-            )
-            p = subprocess.Popen(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd
+        commands = [
+            [compiler, "-M"] + flatten_list(compile_flags) + include_dir_args + sources
+            for compile_flags in self._split_compile_flags_for_multiarch(
+                compile_flags
             )
-            stdout, stderr = p.communicate()
-            if type(stdout) is not str:
-                stdout = stdout.decode("utf-8", "replace")
-            if type(stderr) is not str:
-                stderr = stderr.decode("utf-8", "replace")
-            retcode = p.poll()
-            if retcode:
-                cmd_str = " ".join(cmd)
-                logger.error(
-                    "Command '{}' returned non-zero exit code {}\n{}".format(
-                        cmd_str, retcode, stderr
+        ]
+
+        def _list_dependencies(results):
+            return self._parse_dependencies(results, sources)
+
+        def _on_output(results):
+            for result in results:
+                if result.retcode:
+                    cmd_str = " ".join(result.cmd)
+                    logger.error(
+                        "Command '{}' returned non-zero exit code {}\n{}".format(
+                            cmd_str, result.retcode, result.stderr
+                        )
                     )
-                )
 
-            for line in stdout.splitlines():
+            on_dependencies(
+                [
+                    self.context.get_file_arg(
+                        self.context.normalize_path(dep), dependencies
+                    )
+                    for dep in _list_dependencies(results)
+                ]
+            )
+
+        self.context.scan_implicit_dependencies(
+            commands,
+            _on_output,
+            dependencies,
+            encoding="utf-8",
+            inputs=sources,
+            list_dependencies=_list_dependencies,
+        )
+
+    # Filters sources out of dependencies recorded during the build
+    # (-MD, -MMD depfile or .ninja_deps).
+    # Returns None if recorded dependencies belong to another command.
+    @staticmethod
+    def _filter_dependencies(paths, sources):
+        implicit_dependencies = []
+        implicit_dependencies_set = set()
+        for path in paths:
+            if path not in implicit_dependencies_set:
+                implicit_dependencies.append(path)
+                implicit_dependencies_set.add(path)
+
+        for source in sources:
+            if source not in implicit_dependencies_set:
+                # Dependency file belongs to another command
+                return None
+        return [dep for dep in implicit_dependencies if dep not in sources]
+
+    # Parse `-M` output
+    @staticmethod
+    def _parse_dependencies(results, sources):
+        implicit_dependencies = []
+        implicit_dependencies_set = set()
+        for result in results:
+            for line in result.stdout.splitlines():
                 files = line.rstrip("\\").lstrip().split(" ")
                 for f in files:
                     if not f or f.endswith(":") or f in sources:
@@ -270,11 +339,7 @@ class Clang_Gcc(CompilerParser, LinkerParser):
                     if f not in implicit_dependencies_set:
                         implicit_dependencies.append(f)
                         implicit_dependencies_set.add(f)
-
-        return [
-            self.context.get_file_arg(self.context.normalize_path(dep), dependencies)
-            for dep in implicit_dependencies
-        ]
+        return implicit_dependencies
 
     # filter libs from linker flags
     def _filter_lib_args(self, ns, dependencies):
@@ -401,22 +466,29 @@ class Clang_Gcc(CompilerParser, LinkerParser):
             result.append(f)
         return result
 
+    def parse_arguments(self, tokens):
+        # .strip('{}$') is a workaround for paths like ${LDCMD:-gcc}
+        # TODO: parameter expansion parser: http://wiki.bash-hackers.org/syntax/pe
+        if not self.program_re.match(tokens[0].strip("{}$")):
+            return None
+
+        return self.parser.parse_known_args(
+            tokens[1:], unknown_dest=["compile_flags", "link_flags"]
+        )
+
     def parse(self, target):
         tokens = target.get("tokens")
         if not tokens:
             return target
 
-        # .strip('{}$') is a workaround for paths like ${LDCMD:-gcc}
-        # TODO: parameter expansion parser: http://wiki.bash-hackers.org/syntax/pe
-        if not self.program_re.match(tokens[0].strip("{}$")):
+        arguments = self.get_parsed_arguments(target)
+        if arguments is None:
             return target
+        namespace, _ = arguments
 
         gcc = tokens.pop(0)
         gcc = self.context.apply_path_aliases(self.context.normalize_path(gcc, ignore_working_dir=True))
 
-        namespace, _ = self.parser.parse_known_args(
-            tokens, unknown_dest=["compile_flags", "link_flags"]
-        )
         if namespace.mode not in [self.Mode.link, self.Mode.assemble]:
             return target
 
@@ -507,26 +579,36 @@ class Clang_Gcc(CompilerParser, LinkerParser):
                 name = None
                 version = None
 
+        depfile = None
+        if namespace.mode == self.Mode.assemble and len(original_srcs) == 1:
+            depfile = namespace.depfile
+            if depfile is None and namespace.write_depfile:
+                depfile = os.path.splitext(namespace.output)[0] + ".d"
+
         namespace.output = self.context.normalize_path(namespace.output)
-        normalize_implicit_dependencies = self._add_implicit_dependencies(
+
+        def _add_implicit_include_dirs(normalize_implicit_dependencies):
+            namespace.include_dirs.extend(
+                self.context.get_implicit_include_dirs(
+                    sources,
+                    namespace.include_dirs,
+                    normalize_implicit_dependencies,
+                )
+            )
+
+        self._add_implicit_dependencies(
             gcc,
             dependencies,
             namespace.compile_flags,
             include_dirs_not_relocatable,
             original_srcs,
             self.platform_name,
-            self.context.working_dir,
+            _add_implicit_include_dirs,
+            depfile=depfile,
+            output=namespace.output,
         )
         namespace.output = self.context.get_output(namespace.output, dependencies)
 
-        namespace.include_dirs.extend(
-            self.context.get_implicit_include_dirs(
-                sources,
-                namespace.include_dirs,
-                normalize_implicit_dependencies,
-            )
-        )
-
         target = get_module_target(
             module_type,
             name,
@@ -20,6 +20,7 @@ class CMake(Parser):
         self.context = context
         self.platform = context.platform
         self.program_re = self.platform.get_program_path_re("cmake")
+        self.programs = self.program_re.names
 
         self.parser = ArgumentParserEx(prog="cmake")
         self.parser.add_argument("-E", dest="command", nargs="+")
@@ -0,0 +1,171 @@
+import json
+import logging
+import re
+from build_migrator.modules import Parser
+from build_migrator.parsers._common.command_tokenizer import CommandTokenizer
+from build_migrator.parsers._common.response_file import ResponseFile
+from build_migrator.parsers._common.inline_file_content import InlineFileContent
+
+
+logger = logging.getLogger(__name__)
+
+
+# Provides parser for JSON Compilation Database (compile_commands.json)
+# See https://clang.llvm.org/docs/JSONCompilationDatabase.html
+# Database is read in chunks of text (see 'text_chunks') and decoded
+# incrementally, one entry at a time, so it never has to be loaded whole,
+# even if it's minified into a single line. Entries are converted into
+# tokenized targets, i.e. make log parsers and CommandTokenizer are
+# not involved.
+class CompDbLog(Parser):
+    separator_re = re.compile(r"[\s,]*")
+    # Entries are objects with string and array of string values.
+    # Strings are skipped whole, string at the end of buffer may be
+    # incomplete.
+    entry_token_re = re.compile(
+        r'"[^"\\]*(?:\\.[^"\\]*)*"'
+        r'|(?P<incomplete>"[^"\\]*(?:\\.[^"\\]*)*\\?\Z)'
+        r"|[{}]",
+        re.DOTALL,
+    )
+    entry_start_re = re.compile(r"[{\]]")
+
+    priority = 0
+    text_chunks = True
+
+    @staticmethod
+    def add_arguments(arg_parser):
+        pass
+
+    @staticmethod
+    def is_applicable(log_type=None):
+        return log_type == "compdb"
+
+    def __init__(self, context, tokenizer_ruleset=None):
+        self.context = context
+        self.tokenizer = CommandTokenizer(context, tokenizer_ruleset=tokenizer_ruleset)
+        self.decoder = json.JSONDecoder()
+        self._reset()
+
+    def _reset(self):
+        # Chunks of text that are not decoded yet
+        self.chunks = []
+        self.chunks_size = 0
+        # Buffer is decoded again once it's twice as large as it was
+        # when decoding stopped at incomplete entry, so that large
+        # entries are not decoded again for every chunk
+        self.min_decode_size = 0
+        self.array_started = False
+        self.array_finished = False
+
+    def _get_target(self, entry):
+        tokens = entry.get("arguments")
+        if tokens is None:
+            tokens = self.tokenizer.cmdline_split(entry["command"])
+        working_dir = self.context.normalize_path(entry["directory"])
+        return {"tokens": list(tokens), "working_dir": working_dir}
+
+    # Returns end of entry that starts at pos, or None if it's incomplete.
+    # Entry ends early at "{", which can't be a part of valid entry.
+    def _find_entry_end(self, buffer, pos):
+        for match in self.entry_token_re.finditer(buffer, pos + 1):
+            if match.group("incomplete") is not None:
+                break
+            if match.group() == "}":
+                return match.end()
+            if match.group() == "{":
+                return match.start()
+        return None
+
+    @staticmethod
+    def _shorten(text, max_length=200):
+        if len(text) <= max_length:
+            return text
+        return text[:max_length] + "..."
+
+    # Decodes complete entries accumulated in chunks
+    def _decode(self):
+        entries = []
+        buffer = "".join(self.chunks)
+        pos = 0
+        while True:
+            pos = self.separator_re.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            if not self.array_started:
+                if buffer[pos] != "[":
+                    logger.error("Compilation database must be a JSON array")
+                    self.array_finished = True
+                    pos = len(buffer)
+                    break
+                self.array_started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                self.array_finished = True
+                pos = len(buffer)
+                break
+
+            if buffer[pos] == "{":
+                try:
+                    entry, pos = self.decoder.raw_decode(buffer, pos)
+                    entries.append(entry)
+                    continue
+                except ValueError:
+                    # Either incomplete or invalid
+                    end = self._find_entry_end(buffer, pos)
+                    if end is None:
+                        # Wait for more text
+                        break
+            else:
+                match = self.entry_start_re.search(buffer, pos)
+                if match is None:
+                    # Next entry may start in the next chunk
+                    break
+                end = match.start()
+            logger.error(
+                "Invalid compilation database entry: %s",
+                self._shorten(buffer[pos:end]),
+            )
+            pos = end
+
+        buffer = buffer[pos:]
+        self.chunks = [buffer] if buffer else []
+        self.chunks_size = len(buffer)
+        self.min_decode_size = 2 * len(buffer)
+        return entries
+
+    def _get_targets(self, entries):
+        targets = []
+        for entry in entries:
+            try:
+                targets.append(self._get_target(entry))
+            except (KeyError, TypeError, ValueError):
+                logger.error("Invalid compilation database entry: %r", entry)
+        return targets
+
+    def parse(self, target):
+        if target.get("eof"):
+            targets = []
+            if self.chunks and not self.array_finished:
+                targets = self._get_targets(self._decode())
+            if self.array_started and not self.array_finished:
+                logger.error(
+                    "Compilation database is incomplete: %s",
+                    self._shorten("".join(self.chunks)),
+                )
+            self._reset()
+            return targets + [target]
+
+        text = target.get("text")
+        if not text or self.array_finished:
+            return []
+
+        self.chunks.append(text)
+        self.chunks_size += len(text)
+        if self.chunks_size < self.min_decode_size:
+            return []
+        return self._get_targets(self._decode())
+
+
+__all__ = ["CompDbLog", "ResponseFile", "InlineFileContent"]
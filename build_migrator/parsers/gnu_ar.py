@@ -24,6 +24,7 @@ class GnuAr(Parser):
     def __init__(self, context):
         self.platform = context.platform
         self.program_re = self.platform.get_program_path_re("ar")
+        self.programs = self.program_re.names
         self.context = context
 
         # see https://linux.die.net/man/1/ar
@@ -10,6 +10,7 @@ logger = logging.getLogger(__name__)
 
 class GnuCpLnMv(Parser):
     filename_re = os_ext.Unix.get_program_path_re("cp", "ln", "mv")
+    programs = filename_re.names
 
     priority = 7
 
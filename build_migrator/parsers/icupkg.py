@@ -16,6 +16,7 @@ class Icupkg(ParserBase):
 
         self.platform = context.platform
         self.program_re = self.platform.get_program_path_re("icupkg")
+        self.programs = self.program_re.names
 
         # https://helpmanual.io/help/icupkg/
         self.parser = ArgumentParserEx()
@@ -18,6 +18,7 @@ class Libtool(Parser):
         self.context = context
         self.platform = context.platform
         self.program_re = self.platform.get_program_path_re("libtool")
+        self.programs = self.program_re.names
 
         # see https://www.gnu.org/software/libtool/manual/libtool.html
         self.parser = ArgumentParserNoExit(prog="libtool")
@@ -55,6 +55,7 @@ def prepare_toolchain_include_dirs(dirs, context):
 class MsvcCl(CompilerParser, LinkerParser):
     filename_re = os_ext.Windows.get_program_path_re("cl")
     clang_cl_re = os_ext.Windows.get_program_path_re("clang-cl")
+    programs = filename_re.names + clang_cl_re.names
 
     c_exts = [".c"]
     cpp_exts = [".cc", ".cpp", ".cxx"]
@@ -280,44 +281,86 @@ class MsvcCl(CompilerParser, LinkerParser):
         include_dirs,
         sources,
         cwd,
+        on_dependencies,
         is_clang_cl=False,
+        output=None,
     ):
         if not sources:
+            on_dependencies(None)
             return
 
+        if output is not None:
+            recorded_dependencies = self.context.get_recorded_dependencies(output)
+            if recorded_dependencies is not None:
+                on_dependencies(
+                    self._get_dependencies(
+                        recorded_dependencies, dependencies, is_clang_cl
+                    )
+                )
+                return
+
         _compiler = os.path.join(cwd, compiler)
         if os.path.exists(_compiler):
             compiler = _compiler
 
         cmd = [compiler, "/Zs", "/showIncludes"]
         cmd += ["-I" + d for d in include_dirs] + flatten_list(compile_flags) + sources
-        try:
-            stdout, stderr = subprocess_ex.check_output(cmd, cwd=cwd)
-        except subprocess_ex.CalledProcessError as e:
-            logger.error("{}\nstderr:\n{}stdout:\n{}".format(e, e.stderr, e.stdout))
-            return
 
+        def _on_output(results):
+            result = results[0]
+            if result.retcode:
+                e = subprocess_ex.CalledProcessError(
+                    result.retcode, cmd, stdout=result.stdout, stderr=result.stderr
+                )
+                logger.error("{}\nstderr:\n{}stdout:\n{}".format(e, e.stderr, e.stdout))
+                on_dependencies(None)
+                return
+
+            on_dependencies(
+                self._get_dependencies(
+                    self._parse_dependencies(results), dependencies, is_clang_cl
+                )
+            )
+
+        self.context.scan_implicit_dependencies(
+            [cmd],
+            _on_output,
+            dependencies,
+            inputs=sources,
+            list_dependencies=self._parse_dependencies,
+        )
+
+    # Skips toolchain headers
+    def _get_dependencies(self, paths, dependencies, is_clang_cl):
         normalize_implicit_dependencies = []
         toolchain_include_dirs = self.msvc_include_dirs
         if is_clang_cl and self.clang_cl_include_dirs:
             toolchain_include_dirs = self.clang_cl_include_dirs
-        for line in stdout.splitlines():
-            m = self.include_note_re.match(line.strip())
-            if m:
-                try:
-                    path = self.context.normalize_path(m.group("path"))
-                    is_toolchain_header = False
-                    for d in toolchain_include_dirs:
-                        if path.startswith(d):
-                            is_toolchain_header = True
-                            break
-                    if not is_toolchain_header:
-                        normalize_implicit_dependencies.append(self.context.get_file_arg(path, dependencies))
-                except ValueError:
-                    # Path is on drive c:, build dir on drive d:
-                    pass
+        for path in paths:
+            try:
+                path = self.context.normalize_path(path)
+                is_toolchain_header = False
+                for d in toolchain_include_dirs:
+                    if path.startswith(d):
+                        is_toolchain_header = True
+                        break
+                if not is_toolchain_header:
+                    normalize_implicit_dependencies.append(self.context.get_file_arg(path, dependencies))
+            except ValueError:
+                # Path is on drive c:, build dir on drive d:
+                pass
         return normalize_implicit_dependencies
 
+    # Parse `/showIncludes` output
+    @classmethod
+    def _parse_dependencies(cls, results):
+        paths = []
+        for line in results[0].stdout.splitlines():
+            m = cls.include_note_re.match(line.strip())
+            if m:
+                paths.append(m.group("path"))
+        return paths
+
     def _get_clang_cl_toolchain_include_dirs(self, compiler):
         try:
             clang_cl_include_dirs_c = get_gcc_toolchain_include_dirs(
@@ -337,47 +380,55 @@ class MsvcCl(CompilerParser, LinkerParser):
         include_dirs.update(clang_cl_include_dirs_cpp)
         return [self.context.normalize_path(d) for d in include_dirs]
 
-    def parse(self, target):
-        tokens = target.get("tokens")
-        if not tokens:
-            return target
-
+    def parse_arguments(self, tokens):
         if not self.filename_re.match(tokens[0]):
-            return target
+            return None
 
         if len(tokens) < 2 or tokens[1] == ":":
             # skip warning message
-            return target
+            return None
 
-        compiler = tokens.pop(0)
-        is_clang_cl = bool(self.clang_cl_re.match(compiler))
-        compiler = self.context.apply_path_aliases(self.context.normalize_path(
-            compiler, ignore_working_dir=True
-        ))
-
-        if not is_clang_cl:
+        if not self.clang_cl_re.match(tokens[0]):
             namespace, _ = self.parser.parse_known_args(
-                tokens, unknown_dest="compile_flags"
+                tokens[1:], unknown_dest="compile_flags"
             )
         else:
             namespace, _ = self.clang_cl_parser.parse_known_args(
-                tokens, unknown_dest="compile_flags"
+                tokens[1:], unknown_dest="compile_flags"
             )
-            if self.clang_cl_include_dirs is None:
-                self.clang_cl_include_dirs = self._get_clang_cl_toolchain_include_dirs(
-                    compiler
-                )
-                logger.debug("clang-cl include dirs: %r" % self.clang_cl_include_dirs)
 
-        lib_dirs = []
-        dependencies = []
         if namespace.link_flags:
             link_flags = namespace.link_flags[0]
             namespace.link_flags = []
             namespace, _ = self.link_parser.parse_known_args(
                 link_flags[1:], namespace, unknown_dest=["link_flags"]
             )
+        return namespace
+
+    def parse(self, target):
+        tokens = target.get("tokens")
+        if not tokens:
+            return target
+
+        namespace = self.get_parsed_arguments(target)
+        if namespace is None:
+            return target
+
+        compiler = tokens.pop(0)
+        is_clang_cl = bool(self.clang_cl_re.match(compiler))
+        compiler = self.context.apply_path_aliases(self.context.normalize_path(
+            compiler, ignore_working_dir=True
+        ))
+
+        if is_clang_cl and self.clang_cl_include_dirs is None:
+            self.clang_cl_include_dirs = self._get_clang_cl_toolchain_include_dirs(
+                compiler
+            )
+            logger.debug("clang-cl include dirs: %r" % self.clang_cl_include_dirs)
 
+        lib_dirs = []
+        dependencies = []
+        if getattr(namespace, "lib_dirs", None):
             # Copied from msvc_link.py
             # TODO: unify msvc_cl.py, msvc_link.py, msvc_lib.py
             lib_dirs = list(
@@ -509,21 +560,28 @@ class MsvcCl(CompilerParser, LinkerParser):
             for s in sources:
                 deps_local.extend(src_info[s["path"]]["dependencies"])
                 original_sources.append(src_info[s["path"]]["unmodified_path"])
-            normalize_implicit_dependencies = self._add_implicit_dependencies(
+
+            def _add_implicit_include_dirs(
+                normalize_implicit_dependencies, sources=sources
+            ):
+                namespace.include_dirs.extend(
+                    self.context.get_implicit_include_dirs(
+                        sources,
+                        namespace.include_dirs,
+                        normalize_implicit_dependencies,
+                    )
+                )
+
+            self._add_implicit_dependencies(
                 compiler,
                 deps_local,
                 compile_flags_not_relocatable,
                 include_dirs_not_relocatable,
                 original_sources,
                 self.context.working_dir,
+                _add_implicit_include_dirs,
                 is_clang_cl=is_clang_cl,
-            )
-            namespace.include_dirs.extend(
-                self.context.get_implicit_include_dirs(
-                    sources,
-                    namespace.include_dirs,
-                    normalize_implicit_dependencies,
-                )
+                output=output,
             )
             import_lib = None
             descr = {}
@@ -11,6 +11,7 @@ class MsvcLib(Parser):
     filename_re = os_ext.Windows.get_program_path_re("lib")
     link_re = os_ext.Windows.get_program_path_re("link")
     lld_link_re = os_ext.Windows.get_program_path_re("lld-link")
+    programs = filename_re.names + link_re.names + lld_link_re.names
 
     priority = 7
 
@@ -24,6 +24,7 @@ def is_lib_shim(args):
 class MsvcLink(LinkerParser):
     filename_re = os_ext.Windows.get_program_path_re("link")
     lld_link_re = os_ext.Windows.get_program_path_re("lld-link")
+    programs = filename_re.names + lld_link_re.names
 
     priority = 7
 
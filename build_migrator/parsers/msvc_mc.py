@@ -22,6 +22,7 @@ class MsvcMc(ParserBase):
 
         self.platform = context.platform
         self.program_re = self.platform.get_program_path_re("mc")
+        self.programs = self.program_re.names
 
         # https://docs.microsoft.com/en-us/windows/windows/wes/message-compiler--mc-exe-
         # Currently, only small subset of flags is supported
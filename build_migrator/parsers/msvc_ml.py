@@ -101,6 +101,7 @@ def add_included_dependencies(
 
 class MsvcMl(CompilerParser):
     filename_re = os_ext.Windows.get_program_path_re("ml", "ml64")
+    programs = filename_re.names
 
     priority = 7
 
@@ -35,6 +35,7 @@ class ReplacePrefixArg(object):
 
 class MsvcRc(CompilerParser):
     filename_re = os_ext.Windows.get_program_path_re("rc")
+    programs = filename_re.names
 
     priority = 7
 
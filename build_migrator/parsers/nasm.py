@@ -1,6 +1,5 @@
 from copy import copy
 import logging
-import subprocess
 
 from build_migrator.common.argument_parser_ex import ArgumentParserEx
 import build_migrator.common.os_ext as os_ext
@@ -18,6 +17,7 @@ logger = logging.getLogger(__name__)
 
 class Nasm(CompilerParser):
     filename_re = os_ext.Windows.get_program_path_re("nasm")
+    programs = filename_re.names
 
     priority = 7
 
@@ -75,7 +75,6 @@ class Nasm(CompilerParser):
         include_dirs,
         preincludes,
         source,
-        cwd,
     ):
         include_dir_args = ["-I" + d for d in include_dirs]
         preinclude_args = ["-P" + p for p in preincludes]
@@ -86,35 +85,41 @@ class Nasm(CompilerParser):
             + include_dir_args
             + [source]
         )
-        p = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd
-        )
-        stdout, stderr = p.communicate()
-        if type(stdout) is not str:
-            stdout = stdout.decode("utf-8", "replace")
-        if type(stderr) is not str:
-            stderr = stderr.decode("utf-8", "replace")
-        retcode = p.poll()
-        if retcode:
-            logger.error(
-                "Command '{}' returned non-zero exit code {}\n{}".format(
-                    " ".join(cmd), retcode, stderr
+
+        def _list_dependencies(results):
+            implicit_dependencies = []
+            for line in results[0].stdout.splitlines():
+                files = line.rstrip("\\").lstrip().split(" ")
+                if len(files) > 1 and files[1] == ":":
+                    files = [files[0] + files[1]] + files[2:]
+                for f in files:
+                    if not f or f.endswith(":") or f == source:
+                        continue
+                    implicit_dependencies.append(f)
+            return implicit_dependencies
+
+        def _on_output(results):
+            result = results[0]
+            if result.retcode:
+                logger.error(
+                    "Command '{}' returned non-zero exit code {}\n{}".format(
+                        " ".join(cmd), result.retcode, result.stderr
+                    )
                 )
-            )
 
-        implicit_dependencies = []
-        for line in stdout.splitlines():
-            files = line.rstrip("\\").lstrip().split(" ")
-            if len(files) > 1 and files[1] == ":":
-                files = [files[0] + files[1]] + files[2:]
-            for f in files:
-                if not f or f.endswith(":") or f == source:
-                    continue
-                implicit_dependencies.append(f)
-        return [
-            self.context.get_file_arg(self.context.normalize_path(dep), dependencies)
-            for dep in implicit_dependencies
-        ]
+            for dep in _list_dependencies(results):
+                self.context.get_file_arg(
+                    self.context.normalize_path(dep), dependencies
+                )
+
+        self.context.scan_implicit_dependencies(
+            [cmd],
+            _on_output,
+            dependencies,
+            encoding="utf-8",
+            inputs=[source],
+            list_dependencies=_list_dependencies,
+        )
 
     def parse(self, target):
         tokens = target.get("tokens") or []
@@ -169,7 +174,6 @@ class Nasm(CompilerParser):
             namespace.include_dirs,
             namespace.preincludes,
             infile,
-            self.context.working_dir,
         )
 
         return get_module_target(
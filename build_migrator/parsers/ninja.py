@@ -1,4 +1,8 @@
+import logging
+import os
 import re
+import struct
+import traceback
 from build_migrator.parsers.autotools import (
     MakeLog,
     LineAccumulator,
@@ -9,12 +13,76 @@ from build_migrator.parsers.autotools import (
 )
 
 
+logger = logging.getLogger(__name__)
+
+
+NINJA_DEPS_FILENAME = ".ninja_deps"
+_ninja_deps_signature = b"# ninjadeps\n"
+_ninja_deps_versions = [3, 4]
+
+
+# Reads dependency log written by ninja for rules with `deps = gcc|msvc`.
+# See src/deps_log.cc in ninja sources.
+# Returns dict: output => list of dependencies (as written by ninja,
+# relative to its build directory).
+# File is processed in one linear pass, later records override earlier ones.
+# Truncated or corrupted tail is ignored (ninja does the same).
+def read_ninja_deps(path):
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if not data.startswith(_ninja_deps_signature):
+        raise ValueError("Not a ninja dependency log: %r" % path)
+    offset = len(_ninja_deps_signature)
+    (version,) = struct.unpack_from("<i", data, offset)
+    if version not in _ninja_deps_versions:
+        raise ValueError(
+            "Unsupported ninja dependency log version %d: %r" % (version, path)
+        )
+    offset += 4
+    # v4 stores 64-bit mtime, v3 - 32-bit
+    deps_offset = 3 if version == 4 else 2
+
+    paths = []
+    deps = {}  # output id => dependency ids
+    size = len(data)
+    while offset + 4 <= size:
+        (header,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        record_size = header & 0x7FFFFFFF
+        if record_size % 4 or offset + record_size > size:
+            logger.warning("Truncated ninja dependency log: %r", path)
+            break
+        if header & 0x80000000:
+            ids = struct.unpack_from("<%di" % (record_size // 4), data, offset)
+            deps[ids[0]] = ids[deps_offset:]
+        else:
+            end = offset + record_size - 4
+            (checksum,) = struct.unpack_from("<I", data, end)
+            if ~checksum & 0xFFFFFFFF != len(paths):
+                logger.warning("Corrupted ninja dependency log: %r", path)
+                break
+            paths.append(data[offset:end].rstrip(b"\0").decode("utf-8"))
+        offset += record_size
+
+    result = {}
+    for output_id, dependency_ids in deps.items():
+        try:
+            result[paths[output_id]] = [paths[i] for i in dependency_ids]
+        except IndexError:
+            logger.warning("Invalid record in ninja dependency log: %r", path)
+    return result
+
+
 # Provides directory context for commands executing via ninja
 # Strips prefix prefixes like '[1/999]' from command line messages
+# Loads header dependencies from .ninja_deps of each build directory
 class NinjaLog(MakeLog):
     prefix_re = re.compile(r"^\[\d+/\d+\] ")
 
     priority = 0
+    # Loads dependencies into context
+    parallel_safe = False
 
     @staticmethod
     def add_arguments(arg_parser):
@@ -27,9 +95,27 @@ class NinjaLog(MakeLog):
     def __init__(self, context):
         MakeLog.__init__(self, context)
         self.context = context
+        self._deps_loaded = set()
+
+    def _load_deps(self, directory):
+        if directory in self._deps_loaded:
+            return
+        self._deps_loaded.add(directory)
+
+        path = os.path.join(directory, NINJA_DEPS_FILENAME)
+        if not os.path.isfile(path):
+            return
+        try:
+            index = read_ninja_deps(path)
+        except (IOError, OSError, ValueError):
+            logger.warning(traceback.format_exc())
+            return
+        logger.info("Loaded dependencies of %d outputs from %r", len(index), path)
+        self.context.add_recorded_dependencies(directory, index)
 
     def parse(self, target):
         target = MakeLog.parse(self, target)
+        self._load_deps(self.working_dir)
 
         if target is not None and target.get("line"):
             target["line"] = self.prefix_re.sub("", target["line"])
@@ -16,6 +16,7 @@ class Objcopy(ParserBase):
 
         self.platform = context.platform
         self.program_re = self.platform.get_program_path_re("objcopy")
+        self.programs = self.program_re.names
 
         # https://sourceware.org/binutils/docs/binutils/objcopy.html
         self.parser = ArgumentParserEx()
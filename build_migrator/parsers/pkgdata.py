@@ -18,6 +18,7 @@ class Pkgdata(ParserBase):
 
         self.platform = context.platform
         self.program_re = self.platform.get_program_path_re("pkgdata")
+        self.programs = self.program_re.names
 
         # https://helpmanual.io/help/icupkg/
         self.parser = ArgumentParserEx()
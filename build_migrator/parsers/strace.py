@@ -1,8 +1,8 @@
-from copy import deepcopy
+from collections import deque
 import logging
 import os
-from pprint import pformat
 import re
+from build_migrator.helpers import MinifiedTargetFormatter
 from build_migrator.modules import Parser
 from build_migrator.parsers._common.context_working_dir_workaround import (
     ContextWorkingDirWorkaround,
@@ -14,6 +14,62 @@ from build_migrator.parsers._common.inline_file_content import InlineFileContent
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 logger = logging.getLogger(__name__)
 
+# Quoted string ("..."), possibly truncated by strace ("..."...),
+# or omitted array elements (...), followed by comma or end of array
+_string_array_item_regex = re.compile(
+    r'\s*(?:"([^"\\]*(?:\\.[^"\\]*)*)"(?:\.\.\.)?|\.\.\.)\s*(?:,|\Z)', re.S
+)
+_c_escape_regex = re.compile(r"\\(x[0-9a-fA-F]{1,2}|[0-7]{1,3}|.)", re.S)
+_c_escapes = {
+    "a": "\a",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+    "v": "\v",
+}
+
+
+# Decodes contents of C string literal printed by strace.
+# Non-printable bytes are escaped as \NNN (octal) or \xNN (strace -x),
+# multibyte characters are decoded as UTF-8.
+def decode_c_string(text):
+    if "\\" not in text:
+        return text
+    data = bytearray()
+    pos = 0
+    for match in _c_escape_regex.finditer(text):
+        data += text[pos:match.start()].encode("utf-8")
+        escape = match.group(1)
+        if escape[0] == "x" and len(escape) > 1:
+            data.append(int(escape[1:], 16))
+        elif escape[0] in "01234567":
+            data.append(int(escape, 8) & 0xFF)
+        else:
+            data += _c_escapes.get(escape, escape).encode("utf-8")
+        pos = match.end()
+    data += text[pos:].encode("utf-8")
+    return data.decode("utf-8", "replace")
+
+
+# Decodes elements of string array printed by strace (without brackets):
+#   "gcc", "-DNAME=\"a b\"", "-c", "a.c"
+# Strings truncated by strace (see -s option) are returned as is,
+# omitted elements are skipped.
+# Raises ValueError if text is not a string array.
+def decode_string_array(text):
+    result = []
+    pos = 0
+    while pos < len(text):
+        match = _string_array_item_regex.match(text, pos)
+        if match is None:
+            raise ValueError("Unexpected string array: " + text)
+        if match.group(1) is not None:
+            result.append(decode_c_string(match.group(1)))
+        pos = match.end()
+    return result
+
 
 # Provides strace parser, log should be collected using strace parameter -o <filename>
 # See https://linux.die.net/man/1/strace, https://strace.io/
@@ -41,7 +97,10 @@ class StraceLog(Parser):
     def __init__(self, context):
         self.context = context
         # We should postpone target processing because some log entries may be incomplete and order of target is important (because of chdir)
-        self.postponed_target_cache = list()
+        self.postponed_target_cache = deque()
+        # (pid, syscall) => incomplete targets in postponed_target_cache.
+        # strace -f of parallel build may have thousands of calls in flight.
+        self.unfinished_targets = {}
 
     # All needed log entries has following format:
     # PID SYSCALL...
@@ -55,39 +114,29 @@ class StraceLog(Parser):
         result = []
 
         if line:
-            unfinished_entry = self.unfinished_regex.split(line)
-            if len(unfinished_entry) > 1:
-                result += self.parse_unfinished_entry(
-                    deepcopy(target), *unfinished_entry[1:4]
-                )
-                line = ""
-
-            resumed_entry = self.resumed_regex.split(line)
-            if len(resumed_entry) > 1:
-                result += self.parse_resumed_entry(
-                    deepcopy(target), *resumed_entry[1:4]
-                )
-                line = ""
-
-            complete_entry = self.complete_regex.split(line)
-            if len(complete_entry) > 1:
-                result += self.parse_complete_entry(
-                    deepcopy(target), *complete_entry[1:4]
-                )
-                line = ""
-
-            process_exit_entry = self.process_exit_regex.split(line)
-            if len(process_exit_entry) > 1:
-                result += self.parse_process_exit_entry(
-                    deepcopy(target), *process_exit_entry[1:3]
-                )
-                line = ""
+            # Substring checks skip regexes that can't match
+            entry = None
+            if "<unfinished" in line:
+                entry = self.unfinished_regex.search(line)
+                parse_entry = self.parse_unfinished_entry
+            if entry is None and " resumed>" in line:
+                entry = self.resumed_regex.search(line)
+                parse_entry = self.parse_resumed_entry
+            if entry is None:
+                entry = self.complete_regex.search(line)
+                parse_entry = self.parse_complete_entry
+            if entry is None:
+                entry = self.process_exit_regex.search(line)
+                parse_entry = self.parse_process_exit_entry
+            if entry is not None:
+                result += parse_entry(dict(target), *entry.groups())
 
         at_eof = bool(target.get("eof"))
         if at_eof:
             result += self.postponed_target_cache
             result.append(target)  # append EOF target
-            self.postponed_target_cache = []
+            self.postponed_target_cache.clear()
+            self.unfinished_targets.clear()
 
         return result
 
@@ -100,31 +149,24 @@ class StraceLog(Parser):
         target["strace.raw_arguments"] = raw_arguments
 
         self.postponed_target_cache.append(target)
+        self.unfinished_targets.setdefault((pid, syscall), deque()).append(target)
         # postpone target processing
         return []
 
     def parse_resumed_entry(self, target, pid, syscall, raw_arguments):
-        for postponed_target in self.postponed_target_cache:
-            if (
-                (postponed_target["strace.syscall"] == syscall)
-                and (postponed_target["strace.pid"] == pid)
-                and (not postponed_target["strace.complete"])
-            ):
-                postponed_target["strace.raw_arguments"] += raw_arguments
-                postponed_target["strace.complete"] = True
-                break
-
-        ready_to_publish_end_idx = -1
-        for idx, postponed_target in enumerate(self.postponed_target_cache):
-            if postponed_target["strace.complete"]:
-                ready_to_publish_end_idx = idx
-            else:
-                break
-
-        postponed_targets = self.postponed_target_cache[: ready_to_publish_end_idx + 1]
-        self.postponed_target_cache = self.postponed_target_cache[
-            ready_to_publish_end_idx + 1:
-        ]
+        key = (pid, syscall)
+        unfinished_targets = self.unfinished_targets.get(key)
+        if unfinished_targets:
+            postponed_target = unfinished_targets.popleft()
+            if not unfinished_targets:
+                del self.unfinished_targets[key]
+            postponed_target["strace.raw_arguments"] += raw_arguments
+            postponed_target["strace.complete"] = True
+
+        postponed_targets = []
+        cache = self.postponed_target_cache
+        while cache and cache[0]["strace.complete"]:
+            postponed_targets.append(cache.popleft())
         return postponed_targets
 
     def parse_complete_entry(self, target, pid, syscall, raw_arguments):
@@ -133,7 +175,7 @@ class StraceLog(Parser):
         target["strace.syscall"] = syscall
         target["strace.raw_arguments"] = raw_arguments
 
-        if len(self.postponed_target_cache) > 0:
+        if self.postponed_target_cache:
             self.postponed_target_cache.append(target)
             return []
 
@@ -145,7 +187,7 @@ class StraceLog(Parser):
         target["strace.syscall"] = "exit"
         target["strace.complete"] = True
 
-        if len(self.postponed_target_cache) > 0:
+        if self.postponed_target_cache:
             self.postponed_target_cache.append(target)
             return []
 
@@ -174,6 +216,12 @@ class StraceTokenizer(Parser):
         self.context = context
         self.working_dir_cache = {}  # pid => working_dir
         self.initial_working_dir = self.context.working_dir
+        self.syscall_parsers = {
+            "execve": self.parse_execve_syscall,
+            "clone": self.parse_clone_syscall,
+            "vfork": self.parse_vfork_syscall,
+            "chdir": self.parse_chdir_syscall,
+        }
 
     def parse(self, target):
         if target.get("strace.complete") is None:
@@ -197,21 +245,15 @@ class StraceTokenizer(Parser):
         if pid not in self.working_dir_cache:
             self.working_dir_cache[pid] = self.initial_working_dir
 
-        parsers = {
-            "execve": self.parse_execve_syscall,
-            "clone": self.parse_clone_syscall,
-            "vfork": self.parse_vfork_syscall,
-            "chdir": self.parse_chdir_syscall,
-        }
+        parse_syscall = self.syscall_parsers.get(target["strace.syscall"])
+        if parse_syscall is None:
+            return []
 
-        return self.finalize_strace_targets(
-            parsers.get(target["strace.syscall"], lambda x: [])(target)
-        )
+        return self.finalize_strace_targets(parse_syscall(target))
 
     def parse_execve_syscall(self, target):
         execve_entry = self.execve_regex.split(target["strace.raw_arguments"])
 
-        logger.info("execve_entry: " + pformat(execve_entry))
         if execve_entry[3] != "0":
             logger.debug("skipping execve with non-zero code")
             return []
@@ -219,9 +261,9 @@ class StraceTokenizer(Parser):
         target["context.working_dir"] = (
             self.working_dir_cache[target["strace.pid"]] + "/"
         )
-        target["tokens"] = list(eval(execve_entry[2]))
+        target["tokens"] = decode_string_array(execve_entry[2])
 
-        logger.info("execve target: " + pformat(target))
+        logger.debug("execve target: %s", MinifiedTargetFormatter(target))
 
         return [target]
 
@@ -296,7 +338,7 @@ class ReplaceStrace(Parser):
         if "strace.raw_arguments" in target:
             raw_arguments = self._replace(target["strace.raw_arguments"])
             if raw_arguments != target["strace.raw_arguments"]:
-                target = deepcopy(target)
+                target = dict(target)
                 target["strace.raw_arguments"] = raw_arguments
                 return target
 
@@ -0,0 +1,50 @@
+import json
+import logging
+from build_migrator.modules import Parser
+from build_migrator.parsers._common.response_file import ResponseFile
+from build_migrator.parsers._common.inline_file_content import InlineFileContent
+
+
+logger = logging.getLogger(__name__)
+
+
+# Provides parser for logs of WRAPPER log provider (see GenericBuilder).
+# Each line is a JSON record of a command run by wrapped tool:
+#   {"argv": ["cc", "-c", "a.c"], "cwd": "/build", "exit_code": 0}
+# Records are converted into tokenized targets, i.e. make log parsers
+# and CommandTokenizer are not involved. Failed commands are skipped.
+class WrapperLog(Parser):
+    priority = 0
+
+    @staticmethod
+    def add_arguments(arg_parser):
+        pass
+
+    @staticmethod
+    def is_applicable(log_type=None):
+        return log_type == "wrapper"
+
+    def __init__(self, context):
+        self.context = context
+
+    def parse(self, target):
+        if target.get("eof"):
+            return target
+
+        line = target.get("line")
+        if not line:
+            return []
+
+        try:
+            record = json.loads(line)
+            if record["exit_code"] != 0:
+                logger.debug("Skipping failed command: %r", record["argv"])
+                return []
+            working_dir = self.context.normalize_path(record["cwd"])
+            return [{"tokens": list(record["argv"]), "working_dir": working_dir}]
+        except (KeyError, TypeError, ValueError):
+            logger.error("Invalid wrapper log record: %r", line)
+            return []
+
+
+__all__ = ["WrapperLog", "ResponseFile", "InlineFileContent"]
@@ -1,6 +1,5 @@
 from copy import copy
 import logging
-import subprocess
 from build_migrator.helpers import (
     get_module_target,
     ModuleTypes,
@@ -52,6 +51,7 @@ def prefix_arg_toupper(args):
 
 class Yasm(CompilerParser):
     filename_re = os_ext.Windows.get_program_path_re("yasm")
+    programs = filename_re.names
 
     priority = 7
 
@@ -118,7 +118,6 @@ class Yasm(CompilerParser):
         include_dirs,
         preinclude_files,
         source,
-        cwd,
     ):
         include_dir_args = ["-I" + d for d in include_dirs]
         preinclude_args = ["-P" + p for p in preinclude_files]
@@ -129,33 +128,39 @@ class Yasm(CompilerParser):
             + include_dir_args
             + [source]
         )
-        p = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd
-        )
-        stdout, stderr = p.communicate()
-        if type(stdout) is not str:
-            stdout = stdout.decode("utf-8", "replace")
-        if type(stderr) is not str:
-            stderr = stderr.decode("utf-8", "replace")
-        retcode = p.poll()
-        if retcode:
-            logger.error(
-                "Command '{}' returned non-zero exit code {}\n{}".format(
-                    " ".join(cmd), retcode, stderr
+
+        def _list_dependencies(results):
+            implicit_dependencies = []
+            for line in results[0].stdout.splitlines():
+                files = line.rstrip("\\").lstrip().split(" ")
+                for f in files:
+                    if not f or f.endswith(":") or f == source:
+                        continue
+                    implicit_dependencies.append(f)
+            return implicit_dependencies
+
+        def _on_output(results):
+            result = results[0]
+            if result.retcode:
+                logger.error(
+                    "Command '{}' returned non-zero exit code {}\n{}".format(
+                        " ".join(cmd), result.retcode, result.stderr
+                    )
                 )
-            )
 
-        implicit_dependencies = []
-        for line in stdout.splitlines():
-            files = line.rstrip("\\").lstrip().split(" ")
-            for f in files:
-                if not f or f.endswith(":") or f == source:
-                    continue
-                implicit_dependencies.append(f)
-        return [
-            self.context.get_file_arg(self.context.normalize_path(dep), dependencies)
-            for dep in implicit_dependencies
-        ]
+            for dep in _list_dependencies(results):
+                self.context.get_file_arg(
+                    self.context.normalize_path(dep), dependencies
+                )
+
+        self.context.scan_implicit_dependencies(
+            [cmd],
+            _on_output,
+            dependencies,
+            encoding="utf-8",
+            inputs=[source],
+            list_dependencies=_list_dependencies,
+        )
 
     # TODO: this function is mostly the same for all compiler parsers. Make a base class.
     def parse(self, target):
@@ -184,7 +189,6 @@ class Yasm(CompilerParser):
             namespace.include_dirs,
             namespace.preinclude_files,
             namespace.file,
-            self.context.working_dir,
         )
 
         compile_flags = namespace.compile_flags
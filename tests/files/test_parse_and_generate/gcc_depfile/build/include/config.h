@@ -0,0 +1 @@
+#define CONFIG 1
@@ -0,0 +1,2 @@
+#include "config.h"
+int a() { return 0; }
@@ -0,0 +1,3 @@
+#include "config.h"
+#include "version.h"
+int bar() { return 0; }
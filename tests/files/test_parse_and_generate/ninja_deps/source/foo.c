@@ -0,0 +1,2 @@
+#include "config.h"
+int foo() { return 0; }
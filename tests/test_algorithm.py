@@ -11,6 +11,7 @@ from build_migrator.common.algorithm import (
     find_best_common_set,
     FitnessByTotalStringLength,
     fitness_by_set_length,
+    IdentityOrderedSet,
 )  # noqa: E402
 
 
@@ -210,3 +211,18 @@ class TestAlgorithms(base.TestBase):
             cs,
         )
         self.assertEqual(101, f)
+
+    def test_identity_ordered_set(self):
+        a, b, c = {"output": "a"}, {"output": "b"}, {"output": "a"}
+        items = IdentityOrderedSet([a, b])
+        items.append(c)
+        items.append(a)
+        self.assertEqual([a, b, c], list(items))
+        self.assertEqual(3, len(items))
+
+        # Equal, but distinct items are not confused
+        items.remove(c)
+        self.assertIn(a, items)
+        self.assertNotIn(c, items)
+        self.assertListEqual([a, b], list(items))
+        self.assertRaises(ValueError, items.remove, c)
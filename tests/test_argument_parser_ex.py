@@ -6,7 +6,11 @@ import sys
 __module_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, __module_dir)
 import base  # noqa: E402
-from build_migrator.common.argument_parser_ex import ArgumentParserEx  # noqa: E402
+from build_migrator.common.argument_parser_ex import (  # noqa: E402
+    ArgumentParserEx,
+    DispatchKey,
+    RuleDispatcher,
+)
 
 
 class TestArgumentParserEx(base.TestBase):
@@ -1060,3 +1064,77 @@ class TestArgumentParserEx(base.TestBase):
         ns = parser.parse_args(["in.txt", "out.txt"])
         self.assertEqual("in.txt", ns.infile)
         self.assertEqual(["out.txt"], ns.outfile)
+
+    def test_parse_known_args_cache(self):
+        parser = ArgumentParserEx(cache_size=2)
+        parser.add_argument("-I", action="append", dest="include_dirs")
+
+        ns, unknown = parser.parse_known_args(["-Ia", "-x"], unknown_dest="flags")
+        ns.include_dirs.append("modified")
+        unknown.append("modified")
+
+        ns, unknown = parser.parse_known_args(["-Ia", "-x"], unknown_dest="flags")
+        self.assertListEqual(["a"], ns.include_dirs)
+        self.assertListEqual(["-x"], ns.flags)
+        self.assertListEqual(["-x"], unknown)
+        self.assertEqual((1, 1), parser.cache_info()[:2])
+
+        # Least recently used entry is evicted
+        parser.parse_known_args(["-Ib"])
+        parser.parse_known_args(["-Ic"])
+        parser.parse_known_args(["-Ia", "-x"], unknown_dest="flags")
+        self.assertEqual((1, 4, 2, 2), parser.cache_info())
+
+    def test_parse_known_args_cache_disabled_by_handler(self):
+        calls = []
+
+        def handler(state, dest, value):
+            calls.append(value)
+            state.set_attribute(dest, value)
+
+        parser = ArgumentParserEx()
+        parser.add_argument("-o", dest="output", handler=handler)
+        parser.parse_known_args(["-o", "a.o"])
+        parser.parse_known_args(["-o", "a.o"])
+        self.assertEqual(2, len(calls))
+        self.assertEqual((0, 0), parser.cache_info()[:2])
+
+    def test_rule_dispatcher(self):
+        class Rule(object):
+            def __init__(self, *dispatch_keys):
+                if dispatch_keys:
+                    self.dispatch_keys = dispatch_keys
+
+        rules = [
+            Rule(DispatchKey(["-o"], ["-o"])),
+            Rule(),
+            Rule(DispatchKey(["/Fo"], ["/Fo"], ignore_case=True)),
+            Rule(DispatchKey(["-O2"]), DispatchKey(None, ["-O"])),
+            Rule(DispatchKey(["-I"], ["-I", "-isystem"])),
+        ]
+        dispatcher = RuleDispatcher(rules)
+        # Wildcard rule is always included, rules keep their order
+        self.assertEqual([rules[0], rules[1]], dispatcher.get_rules("-o"))
+        self.assertEqual([rules[0], rules[1]], dispatcher.get_rules("-ofoo"))
+        self.assertEqual([rules[1], rules[3]], dispatcher.get_rules("-O2"))
+        self.assertEqual([rules[1], rules[3]], dispatcher.get_rules("-O3"))
+        self.assertEqual([rules[1], rules[2]], dispatcher.get_rules("/fofoo.obj"))
+        self.assertEqual([rules[1]], dispatcher.get_rules("/F"))
+        self.assertEqual([rules[1], rules[4]], dispatcher.get_rules("-isystem/usr"))
+        self.assertEqual([rules[1]], dispatcher.get_rules("-i"))
+        self.assertEqual([rules[1]], dispatcher.get_rules(""))
+
+        # Parsing with dispatching by leading token
+        parser = ArgumentParserEx(prefix_chars="/-")
+        parser.add_argument("-o", dest="output")
+        parser.add_argument("-O", dest="optimization", choices=["0", "1", "2"])
+        parser.add_argument("-I", dest="include_dirs", action="append")
+        parser.add_argument("/nologo", action="store_true", ignore_case=True)
+        ns, remaining = parser.parse_known_args(
+            ["-ofoo", "-O2", "-I", "a", "-Ib", "-O3", "/NoLogo", "-o", "baz"]
+        )
+        self.assertEqual(["-O3"], remaining)
+        self.assertEqual("baz", ns.output)
+        self.assertEqual("2", ns.optimization)
+        self.assertEqual(["a", "b"], ns.include_dirs)
+        self.assertTrue(ns.nologo)
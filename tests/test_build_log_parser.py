@@ -0,0 +1,574 @@
+import json
+import multiprocessing
+import os
+import sys
+import unittest
+
+__module_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, __module_dir)
+import base  # noqa: E402
+from build_migrator import BuildMigrator, ModuleLoader  # noqa: E402
+from build_migrator.helpers import (  # noqa: E402
+    get_file_target,
+    get_module_target,
+    get_variable_target,
+)
+from build_migrator.parsers.build_log_parser import (  # noqa: E402
+    BuildLogParserContext,
+    LineFilter,
+    ParserChain,
+)
+from build_migrator.parsers.autotools import (  # noqa: E402
+    CommandTokenizer,
+    LineAccumulator,
+    MakeLog,
+)
+
+
+class TestBuildLogParserContext(base.TestBase):
+    def _create_context(self):
+        self.source_dir = os.path.join(self.test_method_out_dir, "source")
+        self.build_dir = os.path.join(self.test_method_out_dir, "build")
+        context = BuildLogParserContext(
+            None,
+            logs=["make:build.log"],
+            source_dir=self.source_dir,
+            build_dirs=[self.build_dir],
+            platform="linux",
+        )
+        context.targets = []
+        context.target_index = {}
+        return context
+
+    def test_resolved_path_cache(self):
+        context = self._create_context()
+        context._initialize_path_aliases([])
+
+        # Relative paths are resolved against current working directory
+        context.working_dir = self.build_dir
+        arg = context._construct_path_arg("a.c")
+        self.assertEqual("@build_dir@/a.c", arg.relocatable)
+        context.working_dir = self.source_dir
+        arg = context._construct_path_arg("a.c")
+        self.assertEqual("@source_dir@/a.c", arg.relocatable)
+        arg = context._construct_path_arg("a.c", relative_arg=True)
+        self.assertEqual("a.c", arg.argument)
+        self.assertEqual([], arg.dependencies)
+
+        # New path aliases invalidate cached results
+        include_dir = os.path.join(self.source_dir, "include")
+        context._initialize_path_aliases([[include_dir, "@INCLUDE@/sub"]])
+        arg = context._construct_path_arg("include/a.h")
+        self.assertEqual("@INCLUDE@/sub/a.h", arg.relocatable)
+        self.assertEqual([], arg.dependencies)
+
+        # So do new variable targets
+        context.register_target(get_variable_target("INCLUDE", "@INCLUDE@", "/usr"))
+        arg = context._construct_path_arg("include/a.h")
+        self.assertEqual("@INCLUDE@/sub/a.h", arg.relocatable)
+        self.assertEqual(["@INCLUDE@"], arg.dependencies)
+
+        # Dependencies are not shared between results
+        arg.dependencies.append("@OTHER@")
+        arg = context._construct_path_arg("include/a.h")
+        self.assertEqual(["@INCLUDE@"], arg.dependencies)
+
+    def test_target_indexes(self):
+        context = self._create_context()
+        objs = "@build_dir@/objs"
+        context.register_target(
+            get_module_target("object_lib", "objs", objs, sources=["a.c"])
+        )
+        lib = get_module_target("static_lib", "a", "@build_dir@/liba.a", objects=[objs])
+        context.register_target(lib)
+        exe = get_module_target("executable", "exe", "@build_dir@/exe")
+        context.register_target(exe)
+        self.assertEqual([lib], list(context.find_targets_by_name("a")))
+
+        # Dependencies modified in place after registration (objcopy)
+        exe["dependencies"].append(objs)
+        context.split_target_dependencies(exe)
+
+        # Object library is overwritten, existing references are kept
+        context.register_target(
+            get_module_target("object_lib", "objs", objs, sources=["b.c"])
+        )
+        self.assertEqual([objs + "#1"], lib["objects"])
+        self.assertEqual([objs + "#1"], exe["dependencies"])
+        self.assertEqual(["a.c"], context.find_target(objs + "#1")["sources"])
+        self.assertEqual(["b.c"], context.find_target(objs)["sources"])
+
+        # File target is replaced by module target
+        output = "@build_dir@/b"
+        context.register_target(get_file_target(None, output))
+        module = get_module_target("executable", "b", output)
+        context.register_target(module)
+        self.assertEqual([module], list(context.find_targets_by_name("b")))
+        self.assertEqual(5, len(context.targets))
+
+
+class TestLineFilter(base.TestBase):
+    class _ToolParser(object):
+        programs = ("gcc", "cl", "g++")
+
+    class _KeywordParser(object):
+        line_keywords = ("Entering directory",)
+
+    class _OtherParser(object):
+        pass
+
+    def test_filter(self):
+        parsers = [self._ToolParser(), self._KeywordParser()]
+        line_filter = LineFilter(LineFilter.get_regex(parsers))
+        lines = [
+            "/usr/bin/x86_64-linux-gnu-gcc -c a.c",
+            "a.c:1:5: warning: unused variable 'x'",
+            "cd sub && g++ -c b.cpp",
+            "mygcc -c a.c",
+            "gcc-ar rcs a.a a.o",
+            '"C:\\VC\\bin\\CL.EXE" /c a.cpp',
+            "make[1]: Entering directory '/src'",
+            "ar rcs b.a \\",
+            "  b.o",
+            "PASS: test",
+        ]
+        self.assertEqual(
+            [lines[0], lines[2], lines[5], lines[6], lines[7]],
+            line_filter.filter(lines[:8]),
+        )
+        # Multi-line command continues in the next batch
+        self.assertEqual(["  b.o"], line_filter.filter(lines[8:]))
+
+        # Parser without programs or keywords may need every line
+        self.assertIsNone(LineFilter.get_regex(parsers + [self._OtherParser()]))
+
+    def test_make_log(self):
+        class Context(object):
+            platform_name = "linux"
+            working_dir = "/build"
+            current_target = None
+
+            def __init__(self):
+                self.commands = []
+
+            def normalize_path(self, path):
+                return path
+
+            def register_target(self, target):
+                pass
+
+        class Compiler(object):
+            programs = ("cc", "ar")
+
+            def __init__(self, context):
+                self.context = context
+
+            def parse(self, target):
+                self.context.commands.append(
+                    [self.context.working_dir] + target["tokens"]
+                )
+                return target
+
+        log = [
+            "cc -c a.c -o a.o",
+            "a.c:10:5: warning: unused variable 'x' [-Wunused-variable]",
+            "make[1]: Entering directory '/build/sub'",
+            "PASS: test (elapsed 1s)",
+            "/usr/bin/ar rcs liba.a \\",
+            "  a.o b.o",
+            "[ 50%] Built target a",
+            "make[1]: Leaving directory '/build/sub'",
+            "cc -c b.c",
+        ]
+        for line_filter in [False, True]:
+            context = Context()
+            parsers = [
+                MakeLog(context),
+                LineAccumulator(context),
+                CommandTokenizer(context),
+                Compiler(context),
+            ]
+            chain = ParserChain(context, parsers)
+            lines = log
+            if line_filter:
+                lines = chain.get_line_filter("make").filter(log)
+                self.assertEqual(
+                    [log[0], log[2], log[4], log[5], log[7], log[8]], lines
+                )
+            chain.parse([{"line": line} for line in lines], log_type="make")
+            self.assertEqual(
+                [
+                    ["/build", "cc", "-c", "a.c", "-o", "a.o"],
+                    ["/build/sub", "/usr/bin/ar", "rcs", "liba.a", "a.o", "b.o"],
+                    ["/build", "cc", "-c", "b.c"],
+                ],
+                context.commands,
+            )
+
+    def test_variable_assignments(self):
+        class Context(object):
+            platform_name = "linux"
+            working_dir = "/build"
+            current_target = None
+
+            def __init__(self):
+                self.commands = []
+
+            def normalize_path(self, path):
+                return path
+
+            def register_target(self, target):
+                pass
+
+        class Compiler(object):
+            programs = ("cc",)
+
+            def __init__(self, context):
+                self.context = context
+
+            def parse(self, target):
+                self.context.commands.append(
+                    (target["tokens"], target.get("parameters"))
+                )
+                return target
+
+        # Variables set on separate lines are attached to the next command
+        log = [
+            "CFLAGS=-O2",
+            "cc -c a.c",
+            "PASS: test (elapsed 1s)",
+            "X=1 Y='-s -g'",
+            "cc -c b.c",
+            "[ 50%] Built target a",
+        ]
+        for line_filter in [False, True]:
+            context = Context()
+            parsers = [
+                CommandTokenizer(context),
+                Compiler(context),
+            ]
+            chain = ParserChain(context, parsers)
+            lines = log
+            if line_filter:
+                lines = chain.get_line_filter("make").filter(log)
+                self.assertEqual([log[0], log[1], log[3], log[4]], lines)
+            chain.parse([{"line": line} for line in lines], log_type="make")
+            self.assertEqual(
+                [
+                    (["cc", "-c", "a.c"], {"CFLAGS": "-O2"}),
+                    (["cc", "-c", "b.c"], {"X": "1", "Y": "-s -g"}),
+                ],
+                context.commands,
+            )
+
+
+class TestParserChain(base.TestBase):
+    class _Context(object):
+        def __init__(self):
+            self.current_target = None
+            self.registered = []
+
+        def register_target(self, target):
+            self.registered.append(target["output"])
+
+    class _Parser(object):
+        def __init__(self, name, calls, log_type=None):
+            self.name = name
+            self.calls = calls
+            self.log_type = log_type
+
+        def is_applicable(self, log_type=None):
+            return self.log_type is None or self.log_type == log_type
+
+        def parse(self, target):
+            self.calls.append((self.name, target.get("line") or target.get("tokens")))
+            line = target.get("line")
+            if line is not None:
+                # Splits line into commands, like CommandTokenizer
+                return [{"tokens": cmd.split()} for cmd in line.split(" && ")]
+            return target
+
+    class _ToolParser(_Parser):
+        def __init__(self, name, calls, *programs):
+            super(TestParserChain._ToolParser, self).__init__(name, calls)
+            self.programs = programs
+
+        def parse(self, target):
+            self.calls.append((self.name, target["tokens"]))
+            if target["tokens"][-1] == "-skip":
+                return []
+            return {"output": self.name + ":" + target["tokens"][-1]}
+
+    def test_parse(self):
+        calls = []
+        context = self._Context()
+        parsers = [
+            self._Parser("strace", calls, log_type="strace"),
+            self._Parser("split", calls),
+            self._ToolParser("ar", calls, "ar"),
+            self._ToolParser("cc", calls, "gcc", "cc"),
+            self._ToolParser("any_cc", calls, "gcc"),
+        ]
+        chain = ParserChain(context, parsers)
+        chain.parse(
+            [
+                {"line": "cd sub && /usr/bin/x86_64-linux-gnu-gcc -c a.c -o a.o"},
+                {"line": "AR rcs a.a a.o"},
+                {"line": "gcc -c b.c -skip && echo b.o"},
+            ],
+            log_type="make",
+        )
+        self.assertEqual(["cc:a.o", "ar:a.o"], context.registered)
+        self.assertEqual(
+            [
+                ("split", "cd sub && /usr/bin/x86_64-linux-gnu-gcc -c a.c -o a.o"),
+                # Commands are parsed by the following parsers that
+                # handle the program, "cd" and "echo" by none of them
+                ("cc", ["/usr/bin/x86_64-linux-gnu-gcc", "-c", "a.c", "-o", "a.o"]),
+                ("split", "AR rcs a.a a.o"),
+                ("ar", ["AR", "rcs", "a.a", "a.o"]),
+                ("split", "gcc -c b.c -skip && echo b.o"),
+                ("cc", ["gcc", "-c", "b.c", "-skip"]),
+            ],
+            calls,
+        )
+
+        # Commands rejected by command_filter are not parsed by tool parsers
+        del calls[:]
+        chain.command_filter = lambda target: target["tokens"][0] != "ar"
+        results = []
+        chain.parse(
+            [{"tokens": ["ar", "rcs", "b.a"]}, {"tokens": ["cc", "-c", "b.c"]}],
+            log_type="make",
+            start=1,
+            on_result=results.append,
+        )
+        self.assertEqual([{"output": "cc:b.c"}], results)
+        self.assertEqual([("cc", ["cc", "-c", "b.c"])], calls)
+        self.assertEqual(["cc:a.o", "ar:a.o"], context.registered)
+
+
+class TestParallelParsing(base.TestBase):
+    def _parse(self, logs, **kwargs):
+        modules = ModuleLoader().load()
+        entry_point, parsers = modules.create_parsers(
+            BuildMigrator(modules),
+            logs=["make:" + log for log in logs],
+            source_dir=self.source_dir,
+            build_dirs=[self.build_dir],
+            platform="linux",
+            **kwargs
+        )
+        entry_point.shard_min_size = 1
+        self.parsers = parsers
+        return entry_point.parse([], parsers)
+
+    def test_parallel_shards(self):
+        self.source_dir = os.path.join(self.test_method_out_dir, "source")
+        self.build_dir = os.path.join(self.test_method_out_dir, "build")
+        log = os.path.join(self.test_method_out_dir, "build.log")
+        os.makedirs(self.source_dir)
+        for i in range(20):
+            for name in ["a%d.c" % i, "b%d.c" % i]:
+                with open(os.path.join(self.source_dir, name), "w") as f:
+                    f.write("int x;\n")
+        with open(log, "w") as f:
+            for i in range(20):
+                d = os.path.join(self.build_dir, "sub") if i % 2 else self.build_dir
+                f.write("make[1]: Entering directory '%s'\n" % d)
+                src = os.path.relpath(self.source_dir, d)
+                f.write("cp %s/a%d.c a%d.o\n" % (src, i, i))
+                f.write("a.c:1: warning: something\n")
+                f.write("ln -s \\\n  %s/b%d.c \\\n  b%d.o\n" % (src, i, i))
+                f.write("echo line%d >> list%d.txt\n" % (i, i % 3))
+                # Depfile is up to date, compiler isn't run
+                f.write("gcc -c -DN=%d -MD -MF c%d.d %s/b%d.c -o c%d.o\n" % ((i,) * 5))
+                if not os.path.exists(d):
+                    os.makedirs(d)
+                with open(os.path.join(d, "c%d.d" % i), "w") as depfile:
+                    depfile.write("c%d.o: %s/b%d.c\n" % (i, src, i))
+                f.write("ar rcs lib%d.a a%d.o b%d.o c%d.o\n" % (i, i, i, i))
+                f.write("make[1]: Leaving directory '%s'\n" % d)
+
+        expected = self._parse([log])
+        self.assertTrue(len(expected) > 40)
+        self.assertEqual(expected, self._parse([log], parallel_shards=2))
+        # Arguments of gcc commands are parsed in worker processes
+        gcc = [p for p in self.parsers if type(p).__name__ == "Clang_Gcc"][0]
+        self.assertEqual(0, gcc.parser.cache_info().misses)
+
+    def _write_log(self, name, lines):
+        path = os.path.join(self.test_method_out_dir, name)
+        with open(path, "w") as f:
+            for line in lines:
+                f.write(line + "\n")
+        return path
+
+    @unittest.skipIf(
+        "fork" not in multiprocessing.get_all_start_methods(), "fork() is required"
+    )
+    def test_parallel_logs(self):
+        self.source_dir = os.path.join(self.test_method_out_dir, "source")
+        self.build_dir = os.path.join(self.test_method_out_dir, "build")
+        logs = []
+        for name in ["one", "two", "three"]:
+            build_dir = os.path.join(self.build_dir, name)
+            os.makedirs(build_dir)
+            with open(os.path.join(build_dir, "a.o"), "w") as f:
+                f.write("")
+            logs.append(
+                self._write_log(
+                    name + ".log",
+                    [
+                        "make: Entering directory '%s'" % build_dir,
+                        "ar rcs lib%s.a a.o" % name,
+                        "ln -s lib%s.a lib%s.so" % (name, name),
+                        "make: Leaving directory '%s'" % build_dir,
+                    ],
+                )
+            )
+        logger = "build_migrator.parsers.build_log_parser"
+
+        expected = self._parse(logs)
+        with self.assertLogs(logger, "INFO") as logs_cm:
+            self.assertEqual(expected, self._parse(logs, parallel_logs=2))
+        self.assertEqual(1, len(logs_cm.output))
+
+        # Log references output of earlier log
+        logs[2] = self._write_log(
+            "three.log",
+            ["cp %s three.a" % os.path.join(self.build_dir, "one", "libone.a")],
+        )
+        expected = self._parse(logs)
+        with self.assertLogs(logger, "INFO") as logs_cm:
+            self.assertEqual(expected, self._parse(logs, parallel_logs=2))
+        self.assertIn("references @build_dir@/one/libone.a", logs_cm.output[-1])
+
+    def test_parallel_probes(self):
+        if not self.has_gcc:
+            self.skipTest("GCC not found in PATH")
+
+        self.source_dir = os.path.join(self.test_method_out_dir, "source")
+        self.build_dir = os.path.join(self.test_method_out_dir, "build")
+        os.makedirs(self.source_dir)
+        os.makedirs(os.path.join(self.build_dir, "include"))
+        lines = []
+        for i in range(10):
+            # Prebuilt headers in build dir become file targets
+            with open(os.path.join(self.build_dir, "include", "h%d.h" % i), "w") as f:
+                f.write("int x%d;\n" % i)
+            with open(os.path.join(self.source_dir, "a%d.c" % i), "w") as f:
+                f.write('#include "h%d.h"\n#include "h%d.h"\n' % (i, i // 2))
+            lines.append("gcc -Iinclude -c ../source/a%d.c -o a%d.o" % (i, i))
+            lines.append("ar rcs lib%d.a a%d.o" % (i, i))
+        log = self._write_log("build.log", lines)
+
+        expected = self._parse([log])
+        self.assertEqual(
+            [
+                "@build_dir@/a0.o",
+                "@source_dir@/a0.c",
+                "@build_dir@/include",
+                "@build_dir@/include/h0.h",
+                "@build_dir@/lib0.a",
+                "@build_dir@/a1.o",
+            ],
+            [t["output"] for t in expected[:6]],
+        )
+        # Targets found by probes are ordered as if probes were synchronous
+        self.assertEqual(expected, self._parse([log], jobs=4))
+
+    def test_failed_probes(self):
+        self.source_dir = os.path.join(self.test_method_out_dir, "source")
+        self.build_dir = os.path.join(self.test_method_out_dir, "build")
+        os.makedirs(self.source_dir)
+        os.makedirs(self.build_dir)
+        compiler = os.path.join(self.test_method_out_dir, "missing", "gcc")
+        lines = []
+        for i in range(3):
+            with open(os.path.join(self.source_dir, "a%d.c" % i), "w") as f:
+                f.write("int x%d;\n" % i)
+            lines.append("%s -c ../source/a%d.c -o a%d.o" % (compiler, i, i))
+        log = self._write_log("build.log", lines)
+
+        # Compiler can't be run, targets are registered without headers
+        logger = "build_migrator.common.dependency_scanner"
+        with self.assertLogs(logger, "ERROR") as logs_cm:
+            expected = self._parse([log])
+        self.assertEqual(3, len(logs_cm.output))
+        self.assertEqual(
+            ["@build_dir@/a0.o", "@source_dir@/a0.c"],
+            [t["output"] for t in expected[:2]],
+        )
+        with self.assertLogs(logger, "ERROR"):
+            self.assertEqual(expected, self._parse([log], jobs=4))
+
+    @unittest.skipIf(
+        "fork" not in multiprocessing.get_all_start_methods(), "fork() is required"
+    )
+    def test_parallel_logs_probe_cache(self):
+        if not self.has_gcc:
+            self.skipTest("GCC not found in PATH")
+
+        self.source_dir = os.path.join(self.test_method_out_dir, "source")
+        self.build_dir = os.path.join(self.test_method_out_dir, "build")
+        os.makedirs(self.source_dir)
+        with open(os.path.join(self.source_dir, "a.h"), "w") as f:
+            f.write("int x;\n")
+        logs = []
+        for name in ["one", "two", "three"]:
+            with open(os.path.join(self.source_dir, name + ".c"), "w") as f:
+                f.write('#include "a.h"\n')
+            logs.append(
+                self._write_log(
+                    name + ".log",
+                    ["gcc -c %s/%s.c -o %s.o" % (self.source_dir, name, name)],
+                )
+            )
+        os.makedirs(self.build_dir)
+        cache_dir = os.path.join(self.test_method_out_dir, "probe_cache")
+        logger = "build_migrator.common.dependency_scanner"
+
+        for hits, misses in [(0, 3), (3, 0)]:
+            with self.assertLogs(logger, "INFO") as logs_cm:
+                self._parse(
+                    logs,
+                    parallel_logs=2,
+                    probe_cache=True,
+                    out_dir=self.test_method_out_dir,
+                )
+            # Children pass cache changes to parent, which saves the index
+            self.assertEqual(
+                ["Probe cache: %d hits, %d misses" % (hits, misses)],
+                [r.getMessage() for r in logs_cm.records],
+            )
+            with open(os.path.join(cache_dir, "index.json")) as f:
+                self.assertEqual(3, len(json.load(f)))
+
+    def test_lazy_parsing(self):
+        self.source_dir = os.path.join(self.test_method_out_dir, "source")
+        self.build_dir = os.path.join(self.test_method_out_dir, "build")
+        os.makedirs(self.source_dir)
+        lines = []
+        for i in range(10):
+            build_dir = os.path.join(self.build_dir, "lib%d" % i)
+            os.makedirs(build_dir)
+            with open(os.path.join(self.source_dir, "a%d.c" % i), "w") as f:
+                f.write("int x;\n")
+            src = os.path.relpath(self.source_dir, build_dir)
+            lines += [
+                "make: Entering directory '%s'" % build_dir,
+                "cp %s/a%d.c a.o" % (src, i),
+                "ar rcs liba%d.a a.o" % i,
+                "ln -s liba%d.a libb%d.a" % (i, i),
+                "make: Leaving directory '%s'" % build_dir,
+            ]
+        log = self._write_log("build.log", lines)
+        logger = "build_migrator.parsers.build_log_parser"
+
+        for required in ["lib3/liba3.a", "lib3/libb3.a", "a3.static", "liba3*"]:
+            expected = self._parse([log], targets=[required])
+            with self.assertLogs(logger, "INFO") as logs_cm:
+                result = self._parse([log], targets=[required], lazy_parsing=True)
+            self.assertEqual(expected, result)
+            self.assertIn("Parsing commands for 3 of 30 outputs", logs_cm.output[0])
@@ -0,0 +1,79 @@
+import os
+import sys
+
+__module_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, __module_dir)
+import base  # noqa: E402
+from build_migrator.common.command_graph import (  # noqa: E402
+    CommandGraph,
+    get_command_outputs,
+)
+
+
+def _normalize(path):
+    return os.path.normpath(os.path.join("/b", path))
+
+
+class TestCommandGraph(base.TestBase):
+    def _outputs(self, command, redirections=None):
+        return get_command_outputs(command.split(), _normalize, redirections)
+
+    def test_get_command_outputs(self):
+        self.assertEqual(["/b/a.o"], self._outputs("gcc -c ../s/a.c -o a.o"))
+        self.assertEqual(["/b/a.o", "/b/b.o"], self._outputs("cc -c a.c /s/b.cpp"))
+        self.assertEqual(["/b/x.so"], self._outputs("g++ -shared -ox.so a.o -openmp"))
+        self.assertEqual(["/b/o/a.obj"], self._outputs("cl.exe /c /Foo/ a.c"))
+        self.assertEqual(
+            ["/b/a.dll", "/b/a.lib"],
+            self._outputs("link /OUT:a.dll /IMPLIB:a.lib a.obj"),
+        )
+        self.assertEqual(
+            ["/b/liba.a"], self._outputs("x86_64-linux-gnu-ar rcs liba.a a.o")
+        )
+        self.assertEqual([], self._outputs("ar t liba.a") or [])
+        self.assertEqual(["/b/liba.so"], self._outputs("ln -sf liba.so.1 liba.so"))
+        self.assertEqual(["/b/liba.so.1"], self._outputs("ln -s ../lib/liba.so.1"))
+        self.assertEqual(
+            ["/d/a.h", "/d/b.h"], self._outputs("install -m 644 a.h b.h /d")
+        )
+        self.assertEqual(["/d/a.h"], self._outputs("cp -t /d ../a.h"))
+        self.assertEqual(["/b/a.so"], self._outputs("objcopy --strip-debug a.so"))
+        self.assertEqual(
+            ["/b/list.txt"],
+            self._outputs("echo a.o", [{"src": None, "op": ">>", "dst": "list.txt"}]),
+        )
+        self.assertIsNone(self._outputs("rm -f a.o"))
+
+    def test_dependencies(self):
+        graph = CommandGraph()
+
+        def add(command, is_required=False):
+            return graph.add_command(command.split(), _normalize, None, is_required)
+
+        add("cp ../s/config.h.in include/config.h")
+        add("gcc -Iinclude -c ../s/a.c -o a.o")
+        add("gcc -c ../s/b.c -o b.o")
+        add("gcc -Wl,--version-script=a.map -shared -o liba.so.1 a.o")
+        add("ln -s liba.so.1 liba.so")
+        add("gcc -o app b.o -L. -la")
+        add("ar rcs libb.a b.o")
+        add("strip libb.a")
+        self.assertIsNone(add("custom_tool b.o", is_required=True))
+        self.assertEqual({"/b/b.o"}, graph.unknown_command_inputs)
+
+        self.assertEqual(
+            {"/b/include/config.h", "/b/a.o", "/b/liba.so.1", "/b/liba.so"},
+            graph.get_dependencies(["/b/liba.so.1"]),
+        )
+        self.assertEqual(
+            {
+                "/b/app",
+                "/b/b.o",
+                "/b/liba.so",
+                "/b/liba.so.1",
+                "/b/a.o",
+                "/b/include/config.h",
+            },
+            graph.get_dependencies(["/b/app"]),
+        )
+        self.assertEqual({"/b/libb.a", "/b/b.o"}, graph.get_dependencies(["/b/libb.a"]))
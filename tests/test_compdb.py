@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+
+__module_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, __module_dir)
+import base  # noqa: E402
+from build_migrator.parsers.build_log_parser import (  # noqa: E402
+    BuildLogParserContext,
+)
+from build_migrator.parsers.compdb import CompDbLog  # noqa: E402
+
+
+class TestCompDbLog(base.TestBase):
+    entries = [
+        {"directory": "/build", "arguments": ["cc", "-DA={x}", "-c", "a.c"]},
+        {"directory": "/build/sub", "command": 'cc "-DB=\\"]\\"" -c b.c'},
+    ]
+    targets = [
+        {"tokens": ["cc", "-DA={x}", "-c", "a.c"], "working_dir": "/build"},
+        {"tokens": ["cc", '-DB="]"', "-c", "b.c"], "working_dir": "/build/sub"},
+    ]
+
+    def _parse(self, text, chunk_size):
+        context = BuildLogParserContext(
+            None,
+            logs=["compdb:compile_commands.json"],
+            source_dir="/source",
+            build_dirs=["/build"],
+            platform="linux",
+        )
+        parser = CompDbLog(context)
+        targets = []
+        for pos in range(0, len(text), chunk_size):
+            targets.extend(parser.parse({"text": text[pos:pos + chunk_size]}))
+        targets.extend(parser.parse({"eof": True}))
+        self.assertEqual({"eof": True}, targets.pop())
+        return targets
+
+    def test_single_line(self):
+        text = json.dumps(self.entries)
+        self.assertNotIn("\n", text)
+        # Entries and strings crossing chunk boundaries
+        for chunk_size in [1, 2, 3, 7, len(text)]:
+            self.assertEqual(self.targets, self._parse(text, chunk_size))
+
+    def test_invalid_entries(self):
+        valid = [json.dumps(entry) for entry in self.entries]
+        text = "[{}, {}, 1, {}, {}]".format(
+            # Missing closing brace
+            '{"directory": "/build", "command": "cc"',
+            valid[0],
+            '{"directory": }',
+            valid[1],
+        )
+        logger = "build_migrator.parsers.compdb"
+        for chunk_size in [1, 5, len(text)]:
+            with self.assertLogs(logger, "ERROR") as logs_cm:
+                self.assertEqual(self.targets, self._parse(text, chunk_size))
+            self.assertEqual(3, len(logs_cm.output))
+            self.assertIn('"command": "cc"', logs_cm.output[0])
+            self.assertIn(": 1", logs_cm.output[1])
+            self.assertIn('{"directory": }', logs_cm.output[2])
+
+        with self.assertLogs(logger, "ERROR") as logs_cm:
+            self.assertEqual([], self._parse('[{"directory": "/bu', 4))
+        self.assertIn('incomplete: {"directory": "/bu', logs_cm.output[0])
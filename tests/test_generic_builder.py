@@ -0,0 +1,251 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+__module_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, __module_dir)
+import base  # noqa: E402
+from build_migrator import BuildMigrator, ModuleLoader  # noqa: E402
+from build_migrator.builders.generic_builder import GenericBuilder  # noqa: E402
+
+
+class TestGenericBuilder(base.TestBase):
+    @unittest.skipIf(os.name != "posix", "POSIX only")
+    def test_wrapper_log_provider(self):
+        source_dir = os.path.join(self.test_method_out_dir, "source")
+        out_dir = os.path.join(self.test_method_out_dir, "out")
+        build_dir = os.path.join(out_dir, "_build")
+        os.makedirs(source_dir)
+        os.makedirs(os.path.join(build_dir, "sub"))
+        with open(os.path.join(build_dir, "a.txt"), "w") as f:
+            f.write("a")
+        with open(os.path.join(source_dir, "build.sh"), "w") as f:
+            f.write("cp a.txt b.txt\n")
+            f.write("cd sub\n")
+            f.write("cp ../a.txt c.txt\n")
+            f.write("cp missing.txt d.txt\n")
+            f.write("env cp ../a.txt e.txt\n")
+
+        build_migrator = BuildMigrator(ModuleLoader().load())
+        builder = GenericBuilder(
+            build_migrator,
+            out_dir,
+            source_dir,
+            build_commands=["sh {source_dir}/build.sh"],
+            log_provider="WRAPPER",
+            wrapped_tools=["cp", "env", "no-such-tool"],
+        )
+        builder.build()
+
+        logs = build_migrator.get_global_settings("logs")
+        self.assertEqual(1, len(logs))
+        log_type, log_path = logs[0].split(":", 1)
+        self.assertEqual("wrapper", log_type)
+        with open(log_path) as f:
+            records = [json.loads(line) for line in f]
+        sub_dir = os.path.join(build_dir, "sub")
+        self.assertEqual(
+            [
+                (["cp", "a.txt", "b.txt"], build_dir),
+                (["cp", "../a.txt", "c.txt"], sub_dir),
+                (["cp", "missing.txt", "d.txt"], sub_dir),
+                # cp started by env is not logged
+                (["env", "cp", "../a.txt", "e.txt"], sub_dir),
+            ],
+            [(r["argv"], r["cwd"]) for r in records],
+        )
+        # Failed commands are logged too
+        self.assertEqual(
+            [False, False, True, False], [r["exit_code"] != 0 for r in records]
+        )
+        self.assertTrue(os.path.exists(os.path.join(sub_dir, "e.txt")))
+
+    def _build_with_stubs(self, stub_preprocessor):
+        source_dir = os.path.join(self.test_method_out_dir, "source")
+        out_dir = os.path.join(self.test_method_out_dir, "out")
+        os.makedirs(out_dir)
+        os.makedirs(os.path.join(source_dir, "include"))
+        with open(os.path.join(source_dir, "include", "a.h"), "w") as f:
+            f.write("#define A 1\n")
+        for name in ["a", "main"]:
+            with open(os.path.join(source_dir, name + ".c"), "w") as f:
+                f.write('#include "a.h"\nint %s() { return A; }\n' % name)
+        with open(os.path.join(source_dir, "Makefile"), "w") as f:
+            f.write("VPATH = {}\n".format(source_dir))
+            f.write("all: prog\n")
+            f.write("%.o: %.c\n")
+            f.write("\tgcc -I{}/include -MMD -c $< -o $@\n".format(source_dir))
+            f.write("liba.a: a.o\n\tar rcs $@ $^\n")
+            f.write("prog: main.o liba.a\n")
+            f.write("\tgcc --version\n\tgcc main.o -L. -la -o $@\n")
+            f.write("-include *.d\n")
+
+        build_migrator = BuildMigrator(ModuleLoader().load())
+        builder = GenericBuilder(
+            build_migrator,
+            out_dir,
+            source_dir,
+            build_commands=["make -f {source_dir}/Makefile"],
+            log_provider="STUB",
+            wrapped_tools=["gcc", "ar"],
+            stub_preprocessor=stub_preprocessor,
+        )
+        builder.build()
+
+        log_path = build_migrator.get_global_settings("logs")[0].split(":", 1)[1]
+        with open(log_path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(
+            ["main.o", "a.o", "a.o", "--version", "prog"],
+            [r["argv"][-1] for r in records],
+        )
+        self.assertEqual([0] * 5, [r["exit_code"] for r in records])
+        build_dir = os.path.join(out_dir, "_build")
+        for name in ["main.o", "a.o", "liba.a", "prog"]:
+            self.assertEqual(0, os.path.getsize(os.path.join(build_dir, name)))
+        # Output of commands with unknown outputs is real
+        with open(os.path.join(out_dir, "build_command_1.log")) as f:
+            self.assertIn("Free Software Foundation", f.read())
+        with open(os.path.join(build_dir, "a.d")) as f:
+            return f.read()
+
+    @unittest.skipIf(os.name != "posix", "POSIX only")
+    def test_stub_log_provider(self):
+        if not self.has_gcc or not self.has_program("make"):
+            self.skipTest("GCC or make not found in PATH")
+
+        self.assertEqual("a.o:\n", self._build_with_stubs(stub_preprocessor=False))
+
+    @unittest.skipIf(os.name != "posix", "POSIX only")
+    def test_stub_log_provider_preprocessor(self):
+        if not self.has_gcc or not self.has_program("make"):
+            self.skipTest("GCC or make not found in PATH")
+
+        depfile = self._build_with_stubs(stub_preprocessor=True)
+        self.assertIn("a.h", depfile)
+
+    def _dry_run(self, build_command, files):
+        source_dir = os.path.join(self.test_method_out_dir, "source")
+        out_dir = os.path.join(self.test_method_out_dir, "out")
+        os.makedirs(out_dir)
+        for path, content in files.items():
+            path = os.path.join(source_dir, path)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "w") as f:
+                f.write(content.format(source_dir=source_dir))
+            os.chmod(path, 0o755)
+
+        build_migrator = BuildMigrator(ModuleLoader().load())
+        builder = GenericBuilder(
+            build_migrator,
+            out_dir,
+            source_dir,
+            build_commands=[build_command],
+            log_provider="DRY_RUN",
+        )
+        builder.build()
+        log_type, log_path = build_migrator.get_global_settings("logs")[0].split(":", 1)
+        with open(log_path) as f:
+            return source_dir, log_type, [line.rstrip("\n") for line in f]
+
+    @unittest.skipIf(os.name != "posix", "POSIX only")
+    def test_make_dry_run(self):
+        if not self.has_program("make"):
+            self.skipTest("make not found in PATH")
+
+        logger = "build_migrator.builders._log_providers.dry_run"
+        with self.assertLogs(logger, "WARNING") as logs_cm:
+            source_dir, log_type, lines = self._dry_run(
+                "make -f {source_dir}/Makefile",
+                {
+                    "Makefile": "all:\n"
+                    "\t$(MAKE) -C {source_dir}/sub\n"
+                    "\tcd {source_dir}/sub && make other\n"
+                    "\tfalse\n",
+                    "sub/Makefile": "all:\n\tcc -c a.c\n",
+                },
+            )
+        self.assertEqual("make", log_type)
+        sub_dir = os.path.join(source_dir, "sub")
+        self.assertIn("cc -c a.c", lines)
+        self.assertIn("false", lines)
+        self.assertIn("make[1]: Entering directory '%s'" % sub_dir, lines)
+        # Recursive make invoked without $(MAKE)
+        self.assertIn("1 of 2 recursive make invocations", logs_cm.output[0])
+        self.assertIn("cd %s && make other" % sub_dir, logs_cm.output[0])
+
+    @unittest.skipIf(os.name != "posix", "POSIX only")
+    def test_ninja_dry_run(self):
+        source_dir, log_type, lines = self._dry_run(
+            "{source_dir}/ninja -j8 -C build -v all",
+            {"ninja": '#!/bin/sh\necho "$@" > {source_dir}/args.txt\necho cc -c a.c\n'},
+        )
+        self.assertEqual("ninja", log_type)
+        with open(os.path.join(source_dir, "args.txt")) as f:
+            self.assertEqual("-C build -t commands all\n", f.read())
+        build_dir = os.path.join(self.test_method_out_dir, "out", "_build", "build")
+        self.assertEqual(
+            ["ninja: Entering directory `%s'" % build_dir, "cc -c a.c"], lines
+        )
+
+    @unittest.skipIf(os.name != "posix", "POSIX only")
+    def test_build_jobs(self):
+        source_dir = os.path.join(self.test_method_out_dir, "source")
+        out_dir = os.path.join(self.test_method_out_dir, "out")
+        os.makedirs(source_dir)
+        for name in ["one", "two", "three"]:
+            os.makedirs(os.path.join(out_dir, name))
+        # Commands one and two wait for each other, i.e. run concurrently
+        with open(os.path.join(source_dir, "wait.sh"), "w") as f:
+            f.write("touch started\n")
+            f.write("i=0\n")
+            f.write("while [ ! -f ../$1/started ]; do\n")
+            f.write("  i=$((i+1)); [ $i -gt 100 ] && exit 1; sleep 0.1\n")
+            f.write("done\n")
+            f.write("touch done\n")
+
+        def build(build_commands, build_depends):
+            build_migrator = BuildMigrator(ModuleLoader().load())
+            GenericBuilder(
+                build_migrator,
+                out_dir,
+                source_dir,
+                build_commands=build_commands,
+                build_jobs=2,
+                build_depends=build_depends,
+            ).build()
+            return build_migrator
+
+        build_migrator = build(
+            [
+                ["sh {source_dir}/wait.sh two", "{out_dir}/one", "CONSOLE"],
+                ["sh {source_dir}/wait.sh one", "{out_dir}/two", "CONSOLE"],
+                ["ls ../one/done ../two/done", "{out_dir}/three", "CONSOLE"],
+            ],
+            [[3, 1, 2]],
+        )
+        self.assertEqual(
+            [os.path.join(out_dir, "build_command_%d.log" % i) for i in [1, 2, 3]],
+            build_migrator.get_global_settings("logs"),
+        )
+        self.assertEqual(
+            [os.path.join(out_dir, name) for name in ["one", "two", "three"]],
+            build_migrator.get_global_settings("build_dirs"),
+        )
+
+        # Commands that depend on failed command are not started
+        self.assertRaises(
+            subprocess.CalledProcessError,
+            build,
+            [
+                ["false", "{out_dir}/one", "CONSOLE"],
+                ["sh {source_dir}/wait.sh one", "{out_dir}/three", "CONSOLE"],
+            ],
+            [[2, 1]],
+        )
+        self.assertFalse(os.path.exists(os.path.join(out_dir, "three", "started")))
+
+        self.assertRaises(ValueError, build, ["true"], [[1, 1]])
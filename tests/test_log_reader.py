@@ -0,0 +1,99 @@
+import bz2
+import gzip
+import os
+import sys
+
+__module_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, __module_dir)
+import base  # noqa: E402
+from build_migrator.common.log_reader import (  # noqa: E402
+    detect_compression,
+    find_log_lines,
+    read_log_lines,
+    split_log,
+)
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+
+class TestLogReader(base.TestBase):
+    content = u"  cc -c a.c\r\ncc -c é.c\n\ncc -c b.c\rcc -o a a.o b.o".encode("utf-8")
+    lines = [u"cc -c a.c", u"cc -c é.c", u"", u"cc -c b.c", u"cc -o a a.o b.o"]
+
+    def _read(self, path, **kwargs):
+        return [line for batch in read_log_lines(path, **kwargs) for line in batch]
+
+    def _write(self, name, content, open_fn=open):
+        path = os.path.join(self.test_method_out_dir, name)
+        with open_fn(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_uncompressed(self):
+        path = self._write("build.log", self.content)
+        self.assertIsNone(detect_compression(path))
+        self.assertEqual(self._read(path), self.lines)
+        # Line breaks and multibyte characters crossing block boundaries
+        for block_size in [1, 2, 3, 5]:
+            self.assertEqual(self._read(path, block_size=block_size), self.lines)
+
+    def test_batches(self):
+        path = self._write("build.log", self.content)
+        batches = list(read_log_lines(path, batch_size=2, block_size=4))
+        self.assertEqual([len(b) for b in batches], [2, 2, 1])
+
+    def test_empty(self):
+        path = self._write("build.log", b"")
+        self.assertEqual(self._read(path), [])
+
+    def test_compressed(self):
+        formats = [("gz", "gzip", gzip.open), ("bz2", "bz2", bz2.BZ2File)]
+        if lzma is not None:
+            formats.append(("xz", "xz", lzma.open))
+        for ext, compression, open_fn in formats:
+            path = self._write("build.log." + ext, self.content, open_fn)
+            self.assertEqual(detect_compression(path), compression)
+            self.assertEqual(self._read(path, block_size=3), self.lines)
+
+    def test_split_log(self):
+        content = (
+            b"cc -c a.c\r\ncc -c \\\r\n  b.c\n"
+            b"make: Entering directory '/a'\ncc \\\n\n"
+        )
+        path = self._write("build.log", content)
+        ranges = split_log(path, 100)
+        # Multi-line commands are not split
+        self.assertEqual([(0, 11), (11, 26), (26, 56), (56, 62)], ranges)
+        lines = []
+        for start, end in ranges:
+            lines.append(self._read(path, start=start, end=end, block_size=3))
+        self.assertEqual(
+            [
+                ["cc -c a.c"],
+                ["cc -c \\", "b.c"],
+                ["make: Entering directory '/a'"],
+                ["cc \\", ""],
+            ],
+            lines,
+        )
+        self.assertEqual([(0, len(content))], split_log(path, 100, min_size=40))
+
+        self.assertEqual(
+            [(26, "make: Entering directory '/a'")],
+            list(find_log_lines(path, ["Entering directory", "Leaving directory"])),
+        )
+
+        # Lines matching carryover_pattern are not split from the next line
+        assignments = b"cc -c a.c\nCFLAGS=-O2\ncc -c b.c\n"
+        path = self._write("assignments.log", assignments)
+        self.assertEqual([(0, 10), (10, 21), (21, 31)], split_log(path, 100))
+        self.assertEqual(
+            [(0, 10), (10, 31)], split_log(path, 100, carryover_pattern=r"^\w+=")
+        )
+
+        path = self._write("build.log.gz", content, gzip.open)
+        self.assertIsNone(split_log(path, 100))
+        self.assertRaises(ValueError, self._read, path, start=10)
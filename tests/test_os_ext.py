@@ -330,3 +330,30 @@ class TestOsExtensions(base.TestBase):
 
         res = os_ext.Darwin.resolve_lib("testver", [self.test_group_dir])
         self.assertIsNone(res)
+
+    def test_get_program_names(self):
+        self.assertEqual(["gcc"], os_ext.get_program_names("/usr/bin/gcc"))
+        self.assertEqual(["cl"], os_ext.get_program_names("C:\\VC\\bin\\CL.EXE"))
+        self.assertEqual(["gcc"], os_ext.get_program_names("${LDCMD:-gcc}")[-1:])
+        self.assertEqual(
+            ["arm-none-eabi-g++", "none-eabi-g++", "eabi-g++", "g++"],
+            os_ext.get_program_names("arm-none-eabi-g++"),
+        )
+        self.assertEqual(["lld-link", "link"], os_ext.get_program_names("lld-link"))
+
+        # Every program matched by get_program_path_re()
+        # must be found by one of its names
+        paths = [
+            "CL.EXE",
+            "path to file\\cl.bat",
+            "toolchain-cl",
+            "path/x86_64-linux-gnu-gcc",
+            "script.sh",
+            "notcl",
+            "cl-",
+        ]
+        for platform in [os_ext.Windows, os_ext.Unix]:
+            for path in paths:
+                for name in ["cl", "gcc", "script"]:
+                    if platform.get_program_path_re(name).match(path):
+                        self.assertIn(name, os_ext.get_program_names(path))
@@ -347,6 +347,33 @@ class TestParseAndGenerate(base.TestBase):
 
         self.parse_and_generate("linux", presets=["linux", "ninja"])
 
+    def test_ninja_deps(self):
+        """Check that header dependencies are read from .ninja_deps
+        """
+        self.set_test_data_subdir("ninja_deps")
+
+        self.parse_and_generate("linux", presets=["linux", "ninja"])
+
+    def test_compdb(self):
+        """Check that compile_commands.json can be processed
+        """
+        if not self.has_gcc:
+            self.skipTest("GCC not found in PATH")
+
+        self.set_test_data_subdir("compdb")
+
+        self.parse_and_generate("linux", presets=["linux", "compdb"])
+
+    def test_wrapper(self):
+        """Check that logs of WRAPPER log provider can be processed
+        """
+        if not self.has_gcc:
+            self.skipTest("GCC not found in PATH")
+
+        self.set_test_data_subdir("wrapper")
+
+        self.parse_and_generate("linux", presets=["linux", "wrapper"])
+
     def test_darwin(self):
         """Check that Mac OS X / Darwin logs can be processed correctly
         """
@@ -533,6 +560,26 @@ class TestParseAndGenerate(base.TestBase):
 
         self.parse_and_generate("windows")
 
+    def test_gcc_depfile(self):
+        """
+        Check that header dependencies are read from dependency files
+        written by -MD/-MMD, when they are up to date
+        """
+        self.set_test_data_subdir("gcc_depfile")
+
+        # make a copy of source and build directories, because we're going
+        # to touch depfiles
+        source_dir = os.path.join(self.test_method_out_dir, "source")
+        build_dir = os.path.join(self.test_method_out_dir, "build")
+        shutil.copytree(self.get_test_data("source"), source_dir)
+        shutil.copytree(self.get_test_data("build"), build_dir)
+        for depfile in ["a.d", "b.d"]:
+            os.utime(os.path.join(build_dir, depfile), None)
+
+        self.parse_and_generate(
+            "linux", log_type="make", source_dir=source_dir, build_dirs=[build_dir]
+        )
+
     def test_gcc_assembler_dependencies(self):
         """
         Check that GCC (GNU) assembler file dependencies are discovered and processed
@@ -4571,6 +4618,17 @@ class TestParseAndGenerate(base.TestBase):
             source_dir=os.path.join(self.test_method_dir, "../source"),
         )
 
+    def test_add_implicit_include_dirs_linux_parallel_probes(self):
+        if not self.has_gcc:
+            self.skipTest("GCC not found in PATH")
+
+        self.set_test_data_subdir("add_implicit_include_dirs/linux")
+        self.parse_and_generate_bazel(
+            "linux",
+            source_dir=os.path.join(self.test_method_dir, "../source"),
+            jobs=4,
+        )
+
     def test_add_implicit_include_dirs_windows(self):
         if not self.has_msvc:
             self.skipTest("MSVC not found in PATH")
@@ -23,6 +23,52 @@ class TestPathExtensions(base.TestBase):
         )
         self.assertIsNone(path_ext.closest_dir("a", ["a/b/c"], 1))
 
+    def test_dir_trie(self):
+        j = os.path.join
+        # (path, dirs, result with max_relpath_level=-1, 0, 1, 2)
+        cases = [
+            ("a", [".", "a"], [(".", "a")] * 4),
+            ("a", ["a", "."], [("a", ".")] * 4),
+            ("a", ["a", "a/b"], [("a", ".")] * 4),
+            ("a/b", ["a/b/c"], [("a/b/c", ".."), None] + [("a/b/c", "..")] * 2),
+            ("a", ["a/b/c", "a/b"], [("a/b", ".."), None] + [("a/b", "..")] * 2),
+            (
+                "a/b.txt",
+                ["a/b"],
+                [("a/b", j("..", "b.txt")), None] + [("a/b", j("..", "b.txt"))] * 2,
+            ),
+            (
+                "a",
+                ["a/b/c"],
+                [("a/b/c", j("..", "..")), None, None, ("a/b/c", j("..", ".."))],
+            ),
+            (
+                "a/d/x",
+                ["a/b", "a/c"],
+                [("a/b", j("..", "d", "x")), None] + [("a/b", j("..", "d", "x"))] * 2,
+            ),
+            ("a/..x", ["a/b", "a"], [("a", "..x"), None] + [("a", "..x")] * 2),
+        ]
+        for path, dirs, results in cases:
+            dir_trie = path_ext.DirTrie(dirs)
+            for max_relpath_level, result in zip([-1, 0, 1, 2], results):
+                self.assertEqual(result, dir_trie.closest(path, max_relpath_level))
+                self.assertEqual(
+                    result, path_ext.closest_dir(path, dirs, max_relpath_level)
+                )
+
+    def test_path_prefix_trie(self):
+        trie = path_ext.PathPrefixTrie()
+        trie.add("/a/b", "@B@")
+        trie.add("/a", "@A@")
+        trie.add("/a/b/c", "@C@")
+        trie.add("/", "@ROOT@")
+        self.assertEqual(("/a/b", "@B@"), trie.find("/a/b/c/d"))
+        self.assertEqual(("/a", "@A@"), trie.find("/a/bc"))
+        self.assertEqual(("/", "@ROOT@"), trie.find("/"))
+        self.assertIsNone(trie.find("/b"))
+        self.assertIsNone(trie.find("a/b"))
+
     def test_relpath_level(self):
         self.assertEqual(0, path_ext.relpath_level("a"))
         self.assertEqual(0, path_ext.relpath_level("/a"))
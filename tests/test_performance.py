@@ -1,12 +1,31 @@
 import cProfile
+import itertools
 import logging
 import os
 import sys
+import timeit
 import unittest
 
 __module_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, __module_dir)
 import base  # noqa: E402
+from build_migrator.common.argument_parser_ex import TokenParser  # noqa: E402
+import build_migrator.common.os_ext as os_ext  # noqa: E402
+import build_migrator.common.path_ext as path_ext  # noqa: E402
+from build_migrator.common.substring_matcher import SubstringMatcher  # noqa: E402
+from build_migrator.parsers.build_log_parser import (  # noqa: E402
+    BuildLogParserContext,
+    ParserChain,
+)
+from build_migrator.parsers.autotools import (  # noqa: E402
+    CommandTokenizer,
+    InlineFileContent,
+    LineAccumulator,
+    MakeLog,
+    ResponseFile,
+)
+from build_migrator.parsers.clang_gcc import Clang_Gcc  # noqa: E402
+from build_migrator.parsers.strace import StraceLog, StraceTokenizer  # noqa: E402
 
 
 class TestPerformance(base.TestBase):
@@ -58,3 +77,289 @@ class TestPerformance(base.TestBase):
         finally:
             profiler.disable()
             profiler.print_stats(sort="cumtime")
+
+    @unittest.skip("This test is disabled by default")
+    def test_argument_parser_ex_dispatch(self):
+        context = BuildLogParserContext(
+            None,
+            logs=["make:build.log"],
+            source_dir=os.path.join(self.test_method_out_dir, "source"),
+            build_dirs=[os.path.join(self.test_method_out_dir, "build")],
+            platform="linux",
+        )
+        parser = Clang_Gcc(context).parser
+        tokens = (
+            "-c -O2 -g -fPIC -Wall -Wextra -Werror -pthread -std=c++17 "
+            "-fno-exceptions -MD -MF foo.o.d -isystem /usr/include/foo "
+            "-Wl,-rpath,/opt/lib -o foo.o ../source/foo.cpp"
+        ).split()
+        for idx in range(60):
+            tokens += ["-I../include%d" % idx, "-DDEFINITION%d=1" % idx]
+
+        results = {}
+        for dispatch in [False, True]:
+            token_parser = TokenParser(
+                parser._rules, parser._validators, dispatch=dispatch
+            )
+
+            def parse():
+                return token_parser.parse(
+                    list(tokens),
+                    strict=False,
+                    unknown_dest=["compile_flags", "link_flags"],
+                )
+
+            results[dispatch] = parse()
+            seconds = timeit.timeit(parse, number=5) / 5
+            logging.info(
+                "dispatch=%s: %.2f ms per command (%d tokens)",
+                dispatch,
+                seconds * 1000,
+                len(tokens),
+            )
+
+        self.assertEqual(results[False], results[True])
+
+    class _StubContext(object):
+        def __init__(self):
+            self.current_target = None
+            self.registered = []
+
+        def register_target(self, target):
+            self.registered.append(target["output"])
+
+    class _StubParser(object):
+        def __init__(self, log_type=None, action=None):
+            self.log_type = log_type
+            self.action = action
+
+        def is_applicable(self, log_type=None):
+            return self.log_type is None or self.log_type == log_type
+
+        def parse(self, target):
+            line = target.get("line")
+            if self.action == "split" and line is not None:
+                # like LineAccumulator / CommandTokenizer
+                return [{"tokens": line.split()}]
+            if self.action == "compile" and target.get("tokens", [None])[0] == "cc":
+                return {"output": target["tokens"][-1]}
+            return target
+
+    class _StubToolParser(object):
+        def __init__(self, *programs):
+            self.program_re = os_ext.Unix.get_program_path_re(*programs)
+            self.programs = self.program_re.names
+
+        def parse(self, target):
+            tokens = target.get("tokens")
+            if not tokens:
+                return target
+            if not self.program_re.match(tokens[0]):
+                return target
+            return {"output": tokens[-1]}
+
+    def _benchmark_parser_chain(self, line_count):
+        tools = ["ar", "libtool", "objcopy", "nasm", "yasm", "cmake", "cp"]
+        parsers = (
+            [self._StubParser("strace") for _ in range(4)]
+            + [self._StubParser("make"), self._StubParser(action="split")]
+            + [self._StubParser("msbuild") for _ in range(4)]
+            + [self._StubParser() for _ in range(10)]
+            + [self._StubToolParser(name) for name in tools]
+            + [self._StubParser(action="compile")]
+        )
+        commands = [
+            "cc -c a.c -o {}.o",
+            "echo {}",
+            "mkdir -p {}",
+            "/usr/bin/ar rcs {}.a",
+        ]
+        log = [{"line": commands[i % 4].format(i)} for i in range(line_count)]
+
+        def parse_chain():
+            context = self._StubContext()
+            ParserChain(context, parsers).parse(log, log_type="make")
+            return context.registered
+
+        registered = parse_chain()
+        seconds = timeit.timeit(parse_chain, number=1)
+        logging.info(
+            "%.2f us per line (%d lines)", seconds * 1000000 / line_count, line_count
+        )
+        self.assertEqual(len(registered), (line_count + 3) // 4 + line_count // 4)
+
+    @unittest.skip("This test is disabled by default")
+    def test_parser_chain_dispatch(self):
+        self._benchmark_parser_chain(1000000)
+
+    class _StubLogContext(_StubContext):
+        platform_name = "linux"
+        working_dir = "/build"
+
+        def normalize_path(self, path):
+            return path
+
+    def _benchmark_line_filter(self, line_count):
+        lines = [
+            "cc -c a{}.c -o a{}.o",
+            "a{}.c:10:5: warning: unused variable 'x{}' [-Wunused-variable]",
+            "   10 | int x{}, y{};",
+            "PASS: test{} (elapsed {}s)",
+            "/usr/bin/ar rcs liba{}.a \\",
+            "  a{}.o a{}.o",
+            "[ {}%] Built target a{}",
+            "make[1]: Nothing to be done for 'all{}{}'.",
+        ]
+        log = [lines[i % 8].format(i, i) for i in range(line_count)]
+
+        def parse(line_filter):
+            context = self._StubLogContext()
+            parsers = [
+                MakeLog(context),
+                LineAccumulator(context),
+                CommandTokenizer(context),
+                InlineFileContent(context),
+                ResponseFile(context),
+                self._StubToolParser("cc"),
+                self._StubToolParser("ar"),
+            ]
+            chain = ParserChain(context, parsers)
+            lines = log
+            if line_filter:
+                lines = chain.get_line_filter("make").filter(lines)
+            chain.parse([{"line": line} for line in lines], log_type="make")
+            return context.registered
+
+        results = []
+        for line_filter in [False, True]:
+            results.append(parse(line_filter))
+            seconds = timeit.timeit(lambda: parse(line_filter), number=1)
+            logging.info(
+                "line_filter=%s: %.2f us per line (%d lines)",
+                line_filter,
+                seconds * 1000000 / line_count,
+                line_count,
+            )
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(len(results[0]), (line_count + 7) // 8 + (line_count + 3) // 8)
+
+    @unittest.skip("This test is disabled by default")
+    def test_line_filter(self):
+        self._benchmark_line_filter(1000000)
+
+    def _benchmark_path_resolution(self, path_count):
+        root = os.path.abspath(os.sep)
+        source_dir = os.path.join(root, "work", "project")
+        dirs = [source_dir] + [
+            os.path.join(root, "work", "build", "variant%d" % idx) for idx in range(8)
+        ]
+        aliases = [
+            (os.path.join(root, "opt", "sdk%d" % idx, "include"), "@SDK%d@" % idx)
+            for idx in range(40)
+        ]
+        paths = []
+        for idx in range(path_count):
+            base = [dirs[idx % 9], aliases[idx % 40][0], root][idx % 3]
+            paths.append(
+                os.path.join(base, "dir%d" % (idx % 97), "..", "sub%d" % idx, "f.h")
+            )
+        paths = [os.path.normpath(p) for p in paths]
+
+        def resolve():
+            dir_trie = path_ext.DirTrie(dirs)
+            alias_trie = path_ext.PathPrefixTrie(sep=os.sep)
+            for src, dest in aliases:
+                alias_trie.add(src, dest)
+            return [
+                (alias_trie.find(path), dir_trie.closest(path, max_relpath_level=1))
+                for path in paths
+            ]
+
+        self.assertEqual(path_count, len(resolve()))
+        seconds = timeit.timeit(resolve, number=1)
+        logging.info(
+            "%.2f us per path (%d paths)", seconds * 1000000 / path_count, path_count
+        )
+
+    @unittest.skip("This test is disabled by default")
+    def test_path_resolution(self):
+        self._benchmark_path_resolution(100000)
+
+    @unittest.skip("This test is disabled by default")
+    def test_variable_matching(self):
+        variables = ["@SDK%d_INCLUDE_DIR@" % idx for idx in range(300)]
+        paths = []
+        for idx in range(100000):
+            if idx % 3:
+                path = "@build_dir@/dir%d/file%d.h" % (idx % 97, idx)
+            else:
+                path = variables[idx % 300] + "/sub%d/file.h" % idx
+            paths.append(path)
+
+        matcher = SubstringMatcher(variables)
+
+        def match():
+            return [matcher.find_all(path) for path in paths]
+
+        self.assertEqual([variables[0]], match()[0])
+        seconds = timeit.timeit(match, number=1)
+        logging.info(
+            "%.2f us per path (%d variables)",
+            seconds * 1000000 / len(paths),
+            len(variables),
+        )
+
+    # strace -f log of parallel build: each job starts a compiler while
+    # other jobs are in flight, calls are resumed in reverse order
+    @staticmethod
+    def _generate_strace_log(line_count, jobs):
+        execve = (
+            '{pid}  execve("/usr/bin/gcc", ["gcc", "-c", "-DNAME=\\"a{i}\\"",'
+            ' "-I../include", "../src/a{i}.c", "-o", "a{i}.o"],'
+            " 0x7ffd /* 30 vars */"
+        )
+        idx = 0
+        while idx < line_count:
+            pids = range(1000, 1000 + min(jobs, (line_count - idx) // 3))
+            for pid in pids:
+                yield execve.format(pid=pid, i=idx) + " <unfinished ...>"
+                idx += 1
+            for pid in pids:
+                yield '%d  openat(AT_FDCWD, "a.c", O_RDONLY) = 3' % pid
+                idx += 1
+            for pid in reversed(pids):
+                yield "%d  <... execve resumed>) = 0" % pid
+                idx += 1
+            if not pids:
+                break
+
+    def _benchmark_strace(self, line_count, jobs=1000):
+        def parse():
+            context = self._StubLogContext()
+            log = StraceLog(context)
+            tokenizer = StraceTokenizer(context)
+            result = []
+            lines = self._generate_strace_log(line_count, jobs)
+            targets = itertools.chain(
+                ({"line": line} for line in lines), [{"eof": True}]
+            )
+            for target in targets:
+                for entry in log.parse(target):
+                    if "eof" in entry:
+                        continue
+                    for command in tokenizer.parse(entry):
+                        result.append(
+                            (command["context.working_dir"], command["tokens"])
+                        )
+            return result
+
+        self.assertEqual(line_count // 3, len(parse()))
+        seconds = timeit.timeit(parse, number=1)
+        logging.info(
+            "%.2f us per line (%d lines)", seconds * 1000000 / line_count, line_count
+        )
+
+    # About 2 GB of strace log
+    @unittest.skip("This test is disabled by default")
+    def test_strace(self):
+        self._benchmark_strace(15000000)
@@ -0,0 +1,95 @@
+import os
+import sys
+
+__module_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, __module_dir)
+import base  # noqa: E402
+from build_migrator.common.dependency_scanner import DependencyScanner  # noqa: E402
+from build_migrator.common.probe_cache import ProbeCache  # noqa: E402
+
+
+class TestProbeCache(base.TestBase):
+    def _probe(self, cache_dir, max_size=1024 * 1024, cache=None, save_cache=True):
+        if cache is None:
+            cache = ProbeCache(cache_dir, max_size)
+        scanner = DependencyScanner(cache=cache)
+        outputs = []
+        for name in ["a.c", "b.c"]:
+            cmd = [sys.executable, "-c", "print('{}: {}.h')".format(name, name[0])]
+            scanner.submit(
+                [cmd],
+                self.test_method_out_dir,
+                lambda results: outputs.append(results[0].stdout),
+                inputs=[name],
+                list_dependencies=lambda results: [
+                    results[0].stdout.split()[1]
+                ],
+            )
+        scanner.close(save_cache=save_cache)
+        return cache, outputs
+
+    def _write(self, name, content):
+        with open(os.path.join(self.test_method_out_dir, name), "w") as f:
+            f.write(content)
+
+    def test_hit_and_invalidation(self):
+        for name in ["a.c", "b.c", "a.h", "b.h"]:
+            self._write(name, "")
+        cache_dir = os.path.join(self.test_method_out_dir, "probe_cache")
+
+        cache, outputs = self._probe(cache_dir)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+        cache, cached_outputs = self._probe(cache_dir)
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+        self.assertEqual(outputs, cached_outputs)
+
+        # Header size changed
+        self._write("b.h", "#pragma once\n")
+        cache, _ = self._probe(cache_dir)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_eviction(self):
+        for name in ["a.c", "b.c", "a.h", "b.h"]:
+            self._write(name, "")
+        cache_dir = os.path.join(self.test_method_out_dir, "probe_cache")
+
+        # No entry fits, everything is evicted
+        self._probe(cache_dir, max_size=1)
+        cache, _ = self._probe(cache_dir)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_merge(self):
+        for name in ["a.c", "b.c", "a.h", "b.h"]:
+            self._write(name, "")
+        cache_dir = os.path.join(self.test_method_out_dir, "probe_cache")
+        parent_cache = ProbeCache(cache_dir, 1024 * 1024)
+        checkpoint = parent_cache.get_checkpoint()
+
+        # Child process doesn't save the cache, its changes are merged
+        child_cache = ProbeCache(cache_dir, 1024 * 1024)
+        self._probe(cache_dir, cache=child_cache, save_cache=False)
+        self.assertFalse(os.path.exists(os.path.join(cache_dir, "index.json")))
+        changes = child_cache.get_changes(checkpoint)
+        self.assertEqual((2, 0, 2), (len(changes[0]), changes[1], changes[2]))
+        parent_cache.merge(changes)
+        self.assertEqual((parent_cache.hits, parent_cache.misses), (0, 2))
+        parent_cache.save()
+
+        cache, _ = self._probe(cache_dir, max_size=1)
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+        # Merged entries are evicted like any other
+        cache, _ = self._probe(cache_dir)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_unindexed_entries(self):
+        for name in ["a.c", "b.c", "a.h", "b.h"]:
+            self._write(name, "")
+        cache_dir = os.path.join(self.test_method_out_dir, "probe_cache")
+        self._probe(cache_dir, save_cache=False)
+
+        # Entries are found and added to the index
+        cache, _ = self._probe(cache_dir, max_size=1)
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+        cache, _ = self._probe(cache_dir)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
@@ -0,0 +1,120 @@
+import os
+import sys
+
+__module_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, __module_dir)
+import base  # noqa: E402
+from build_migrator.parsers.strace import (  # noqa: E402
+    StraceLog,
+    StraceTokenizer,
+    decode_c_string,
+    decode_string_array,
+)
+
+
+class TestStraceLog(base.TestBase):
+    def _parse(self, lines):
+        log = StraceLog(None)
+        result = []
+        for line in lines:
+            result.append(
+                [
+                    (t["strace.pid"], t["strace.syscall"], t["strace.raw_arguments"])
+                    for t in log.parse({"line": line})
+                ]
+            )
+        eof = log.parse({"eof": True})
+        self.assertEqual([{"eof": True}], eof[-1:])
+        return result, eof[:-1]
+
+    def test_resumed_entries(self):
+        result, incomplete = self._parse(
+            [
+                '10 chdir("a") = 0',
+                '10 execve("/bin/cc", ["cc"], 0x1 /* 1 var */ <unfinished ...>',
+                "11 wait4(-1,  <unfinished ...>",
+                '10 execve("/bin/cc", ["cc", "-c"], 0x1 /* 1 var */ <unfinished ...>',
+                '12 chdir("b") = 0',
+                "10 <... execve resumed>) = 0",
+                "12 +++ exited with 0 +++",
+                "10 <... execve resumed>) = 1",
+                "11 <... wait4 resumed>) = 10",
+                "13 vfork( <unfinished ...>",
+            ]
+        )
+        self.assertEqual(
+            [
+                [("10", "chdir", '("a") = 0')],
+                [],
+                [],
+                [],
+                [],
+                # Publishing waits for the first unfinished call
+                [("10", "execve", '("/bin/cc", ["cc"], 0x1 /* 1 var */ ) = 0')],
+                [],
+                [],
+                [
+                    ("11", "wait4", "(-1,  ) = 10"),
+                    (
+                        "10",
+                        "execve",
+                        '("/bin/cc", ["cc", "-c"], 0x1 /* 1 var */ ) = 1',
+                    ),
+                    ("12", "chdir", '("b") = 0'),
+                    ("12", "exit", "0"),
+                ],
+                [],
+            ],
+            result,
+        )
+        # Unfinished calls are returned at EOF
+        self.assertEqual([False], [t["strace.complete"] for t in incomplete])
+
+    def test_tokenizer(self):
+        class Context(object):
+            working_dir = "/build"
+
+            def normalize_path(self, path, ignore_working_dir=False):
+                return os.path.normpath(path)
+
+        log = StraceLog(None)
+        tokenizer = StraceTokenizer(Context())
+        lines = [
+            "10 vfork( <unfinished ...>",
+            '11 chdir("sub") = 0',
+            "10 <... vfork resumed>) = 12",
+            '11 execve("/bin/cc", ["cc", "-c", "a.c"], 0x1 /* 1 var */'
+            " <unfinished ...>",
+            '12 execve("/bin/cc", ["cc", "-DA=\\"a b\\"", "b.c"], 0x1 /* 1 var */'
+            " <unfinished ...>",
+            '10 execve("/bin/ld", ["ld"], 0x1 /* 1 var */) = -1 ENOENT',
+            "12 <... execve resumed>) = 0",
+            "11 <... execve resumed>) = 0",
+        ]
+        commands = []
+        for line in lines:
+            for entry in log.parse({"line": line}):
+                for command in tokenizer.parse(entry):
+                    commands.append((command["context.working_dir"], command["tokens"]))
+        # Commands are in order of calls, not in order of their completion
+        self.assertEqual(
+            [
+                ("/build/sub/", ["cc", "-c", "a.c"]),
+                ("/build/", ["cc", '-DA="a b"', "b.c"]),
+            ],
+            commands,
+        )
+
+    def test_decode_string_array(self):
+        self.assertEqual([], decode_string_array(""))
+        self.assertEqual(["make"], decode_string_array('"make"'))
+        self.assertEqual(
+            ["gcc", '-DA="a, b"', "-DB=\\", "x\ty", "", "é", "long"],
+            decode_string_array(
+                r'"gcc", "-DA=\"a, b\"", "-DB=\\", "x\11y", "", "\303\251",'
+                r' "long"..., ...'
+            ),
+        )
+        self.assertEqual("\x1b[0m\n", decode_c_string(r"\x1b[0m\n"))
+        self.assertRaises(ValueError, decode_string_array, '"a" "b"')
+        self.assertRaises(ValueError, decode_string_array, '"a\\"')
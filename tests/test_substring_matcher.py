@@ -0,0 +1,40 @@
+import os
+import sys
+
+__module_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, __module_dir)
+import base  # noqa: E402
+from build_migrator.common.substring_matcher import SubstringMatcher  # noqa: E402
+
+
+class TestSubstringMatcher(base.TestBase):
+    def test_find_all(self):
+        matcher = SubstringMatcher(["@SDK@", "@SDK_INCLUDE@", "@ZLIB@"])
+        self.assertEqual([], matcher.find_all("@build_dir@/a.c"))
+        self.assertEqual(
+            ["@SDK_INCLUDE@"], matcher.find_all("@SDK_INCLUDE@/zlib.h")
+        )
+        self.assertEqual(
+            ["@SDK@", "@ZLIB@"], matcher.find_all("@ZLIB@/../@SDK@/lib")
+        )
+
+        # Added patterns are matched in order of addition
+        matcher.add("@ZLIB@/lib")
+        matcher.add("LIB")
+        matcher.add("@SDK@")
+        self.assertEqual(
+            ["@SDK@", "@ZLIB@", "@ZLIB@/lib", "LIB"],
+            matcher.find_all("@ZLIB@/lib/@SDK@/LIB"),
+        )
+
+        # Overlapping patterns
+        matcher = SubstringMatcher(["abc", "bc", "c", "bcd"])
+        self.assertEqual(["abc", "bc", "c"], matcher.find_all("xabc"))
+
+        # Every pattern starts with "@", strings without it are skipped
+        matcher = SubstringMatcher(["@A@", "@A_DIR@"])
+        self.assertEqual([], matcher.find_all(""))
+        self.assertEqual([], matcher.find_all("A@/A_DIR@"))
+        self.assertEqual([], matcher.find_all("@A_@A_D@"))
+        self.assertEqual(["@A@"], matcher.find_all("@A@A@/@A@"))
+        self.assertEqual(["@A@", "@A_DIR@"], matcher.find_all("@A_DIR@@A@"))
@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+__module_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, __module_dir)
+import base  # noqa: E402
+from build_migrator.common.trace import TraceSink  # noqa: E402
+from build_migrator.helpers import (  # noqa: E402
+    get_minified_target,
+    minify_target,
+    MinifiedTargetFormatter,
+)
+
+
+class TestTrace(base.TestBase):
+    def test_trace_sink(self):
+        path = os.path.join(self.test_method_out_dir, "trace.jsonl")
+        tracer = TraceSink()
+        self.assertFalse(tracer.enabled)
+        # Disabled sink ignores events
+        tracer.write("parse", target={"line": "ignored"})
+
+        tracer.open(path)
+        self.assertTrue(tracer.enabled)
+        tracer.write("parse", target={"line": "cc -c a.c"})
+        tracer.write("register", target={"output": "a.o", "deps": {"a.h"}})
+        tracer.close()
+        self.assertFalse(tracer.enabled)
+
+        with open(path) as f:
+            events = [json.loads(line) for line in f]
+        self.assertEqual(
+            events,
+            [
+                {"event": "parse", "target": {"line": "cc -c a.c"}},
+                {"event": "register", "target": {"output": "a.o", "deps": "{'a.h'}"}},
+            ],
+        )
+
+    def test_minified_target(self):
+        dependency = {"output": "b.txt", "content": "long content"}
+        target = {
+            "output": "a.txt",
+            "content": "long content",
+            "dependencies": [dependency, "c.txt"],
+        }
+        minified = get_minified_target(target)
+        self.assertEqual(
+            minified,
+            {
+                "output": "a.txt",
+                "content": "...",
+                "dependencies": [{"output": "b.txt", "content": "..."}, "c.txt"],
+            },
+        )
+        # Original target is intact
+        self.assertEqual(target["content"], "long content")
+        self.assertEqual(dependency["content"], "long content")
+
+        self.assertIs(minify_target(target), target)
+        self.assertEqual(minified, target)
+        self.assertEqual(dependency["content"], "...")
+
+        self.assertIn("'...'", str(MinifiedTargetFormatter(target)))
+        self.assertIn("'a.txt'", str(MinifiedTargetFormatter([target])))